@@ -0,0 +1,213 @@
+# api/admission.py
+"""
+Admission control for expensive endpoints.
+
+Each route class has a per-client token bucket, a global token bucket and a
+concurrency limit. A request over budget gets the last good response for the
+same URL (marked with X-NetHealth-Admission: cached) or, if there is none,
+429 with Retry-After. Cheap endpoints are not decorated and never wait here.
+"""
+from __future__ import annotations
+
+import functools
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from flask import jsonify, make_response, request
+
+# Per-client buckets tracked at once: idle ones are pruned first, then the least recently used
+MAX_TRACKED_CLIENTS = 1024
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: Optional[float] = None):
+        self.rate = rate            # tokens per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until one token is available (after refill)."""
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else math.inf
+
+
+class RouteClass:
+    """Budget shared by every endpoint decorated with the same class name."""
+
+    def __init__(self, name: str, client_rate: float, client_burst: float,
+                 global_rate: float, global_burst: float, max_concurrent: int, queue_timeout: float = 1.0):
+        self.name = name
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._clients: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.served_cached = 0
+        self.rejected = 0
+
+    def take(self, client: str) -> Tuple[bool, float]:
+        """Consume one token from both buckets, or neither; returns (ok, retry_after)."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._clients.get(client)
+            if bucket is None:
+                if len(self._clients) >= MAX_TRACKED_CLIENTS:
+                    self._prune(now)
+                bucket = self._clients[client] = TokenBucket(self.client_rate, self.client_burst, now)
+            bucket.refill(now)
+            self.global_bucket.refill(now)
+            wait = max(bucket.wait_time(), self.global_bucket.wait_time())
+            if wait > 0:
+                return False, wait
+            bucket.tokens -= 1
+            self.global_bucket.tokens -= 1
+            return True, 0.0
+
+    def _prune(self, now: float) -> None:
+        # Least recently used first; refill() moves every bucket's `updated` to now
+        by_age = sorted(self._clients.items(), key=lambda kv: kv[1].updated)
+        for key, b in by_age:
+            b.refill(now)
+            if b.tokens >= b.capacity:
+                del self._clients[key]
+        # Every tracked client is still active: make room by dropping the oldest
+        excess = len(self._clients) - MAX_TRACKED_CLIENTS + 1
+        for key, _ in by_age:
+            if excess <= 0:
+                break
+            if self._clients.pop(key, None) is not None:
+                excess -= 1
+
+    def acquire(self) -> bool:
+        return self._slots.acquire(timeout=self.queue_timeout)
+
+    def release(self) -> None:
+        self._slots.release()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "admitted": self.admitted,
+                "served_cached": self.served_cached,
+                "rejected": self.rejected,
+                "tracked_clients": len(self._clients),
+                "global_tokens": round(self.global_bucket.tokens, 2),
+                "max_concurrent": self.max_concurrent,
+            }
+
+
+# rates are per second
+ROUTE_CLASSES: Dict[str, RouteClass] = {
+    # subprocess-backed (arp -a)
+    "subprocess": RouteClass("subprocess", client_rate=6 / 60, client_burst=4,
+                             global_rate=30 / 60, global_burst=10, max_concurrent=2),
+    # live WeatherAPI calls
+    "upstream": RouteClass("upstream", client_rate=10 / 60, client_burst=6,
+                           global_rate=60 / 60, global_burst=20, max_concurrent=4),
+}
+
+# full_path -> (body, status, mimetype) of the last 200 response
+MAX_CACHED_RESPONSES = 256
+_last_good: Dict[str, Tuple[bytes, int, str]] = {}
+_last_good_lock = threading.Lock()
+
+
+def admission_enabled() -> bool:
+    return os.environ.get("NETHEALTH_ADMISSION", "on").lower() not in ("0", "off", "false", "no")
+
+
+def _over_budget(rc: RouteClass, retry_after: float):
+    with _last_good_lock:
+        cached = _last_good.get(request.full_path)
+    if cached is not None:
+        body, status, mimetype = cached
+        response = make_response(body, status)
+        response.mimetype = mimetype
+        response.headers["X-NetHealth-Admission"] = "cached"
+        with rc._lock:
+            rc.served_cached += 1
+        return response
+
+    with rc._lock:
+        rc.rejected += 1
+    seconds = max(1, math.ceil(retry_after)) if math.isfinite(retry_after) else 60
+    response = make_response(jsonify({"error": "Too many requests", "retry_after": seconds}), 429)
+    response.headers["Retry-After"] = str(seconds)
+    return response
+
+
+def admit(class_name: str) -> Callable:
+    """Route decorator applying the named budget."""
+    rc = ROUTE_CLASSES[class_name]
+
+    def decorator(view: Callable) -> Callable:
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not admission_enabled():
+                return view(*args, **kwargs)
+
+            ok, retry_after = rc.take(request.remote_addr or "unknown")
+            if not ok:
+                return _over_budget(rc, retry_after)
+            if not rc.acquire():
+                return _over_budget(rc, 1.0)
+            try:
+                response = make_response(view(*args, **kwargs))
+            finally:
+                rc.release()
+
+            with rc._lock:
+                rc.admitted += 1
+            if response.status_code == 200 and not response.direct_passthrough:
+                with _last_good_lock:
+                    _last_good.pop(request.full_path, None)
+                    _last_good[request.full_path] = (response.get_data(), 200, response.mimetype)
+                    if len(_last_good) > MAX_CACHED_RESPONSES:
+                        del _last_good[next(iter(_last_good))]
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def admission_stats() -> Dict[str, Dict[str, float]]:
+    return {name: rc.stats() for name, rc in ROUTE_CLASSES.items()}
+
+
+def cache_stats() -> Dict[str, int]:
+    with _last_good_lock:
+        cached = list(_last_good.values())
+    return {
+        "admission_cached_responses": len(cached),
+        "admission_cached_bytes": sum(len(body) for body, _, _ in cached),
+        "admission_clients": sum(rc.stats()["tracked_clients"] for rc in ROUTE_CLASSES.values()),
+    }
+
+
+def reset() -> None:
+    """Refill every bucket and forget cached responses (tests, config reloads)."""
+    now = time.monotonic()
+    for rc in ROUTE_CLASSES.values():
+        with rc._lock:
+            rc._clients.clear()
+            rc.global_bucket.tokens = rc.global_bucket.capacity
+            rc.global_bucket.updated = now
+    with _last_good_lock:
+        _last_good.clear()
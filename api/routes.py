@@ -2,19 +2,13 @@
 from __future__ import annotations
 
 import json
-import csv
 import os
 import logging
 from pathlib import Path
-from collections import defaultdict
-from datetime import datetime
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 
-try:
-    import requests
-except ImportError:
-    requests = None
+from api.admission import admit
 
 
 bp = Blueprint("api", __name__, url_prefix="/api")
@@ -23,9 +17,39 @@ bp = Blueprint("api", __name__, url_prefix="/api")
 ROOT = Path(__file__).resolve().parents[1]
 DATA_DIR = ROOT / "data"
 QUOTES_PATH = DATA_DIR / "quotes.json"
-PRICES_PATH = DATA_DIR / "prices.csv"
 ENV_PATH = ROOT / ".env"
 
+# (mtime_ns, size) of .env when it was last loaded
+_env_state = {"signature": None, "reloads": 0}
+
+
+def _reload_env() -> None:
+    """Pick up .env edits without a restart; skips the parse when the file is unchanged."""
+    from dotenv import load_dotenv
+    try:
+        st = ENV_PATH.stat()
+        signature = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        signature = None
+    if signature is not None and signature != _env_state["signature"]:
+        load_dotenv(ENV_PATH, override=True)
+        _env_state["reloads"] += 1
+    _env_state["signature"] = signature
+
+
+def _env_written(name: str, value: str) -> None:
+    """Apply our own .env write right away.
+
+    A same-size rewrite within the filesystem's mtime granularity leaves the
+    signature unchanged, so don't rely on _reload_env() to notice it.
+    """
+    os.environ[name] = value
+    _env_state["signature"] = None
+
+
+def cache_stats() -> dict[str, int]:
+    return {"dotenv_reloads": _env_state["reloads"]}
+
 
 # -------------------------------
 # Quotes Loader
@@ -50,56 +74,9 @@ def load_quotes() -> list[dict]:
 # Prices Loader
 # -------------------------------
 def load_prices_latest_with_change() -> list[dict]:
-    if not PRICES_PATH.exists():
-        return []
-
-    rows = []
-    with PRICES_PATH.open(newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for r in reader:
-            try:
-                d = r.get("date", "").strip()
-                item = r.get("item", "").strip()
-                price = float(r.get("price", "0").strip())
-                dt = datetime.fromisoformat(d) if d else None
-            except Exception:
-                continue
-            rows.append({"dt": dt, "item": item, "price": price})
-
-    by_item = defaultdict(list)
-    for r in rows:
-        by_item[r["item"]].append(r)
-
-    result = []
-    for item, lst in by_item.items():
-        lst.sort(key=lambda x: (x["dt"] is None, x["dt"]))
-        if not lst:
-            continue
-
-        latest = lst[-1]["price"]
-        prev = lst[-2]["price"] if len(lst) >= 2 else None
-
-        if prev is None:
-            change, direction = None, "flat"
-        else:
-            delta = latest - prev
-            if abs(delta) < 1e-9:
-                direction = "flat"
-            elif delta > 0:
-                direction = "up"
-            else:
-                direction = "down"
-            change = delta
-
-        result.append({
-            "item": item,
-            "price": latest,
-            "change": change,
-            "direction": direction
-        })
-
-    result.sort(key=lambda x: x["item"].lower())
-    return result
+    """Latest price per item from prices.csv + ingested rows (snapshot and unmerged tail)."""
+    from services.prices import get_price_store
+    return get_price_store().latest()
 
 # -------------------------------
 # Update Weather API Key
@@ -138,6 +115,13 @@ def update_api_key():
 
     # Write back cleanly
     ENV_PATH.write_text("\n".join(new_lines) + "\n", encoding="utf-8")
+    _env_written("WEATHERAPI_KEY", api_key)
+
+    # Forget cached validations and check the new key before the UI asks
+    from services import weather as weather_service
+    weather_service.invalidate_api_key_cache()
+    if weather_service.requests:
+        weather_service.revalidate_in_background(api_key)
 
     return jsonify({"ok": True})
 
@@ -146,10 +130,10 @@ def update_api_key():
 # Check API Key Status
 # -------------------------------
 @bp.get("/settings/api_status")
+@admit("upstream")
 def api_status():
     """Check if weather API key is configured and working."""
-    from dotenv import load_dotenv
-    load_dotenv(override=True)
+    _reload_env()
     
     api_key = os.environ.get("WEATHERAPI_KEY", "").strip()
     
@@ -161,34 +145,9 @@ def api_status():
         })
     
     # Test the API key with a simple request
-    if requests:
-        try:
-            url = f"https://api.weatherapi.com/v1/current.json?key={api_key}&q=London"
-            response = requests.get(url, timeout=5)
-            if response.status_code == 200:
-                return jsonify({
-                    "configured": True,
-                    "valid": True,
-                    "message": "API key is valid"
-                })
-            elif response.status_code == 401:
-                return jsonify({
-                    "configured": True,
-                    "valid": False,
-                    "message": "API key is invalid"
-                })
-            else:
-                return jsonify({
-                    "configured": True,
-                    "valid": False,
-                    "message": f"API error: {response.status_code}"
-                })
-        except Exception as e:
-            return jsonify({
-                "configured": True,
-                "valid": False,
-                "message": f"Connection error: {str(e)}"
-            })
+    from services import weather as weather_service
+    if weather_service.requests:
+        return jsonify(weather_service.check_api_key(api_key))
     
     return jsonify({
         "configured": True,
@@ -227,6 +186,7 @@ def update_location():
 
     # Write back cleanly
     ENV_PATH.write_text("\n".join(new_lines) + "\n", encoding="utf-8")
+    _env_written("WEATHER_LOCATION", new_loc)
 
     return jsonify({"ok": True})
 
@@ -263,135 +223,330 @@ def prices():
     return jsonify({"prices": load_prices_latest_with_change()})
 
 
+@bp.post("/prices")
+def ingest_prices():
+    """Append a batch of {"item", "price", "date"?} rows; returns once they are durable."""
+    from services.prices import PriceValidationError, get_price_store, validate_rows
+
+    payload = request.get_json(silent=True)
+    rows = payload.get("rows") if isinstance(payload, dict) else payload
+    try:
+        accepted = get_price_store().append(validate_rows(rows))
+    except PriceValidationError as e:
+        return jsonify({"ok": False, "error": str(e), "errors": e.errors[:50]}), 400
+    except TimeoutError as e:
+        return jsonify({"ok": False, "error": str(e)}), 503
+    return jsonify({"ok": True, "accepted": accepted})
+
+
+@bp.get("/prices/history")
+def price_history():
+    from services.export import ExportError, parse_time
+    from services.prices import get_price_store
+
+    item = request.args.get("item", "").strip()
+    if not item:
+        return jsonify({"error": "item is required"}), 400
+    try:
+        start, end = parse_time(request.args.get("start")), parse_time(request.args.get("end"))
+    except ExportError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"item": item, "history": get_price_store().history(item, start, end)})
+
+
 # -------------------------------
 # Weather API (with forecast)
 # -------------------------------
+def _weather_fallback(conditions: str) -> dict:
+    return {
+        "temperature_f": 72,
+        "feels_like_f": 70,
+        "humidity": 50,
+        "wind_mph": 5,
+        "location": "New York",
+        "conditions": conditions,
+        "hourly": [],
+        "daily": []
+    }
+
+
+def _weather_unavailable() -> dict:
+    return {
+        "temperature_f": "--",
+        "feels_like_f": "--",
+        "humidity": "--",
+        "wind_mph": "--",
+        "location": "Unavailable",
+        "conditions": "API Error",
+        "hourly": [],
+        "daily": []
+    }
+
+
 @bp.get("/weather")
+@admit("upstream")
 def weather():
     """
     Returns current weather + 7-day forecast from WeatherAPI.com.
+    ?location= picks any location; default is the first configured one.
     Reloads .env on each request so updates take effect immediately.
     """
-    from dotenv import load_dotenv
-    load_dotenv(override=True)
+    from services import weather as weather_service
+    _reload_env()
 
-    if not requests:
-        return jsonify({
-            "temperature_f": 72,
-            "feels_like_f": 70,
-            "humidity": 50,
-            "wind_mph": 5,
-            "location": "New York",
-            "conditions": "Install requests library",
-            "hourly": [],
-            "daily": []
-        })
+    if not weather_service.requests:
+        return jsonify(_weather_fallback("Install requests library"))
 
     api_key = os.environ.get("WEATHERAPI_KEY")
-    location = os.environ.get("WEATHER_LOCATION", "auto:ip")
+    location = request.args.get("location", "").strip() or weather_service.configured_locations()[0]
+    if len(location) > 100 or "\n" in location:
+        return jsonify({"error": "Invalid location"}), 400
 
     if not api_key:
-        return jsonify({
-            "temperature_f": 72,
-            "feels_like_f": 70,
-            "humidity": 50,
-            "wind_mph": 5,
-            "location": "New York",
-            "conditions": "Configure WEATHERAPI_KEY",
-            "hourly": [],
-            "daily": []
-        })
+        return jsonify(_weather_fallback("Configure WEATHERAPI_KEY"))
 
-    try:
-        url = f"https://api.weatherapi.com/v1/forecast.json?key={api_key}&q={location}&days=7&aqi=no&alerts=no"
-        response = requests.get(url, timeout=8)
-        response.raise_for_status()
-        data = response.json()
-
-        current = data.get("current", {})
-        location_data = data.get("location", {})
-        forecast_days = data.get("forecast", {}).get("forecastday", [])
-
-        # Build hourly forecast (next 5 hours from now)
-        hourly = []
-        from datetime import datetime as dt
-        now_epoch = current.get("last_updated_epoch", 0)
-        
-        for day in forecast_days[:2]:  # Today and tomorrow
-            for hour in day.get("hour", []):
-                hour_epoch = hour.get("time_epoch", 0)
-                if hour_epoch > now_epoch and len(hourly) < 5:
-                    hourly.append({
-                        "time": hour.get("time", "")[-5:],  # "HH:MM"
-                        "temp_f": round(hour.get("temp_f", 0)),
-                        "condition": hour.get("condition", {}).get("text", ""),
-                        "code": hour.get("condition", {}).get("code", 1000),
-                        "chance_of_rain": hour.get("chance_of_rain", 0)
-                    })
-
-        # Build daily forecast (7 days)
-        daily = []
-        for day in forecast_days:
-            day_data = day.get("day", {})
-            daily.append({
-                "date": day.get("date", ""),
-                "high_f": round(day_data.get("maxtemp_f", 0)),
-                "low_f": round(day_data.get("mintemp_f", 0)),
-                "condition": day_data.get("condition", {}).get("text", ""),
-                "code": day_data.get("condition", {}).get("code", 1000),
-                "chance_of_rain": day_data.get("daily_chance_of_rain", 0)
-            })
+    # Configured locations come from the weather collector's snapshot
+    from services.scheduler import scheduled
+    for entry in scheduled("weather") or ():
+        if entry.get("ok") and entry.get("query", "").lower() == location.lower():
+            return jsonify({k: v for k, v in entry.items() if k not in ("query", "ok")})
 
-        return jsonify({
-            "temperature_f": round(current.get("temp_f", 0)),
-            "feels_like_f": round(current.get("feelslike_f", 0)),
-            "humidity": current.get("humidity", 0),
-            "wind_mph": round(current.get("wind_mph", 0)),
-            "location": f"{location_data.get('name', '')}, {location_data.get('region', '')}",
-            "conditions": current.get("condition", {}).get("text", ""),
-            "code": current.get("condition", {}).get("code", 1000),
-            "hourly": hourly,
-            "daily": daily
-        })
+    try:
+        return jsonify(weather_service.get_forecast(api_key, location))
 
     except Exception as e:
         logging.error(f"Weather API error: {e}")
-        return jsonify({
-            "temperature_f": "--",
-            "feels_like_f": "--",
-            "humidity": "--",
-            "wind_mph": "--",
-            "location": "Unavailable",
-            "conditions": "API Error",
-            "hourly": [],
-            "daily": []
-        })
+        return jsonify(_weather_unavailable())
+
+
+@bp.get("/weather/all")
+@admit("upstream")
+def weather_all():
+    """Forecasts for every location in WEATHER_LOCATIONS, fetched concurrently."""
+    from services import weather as weather_service
+    _reload_env()
+
+    locations = weather_service.configured_locations()
+    api_key = os.environ.get("WEATHERAPI_KEY")
+    if not weather_service.requests or not api_key:
+        reason = "Install requests library" if not weather_service.requests else "Configure WEATHERAPI_KEY"
+        return jsonify({"locations": [{"query": loc, "ok": False, "error": reason} for loc in locations]})
+
+    from services.scheduler import scheduled
+    forecasts = scheduled("weather")
+    if forecasts is None or [f.get("query") for f in forecasts] != locations:
+        forecasts = weather_service.get_forecasts(api_key, locations)
+    return jsonify({"locations": forecasts})
+
 
 # -------------------------------
 # System Info
 # -------------------------------
 @bp.get("/system")
 def api_system():
+    from services.alerts import get_alert_engine
+    from services.history import record_system
+    from services.scheduler import scheduled
     from services.system_info import get_system_info
-    return jsonify(get_system_info())
+
+    # The scheduler's latest sample when it is running (alerts/history already saw it)
+    info = scheduled("system")
+    if info is None:
+        info = get_system_info()
+        get_alert_engine().observe("system", info)
+        record_system(info)
+    return jsonify(info)
+
+
+# -------------------------------
+# Request Coalescing Counters
+# -------------------------------
+@bp.get("/coalescing")
+def coalescing():
+    # Import collectors so their groups are registered even before first use
+    import services.network_devices, services.system_info, services.weather  # noqa: F401
+    from services.singleflight import coalescing_stats
+    return jsonify({"groups": coalescing_stats()})
 
 
 # -------------------------------
 # Network Devices
 # -------------------------------
 @bp.get("/network/devices")
+@admit("subprocess")
 def network_devices():
     try:
-        from services.network_devices import get_network_devices, guess_device_type
-
-        devices = get_network_devices()
-        for device in devices:
-            device["device_type"] = guess_device_type(device["vendor"], device["mac"])
-
+        from services.alerts import get_alert_engine
+        from services.history import record_devices
+        from services.hostnames import enrich_devices
+        from services.network_devices import get_network_devices
+        from services.scheduler import scheduled
+
+        devices = scheduled("network_devices")
+        if devices is None:
+            # device_type is already filled in by get_network_devices()
+            devices = get_network_devices()
+            get_alert_engine().observe("devices", devices)
+            record_devices(devices)
+        # cached names only; misses resolve in the background for the next poll
+        devices = enrich_devices(devices)
         return jsonify({"devices": devices, "count": len(devices)})
     except Exception as e:
         return jsonify({"devices": [], "count": 0, "error": str(e)}), 500
 
 
+@bp.get("/network/hostnames")
+def network_hostnames():
+    from services.hostnames import get_hostname_enricher, hostnames_enabled
+    return jsonify({"enabled": hostnames_enabled(), **get_hostname_enricher().stats()})
+
+
+@bp.get("/network/topology")
+def network_topology():
+    from services.net_topology import topology_status
+    return jsonify(topology_status())
+
+
+# -------------------------------
+# Scheduler
+# -------------------------------
+@bp.get("/scheduler")
+def scheduler_status():
+    from services.scheduler import get_scheduler, scheduler_enabled
+    return jsonify({"enabled": scheduler_enabled(), **get_scheduler().status()})
+
+
+# -------------------------------
+# Self-Monitoring
+# -------------------------------
+@bp.get("/self")
+def self_status():
+    from services.selfmon import get_self_monitor
+    return jsonify(get_self_monitor().report())
+
+
+@bp.get("/self/allocations")
+def self_allocations():
+    """Top allocation sites (and diff vs. baseline); needs NETHEALTH_TRACEMALLOC."""
+    from services.selfmon import get_self_monitor
+    limit = max(1, min(request.args.get("limit", 20, type=int), 200))
+    group_by = request.args.get("group_by", "lineno")
+    if group_by not in ("lineno", "filename", "traceback"):
+        return jsonify({"error": "group_by must be lineno, filename or traceback"}), 400
+    try:
+        return jsonify(get_self_monitor().allocations(limit, group_by))
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+
+
+@bp.post("/self/allocations/baseline")
+def self_allocations_baseline():
+    from services.selfmon import get_self_monitor
+    try:
+        return jsonify({"ok": True, **get_self_monitor().take_baseline()})
+    except RuntimeError as e:
+        return jsonify({"ok": False, "error": str(e)}), 409
+
+
+# -------------------------------
+# Record / Replay
+# -------------------------------
+@bp.get("/replay")
+def replay_status():
+    from services.replay import status
+    return jsonify(status())
+
+
+# -------------------------------
+# Admission Control Counters
+# -------------------------------
+@bp.get("/admission")
+def admission():
+    from api.admission import admission_enabled, admission_stats
+    return jsonify({"enabled": admission_enabled(), "classes": admission_stats()})
+
+
+# -------------------------------
+# Alerts
+# -------------------------------
+@bp.get("/alerts")
+def alerts():
+    from services.alerts import get_alert_engine
+    engine = get_alert_engine()
+    return jsonify({
+        "active": engine.active(),
+        "recent": engine.history(),
+        "rules": engine.rules_status(),
+    })
+
+
+# -------------------------------
+# Bulk Export (streamed)
+# -------------------------------
+@bp.get("/export/<dataset>")
+def export(dataset: str):
+    """Stream system metrics, device sightings or price history as NDJSON/CSV/Arrow/Parquet."""
+    from services.export import EXTENSIONS, FORMATS, ExportError, parse_time, stream_export
+
+    fmt = request.args.get("format", "ndjson").lower()
+    try:
+        chunks = stream_export(dataset, fmt, parse_time(request.args.get("start")), parse_time(request.args.get("end")))
+    except ExportError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # No Content-Length: the body goes out with chunked transfer encoding
+    return Response(
+        stream_with_context(chunks),
+        mimetype=FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="nethealth-{dataset}.{EXTENSIONS[fmt]}"'},
+    )
+
+
+# -------------------------------
+# Fleet (multi-host hub)
+# -------------------------------
+@bp.post("/fleet/ingest")
+def fleet_ingest():
+    import hmac
+    from services.fleet import MAX_INGEST_BYTES, IngestError, PayloadTooLarge, decode_body, fleet_store
+
+    token = os.environ.get("FLEET_TOKEN", "")
+    if token and not hmac.compare_digest(request.headers.get("X-Fleet-Token", ""), token):
+        return jsonify({"ok": False, "error": "invalid fleet token"}), 401
+    if (request.content_length or 0) > MAX_INGEST_BYTES:
+        return jsonify({"ok": False, "error": "payload too large"}), 413
+
+    try:
+        payload = decode_body(request.get_data(cache=False), request.headers.get("Content-Encoding"))
+        return jsonify(fleet_store.ingest(payload))
+    except PayloadTooLarge as e:
+        return jsonify({"ok": False, "error": str(e)}), 413
+    except IngestError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+
+@bp.get("/fleet")
+def fleet():
+    from services.fleet import fleet_store
+    hosts = fleet_store.summary()
+    return jsonify({"hosts": hosts, "count": len(hosts)})
+
+
+@bp.get("/fleet/<host>")
+def fleet_host(host: str):
+    from services.fleet import fleet_store
+    entry = fleet_store.get(host)
+    if entry is None:
+        return jsonify({"error": "unknown host"}), 404
+    state = entry["state"]
+    return jsonify({
+        "host": entry["host"],
+        "seq": entry["seq"],
+        "last_seen": int(entry["last_seen"]),
+        "system": state.get("system", {}),
+        "devices": list((state.get("devices") or {}).values()),
+    })
+
+
 # Alias so app.py can import easily
 api_bp = bp
@@ -1,6 +1,8 @@
 # app.py
 import argparse
-from flask import Flask, render_template
+import mimetypes
+from flask import Flask, abort, render_template, request, send_file, url_for
+from werkzeug.security import safe_join
 from api.routes import api_bp
 from dotenv import load_dotenv
 import os
@@ -21,17 +23,70 @@ def create_app():
     def clock():
         return render_template("clock.html")
 
+    # Built static assets (scripts/build_assets.py)
+    from services.assets import DIST_DIR, assets_enabled, get_asset_manifest
+
+    @app.template_global()
+    def asset_url(filename):
+        """Content-hashed URL from the asset manifest, or the plain static URL if not built."""
+        hashed = get_asset_manifest().lookup(filename) if assets_enabled() else None
+        if hashed is None:
+            return url_for("static", filename=filename)
+        return url_for("assets", filename=hashed)
+
+    @app.route("/assets/<path:filename>")
+    def assets(filename):
+        path = safe_join(str(DIST_DIR), filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        encoding = None
+        for candidate, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if request.accept_encodings[candidate] and os.path.isfile(path + suffix):
+                path, encoding = path + suffix, candidate
+                break
+        response = send_file(path, mimetype=mimetype, conditional=True, etag=True)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        # the name changes with the content, so a response never goes stale
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
     return app
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--port", type=int, default=5050, help="Port to run the app on")
+    parser.add_argument("--agent", metavar="HUB_URL", help="Run as an agent pushing snapshots to a hub instead of serving the UI")
+    parser.add_argument("--host-id", help="Agent host name reported to the hub (default: hostname)")
+    parser.add_argument("--interval", type=float, default=10.0, help="Agent collection interval in seconds")
+    parser.add_argument("--batch", type=int, default=1, help="Agent snapshots per upload")
     args = parser.parse_args()
 
+    if args.agent:
+        from services.agent import Agent
+        agent = Agent(args.agent, host_id=args.host_id, interval=args.interval,
+                      batch_size=args.batch, token=os.getenv("FLEET_TOKEN"))
+        print(f"Agent {agent.host_id} pushing to {agent.hub_url} every {args.interval}s")
+        try:
+            agent.run_forever()
+        except KeyboardInterrupt:
+            agent.stop()
+        sys.exit(0)
+
     # Confirm environment loaded
     print("Loaded environment:")
     print(f"  WEATHERAPI_KEY: {'set' if os.getenv('WEATHERAPI_KEY') else 'missing'}")
     print(f"  WEATHER_LOCATION: {os.getenv('WEATHER_LOCATION', 'not set')}")
 
+    # debug=True runs this file twice (reloader parent + serving child); start
+    # background work only in the child that serves requests
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        from services.scheduler import start_scheduler
+        from services.selfmon import get_self_monitor
+        get_self_monitor()  # start RSS/GC tracking (and tracemalloc if NETHEALTH_TRACEMALLOC is set)
+        start_scheduler()   # collectors publish snapshots that /api/system etc. serve
+
     app = create_app()
     app.run(host="0.0.0.0", port=args.port, debug=True)
\ No newline at end of file
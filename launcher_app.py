@@ -9,6 +9,7 @@ Responsibilities:
 - Locate project root
 - Create venv if missing
 - Install requirements
+- Build minified, content-hashed static assets
 - Launch Flask server
 - Open browser automatically
 - macOS: supports .app bundle wrapping
@@ -85,7 +86,19 @@ def install_requirements():
 
 
 # -------------------------------------------------
-# 4. Launch Flask app
+# 4. Build static assets
+# -------------------------------------------------
+def build_assets():
+    # Unchanged files are reused, so this is quick after the first run.
+    # A failed build is not fatal: pages fall back to the unbuilt files.
+    print("[launcher] Building static assets…")
+    result = subprocess.run([PYTHON, "scripts/build_assets.py"], cwd=str(PROJECT_ROOT))
+    if result.returncode != 0:
+        print("[launcher] Asset build failed; serving unbuilt assets.")
+
+
+# -------------------------------------------------
+# 5. Launch Flask app
 # -------------------------------------------------
 def launch_flask():
     print("[launcher] Starting Flask app…")
@@ -105,7 +118,7 @@ def launch_flask():
 
 
 # -------------------------------------------------
-# 5. Main Routine
+# 6. Main Routine
 # -------------------------------------------------
 def main():
     print("[launcher] ===== NetHealth2025 Launcher =====")
@@ -113,6 +126,7 @@ def main():
     ensure_venv()
     activate_venv()
     install_requirements()
+    build_assets()
 
     process = launch_flask()
 
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Build static/ into minified, precompressed, content-hashed files in static/dist/.
+
+Pages reference assets through the manifest this writes, so the hashed files
+are served with immutable cache headers. Only changed sources are rebuilt.
+The launcher runs this on every start.
+
+    python scripts/build_assets.py            # incremental
+    python scripts/build_assets.py --force    # rebuild everything
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services.assets import DIST_DIR, STATIC_DIR, brotli, build_assets  # noqa: E402
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Build content-hashed static assets")
+    parser.add_argument("--static", type=Path, default=STATIC_DIR, help="Source directory")
+    parser.add_argument("-o", "--output", type=Path, default=DIST_DIR)
+    parser.add_argument("--force", action="store_true", help="Rebuild unchanged files too")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = build_assets(args.static, args.output, force=args.force)
+    except Exception as e:
+        print(f"✗ Error building assets: {e}")
+        return 1
+
+    saved = summary["bytes_in"] - summary["bytes_out"]
+    print(f"✓ {summary['assets']} assets in {args.output}: {summary['built']} built, "
+          f"{summary['reused']} unchanged, {summary['removed']} stale files removed")
+    if summary["built"]:
+        print(f"  {summary['bytes_in']:,} → {summary['bytes_out']:,} bytes ({saved:,} saved before compression)")
+    if brotli is None:
+        print("  brotli not installed; only .gz variants were written (pip install brotli)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,40 +1,100 @@
 #!/usr/bin/env python3
 """
-Script to download the IEEE OUI database for MAC address vendor lookup.
-Run this once to populate data/oui.txt
+Refresh the IEEE OUI database used for MAC address vendor lookup.
+
+Sends a conditional request (If-None-Match / If-Modified-Since from the last
+refresh), parses the registry while it downloads, and compiles it straight
+into data/oui.json, which is swapped in atomically. A running server picks
+the new table up within a few seconds, without a restart.
+
+    python scripts/download_oui.py            # no-op if the registry is unchanged
+    python scripts/download_oui.py --force    # ignore the cached validators
 """
 
-import urllib.request
+import argparse
+import io
 import ssl
+import sys
+import time
+import urllib.error
+import urllib.request
 from pathlib import Path
 
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services.oui import OUI_COMPILED, artifact_meta, compile_lines  # noqa: E402
+
+try:
+    import certifi  # optional: python.org macOS builds ship without a CA bundle
+except ImportError:
+    certifi = None
+
 OUI_URL = "https://standards-oui.ieee.org/oui/oui.txt"
-ROOT = Path(__file__).resolve().parents[1]  # Go up TWO levels to project root
-DATA_DIR = ROOT / "data"
-OUI_FILE = DATA_DIR / "oui.txt"
-
-def download_oui_database():
-    """Download the IEEE OUI database."""
-    print("Downloading IEEE OUI database...")
-    print(f"URL: {OUI_URL}")
-    
-    DATA_DIR.mkdir(exist_ok=True)
-    
+# The real registry has ~38k entries; anything far smaller is a truncated/garbage download
+MIN_ENTRIES = 10_000
+USER_AGENT = "NetHealth-OUI-Refresh/1.0"
+
+
+def _ssl_context() -> ssl.SSLContext:
+    if certifi is not None:
+        return ssl.create_default_context(cafile=certifi.where())
+    return ssl.create_default_context()
+
+
+def refresh_oui(url: str = OUI_URL, dest: Path = OUI_COMPILED, force: bool = False,
+                timeout: float = 60.0, min_entries: int = MIN_ENTRIES) -> str:
+    """Returns "updated" or "not-modified"; raises on network/parse errors (old artifact kept)."""
+    meta = {} if force else artifact_meta(dest)
+    headers = {"User-Agent": USER_AGENT}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    req = urllib.request.Request(url, headers=headers)
+    context = _ssl_context() if url.startswith("https:") else None
     try:
-        # Bypass SSL verification for macOS
-        ssl._create_default_https_context = ssl._create_unverified_context
-        urllib.request.urlretrieve(OUI_URL, OUI_FILE)
-        print(f"✓ Successfully downloaded to: {OUI_FILE}")
-        print(f"  File size: {OUI_FILE.stat().st_size:,} bytes")
+        resp = urllib.request.urlopen(req, timeout=timeout, context=context)
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return "not-modified"
+        raise
+
+    with resp:
+        lines = io.TextIOWrapper(resp, encoding="utf-8", errors="ignore", newline="")
+        compile_lines(lines, dest, {
+            "source": url,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "fetched_at": int(time.time()),
+        }, min_entries=min_entries)
+    return "updated"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Refresh and compile the IEEE OUI database")
+    parser.add_argument("--url", default=OUI_URL)
+    parser.add_argument("-o", "--output", type=Path, default=OUI_COMPILED)
+    parser.add_argument("--force", action="store_true", help="Download even if unchanged")
+    args = parser.parse_args(argv)
+
+    print(f"Refreshing IEEE OUI database from {args.url}")
+    try:
+        status = refresh_oui(args.url, args.output, force=args.force)
     except Exception as e:
-        print(f"✗ Error downloading OUI database: {e}")
-        print("\nAlternative: Manually download from:")
-        print(f"  {OUI_URL}")
-        print(f"  and save to: {OUI_FILE}")
-        return False
-    
-    return True
+        print(f"✗ Error refreshing OUI database: {e}")
+        print("  The existing database (if any) was left in place.")
+        return 1
+
+    meta = artifact_meta(args.output)
+    if status == "not-modified":
+        print(f"✓ Already up to date ({meta.get('count', 0):,} entries in {args.output})")
+    else:
+        print(f"✓ Compiled {meta.get('count', 0):,} entries to {args.output}")
+    return 0
+
 
 if __name__ == "__main__":
-    success = download_oui_database()
-    exit(0 if success else 1)
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Export NetHealth history without going through the web server.
+
+Examples:
+    python scripts/export.py system --format csv --start 2026-01-01 -o system.csv
+    python scripts/export.py devices --format parquet -o devices.parquet
+    python scripts/export.py prices | gzip > prices.ndjson.gz
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services.export import DATASETS, FORMATS, ExportError, parse_time, stream_export  # noqa: E402
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Stream NetHealth history to a file or stdout")
+    parser.add_argument("dataset", choices=DATASETS)
+    parser.add_argument("--format", default="ndjson", choices=sorted(FORMATS))
+    parser.add_argument("--start", help="Start time (epoch seconds or ISO date), inclusive")
+    parser.add_argument("--end", help="End time (epoch seconds or ISO date), exclusive")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    try:
+        chunks = stream_export(args.dataset, args.format, parse_time(args.start), parse_time(args.end))
+    except ExportError as e:
+        print(f"✗ {e}", file=sys.stderr)
+        return 2
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+        else:
+            out.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Load generator that simulates many open NetHealth dashboards.
+
+Each simulated client replays the polling schedule of static/js/dashboard.js:
+the initial burst from init(), the first-time setup check two seconds later,
+and the eight setInterval timers. Timers that only touch the browser (clock,
+quote rotation, battery) are kept in the schedule but issue no request.
+
+By default a local instance is started in-process with stubbed collectors so
+results measure the Flask stack, not the ARP cache or WeatherAPI. With
+--replay the real collectors serve a recording (NETHEALTH_RECORD=file)
+instead, on the same compressed timeline as the simulated clients.
+
+Examples:
+    python scripts/load_test.py --clients 50 --duration 60 --speed 20
+    python scripts/load_test.py --replay data/recording.ndjson --speed 20
+    python scripts/load_test.py --url http://127.0.0.1:5050 --clients 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# (name, interval seconds, endpoint or None for browser-only timers)
+# Mirrors startTimers() in static/js/dashboard.js.
+SCHEDULE: List[Tuple[str, float, Optional[str]]] = [
+    ("updateClock", 1, None),
+    ("rotateQuote", 15, None),
+    ("loadPrices", 5 * 60, "/api/prices"),
+    ("updateSystem", 30, None),
+    ("loadSystemFromServer", 60, "/api/system"),
+    ("measureLatency", 30, "/api/health"),
+    ("loadNetworkDevices", 2 * 60, "/api/network/devices"),
+    ("loadWeather", 10 * 60, "/api/weather"),
+]
+
+# Requests fired once by init() and the delayed checkFirstTimeSetup().
+INITIAL = [
+    "/api/weather",
+    "/api/quotes",
+    "/api/prices",
+    "/api/system",
+    "/api/health",
+    "/api/network/devices",
+]
+FIRST_TIME_SETUP = (2.0, "/api/settings/api_status")
+
+# fetchJSON() aborts after 6 s
+CLIENT_TIMEOUT = 6.0
+
+
+# -------------------------------
+# Stubbed local instance
+# -------------------------------
+def _stub_system_info() -> dict:
+    return {
+        "timestamp": int(time.time()),
+        "platform": "Linux",
+        "platform_release": "stub",
+        "machine": "x86_64",
+        "architecture": "64bit",
+        "cpu": "stub",
+        "cpu_cores": 4,
+        "boot_time": 0,
+        "battery": {"level": None, "charging": None},
+        "memory": {"used_mb": 2048.0, "total_mb": 8192.0, "percent": 25.0},
+        "storage": {"total_gb": 100.0, "quota_gb": 100.0, "used_gb": 40.0, "free_gb": 60.0, "percent": 40.0},
+        "network": {
+            "online": True,
+            "effective_type": None,
+            "downlink_mbps": None,
+            "rtt_ms": 12.0,
+            "interface": "eth0",
+            "interface_friendly": "Ethernet",
+        },
+        "uptime_seconds": 3600,
+    }
+
+
+def _stub_network_devices() -> list[dict]:
+    return [
+        {
+            "ip": f"192.168.1.{i}",
+            "mac": f"aa:bb:cc:00:00:{i:02x}",
+            "vendor": "Stub Vendor",
+            "interface": "eth0",
+            "device_type": "Unknown",
+        }
+        for i in range(2, 22)
+    ]
+
+
+class _StubResponse:
+    status_code = 200
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return {
+            "location": {"name": "Stubville", "region": "Nowhere"},
+            "current": {"temp_f": 70, "feelslike_f": 69, "humidity": 40, "wind_mph": 3,
+                        "condition": {"text": "Clear", "code": 1000}, "last_updated_epoch": 0},
+            "forecast": {"forecastday": []},
+        }
+
+
+class _StubRequests:
+    @staticmethod
+    def get(*args, **kwargs):
+        return _StubResponse()
+
+    @classmethod
+    def Session(cls):
+        return cls
+
+
+def install_stubs() -> None:
+    """Replace live collectors and the upstream HTTP client with canned data."""
+    import os
+    import services.system_info
+    import services.network_devices
+    import services.weather
+    from services.alerts import get_alert_engine
+
+    os.environ.setdefault("WEATHERAPI_KEY", "stub-key-for-load-testing")
+    # stub devices are not on this network: never send PTR/mDNS/NetBIOS probes for them
+    os.environ["NETHEALTH_HOSTNAMES"] = "off"
+    # ...and keep stub samples out of data/history.db and away from the alert webhook
+    os.environ["NETHEALTH_HISTORY"] = "off"
+    os.environ["ALERT_WEBHOOK_URL"] = ""
+    get_alert_engine()  # built now, without a sink, before a .env reload could add one
+    services.system_info.get_system_info = _stub_system_info
+    services.network_devices.get_network_devices = _stub_network_devices
+    services.weather.requests = _StubRequests
+
+
+def install_replay(path: str, speed: float = 1.0) -> None:
+    """Serve collector outputs and upstream responses from a recording."""
+    import os
+    from services import replay
+
+    os.environ.setdefault("WEATHERAPI_KEY", "replay-key-for-load-testing")
+    replay.configure(replay=path, speed=speed)
+
+
+def start_local_server(port: int = 0) -> Tuple[str, object]:
+    """Start the app in a background thread; returns (base_url, server)."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from app import create_app
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", port, create_app(), threaded=True, request_handler=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+# -------------------------------
+# Async HTTP client
+# -------------------------------
+async def http_get(host: str, port: int, path: str, timeout: float) -> int:
+    """Minimal HTTP/1.1 GET returning the status code; the body is drained."""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+            "Accept: application/json\r\nConnection: close\r\n\r\n".encode("ascii")
+        )
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        await asyncio.wait_for(reader.read(), timeout)
+        parts = status_line.split()
+        return int(parts[1]) if len(parts) >= 2 else 0
+    finally:
+        writer.close()
+
+
+class Stats:
+    """Per-endpoint latency samples and error counts."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, path: str, latency_ms: float, status: int) -> None:
+        self.latencies[path].append(latency_ms)
+        self.statuses[path][status] += 1
+        if status == 0 or status >= 400:
+            self.errors[path] += 1
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for path in sorted(self.latencies):
+            samples = sorted(self.latencies[path])
+            n = len(samples)
+            endpoints[path] = {
+                "requests": n,
+                "throughput_rps": round(n / elapsed, 2) if elapsed > 0 else None,
+                "errors": self.errors[path],
+                "error_rate": round(self.errors[path] / n, 4) if n else 0.0,
+                "p50_ms": _percentile(samples, 50),
+                "p90_ms": _percentile(samples, 90),
+                "p99_ms": _percentile(samples, 99),
+                "max_ms": round(samples[-1], 2) if samples else None,
+                "statuses": dict(self.statuses[path]),
+            }
+        total = sum(e["requests"] for e in endpoints.values())
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "total_requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed > 0 else None,
+            "endpoints": endpoints,
+        }
+
+
+def _percentile(sorted_samples: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return None
+    k = max(0, min(len(sorted_samples) - 1, math.ceil(pct / 100 * len(sorted_samples)) - 1))
+    return round(sorted_samples[k], 2)
+
+
+# -------------------------------
+# Simulated dashboard
+# -------------------------------
+async def _request(base: Tuple[str, int], path: str, stats: Stats) -> None:
+    host, port = base
+    t0 = time.perf_counter()
+    try:
+        status = await http_get(host, port, path, CLIENT_TIMEOUT)
+    except (OSError, asyncio.TimeoutError, ValueError):
+        status = 0
+    stats.record(path, (time.perf_counter() - t0) * 1000.0, status)
+
+
+async def _timer(base, path: Optional[str], interval: float, deadline: float, stats: Stats) -> None:
+    loop = asyncio.get_running_loop()
+    next_fire = loop.time() + interval
+    while next_fire < deadline:
+        await asyncio.sleep(max(0.0, next_fire - loop.time()))
+        if path:
+            # setInterval does not wait for the previous fetch to settle
+            asyncio.ensure_future(_request(base, path, stats))
+        next_fire += interval
+
+
+async def simulate_client(base, speed: float, deadline: float, ramp: float, stats: Stats) -> None:
+    """One dashboard tab: init() burst, first-time setup check, then timers."""
+    await asyncio.sleep(random.uniform(0, ramp))
+    await asyncio.gather(*(_request(base, p, stats) for p in INITIAL))
+
+    delay, path = FIRST_TIME_SETUP
+    tasks = [_delayed(base, path, delay / speed, stats)]
+    tasks += [_timer(base, p, interval / speed, deadline, stats) for _, interval, p in SCHEDULE]
+    await asyncio.gather(*tasks)
+
+
+async def _delayed(base, path: str, delay: float, stats: Stats) -> None:
+    await asyncio.sleep(delay)
+    await _request(base, path, stats)
+
+
+async def run_load(base_url: str, clients: int, duration: float, speed: float = 1.0, ramp: float = 1.0) -> dict:
+    """Run N simulated dashboards for `duration` wall-clock seconds."""
+    parts = urlsplit(base_url)
+    base = (parts.hostname or "127.0.0.1", parts.port or 80)
+    stats = Stats()
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    deadline = start + duration
+
+    await asyncio.gather(*(simulate_client(base, speed, deadline, ramp, stats) for _ in range(clients)))
+
+    # let fire-and-forget timer requests finish
+    pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+    if pending:
+        await asyncio.wait(pending, timeout=CLIENT_TIMEOUT)
+
+    report = stats.report(loop.time() - start)
+    report.update({"clients": clients, "speed": speed})
+    return report
+
+
+def print_report(report: dict) -> None:
+    print(f"clients={report['clients']} speed={report['speed']}x elapsed={report['elapsed_s']}s "
+          f"requests={report['total_requests']} throughput={report['throughput_rps']} req/s")
+    header = f"{'endpoint':28} {'reqs':>6} {'rps':>8} {'err%':>6} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}"
+    print(header)
+    print("-" * len(header))
+    for path, e in report["endpoints"].items():
+        print(f"{path:28} {e['requests']:>6} {e['throughput_rps']:>8} {e['error_rate'] * 100:>6.1f} "
+              f"{e['p50_ms']:>8} {e['p90_ms']:>8} {e['p99_ms']:>8} {e['max_ms']:>8}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Simulate concurrent NetHealth dashboards")
+    parser.add_argument("--clients", type=int, default=20, help="Number of simulated dashboards")
+    parser.add_argument("--duration", type=float, default=30.0, help="Wall-clock seconds to run")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Time compression factor (e.g. 60 makes the 10 min timer fire every 10 s)")
+    parser.add_argument("--ramp", type=float, default=1.0, help="Spread client start over this many seconds")
+    parser.add_argument("--url", help="Target an already running instance instead of a stubbed local one")
+    parser.add_argument("--replay", metavar="FILE", help="Serve a NETHEALTH_RECORD recording instead of stubs")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        if args.replay:
+            install_replay(args.replay, args.speed)
+        else:
+            install_stubs()
+        base_url, server = start_local_server()
+
+    try:
+        report = asyncio.run(run_load(base_url, args.clients, args.duration, args.speed, args.ramp))
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
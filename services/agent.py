@@ -0,0 +1,142 @@
+# services/agent.py
+"""
+Agent side of multi-host mode.
+
+Runs the local collectors on an interval and pushes gzip-compressed batches
+of delta snapshots to a central NetHealth hub (POST /api/fleet/ingest).
+"""
+from __future__ import annotations
+
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from services.fleet import encode_body, make_patch
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+# Cap on unsent snapshots kept while the hub is unreachable
+MAX_PENDING = 60
+
+
+def default_snapshot() -> Dict[str, Any]:
+    """Collect one snapshot from the local collectors."""
+    from services.network_devices import get_network_devices
+    from services.system_info import get_system_info
+
+    # Devices keyed by IP so deltas only carry the neighbours that changed
+    devices = {d["ip"]: d for d in get_network_devices()}
+    return {"system": get_system_info(), "devices": devices}
+
+
+class Agent:
+    """
+    Collects snapshots and ships them to a hub.
+
+    Snapshots are queued as merge-patch deltas against the previous one and
+    flushed every `batch_size` ticks. If a send fails the queue is kept (up
+    to MAX_PENDING); if the hub reports a gap, the next snapshot is full.
+    """
+
+    def __init__(
+        self,
+        hub_url: str,
+        host_id: Optional[str] = None,
+        interval: float = 10.0,
+        batch_size: int = 1,
+        collect: Callable[[], Dict[str, Any]] = default_snapshot,
+        token: Optional[str] = None,
+        timeout: float = 5.0,
+    ):
+        if requests is None:
+            raise RuntimeError("Agent mode requires the requests library")
+        self.hub_url = hub_url.rstrip("/")
+        self.host_id = host_id or socket.gethostname()
+        self.interval = interval
+        self.batch_size = max(1, batch_size)
+        self.collect = collect
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json", "Content-Encoding": "gzip"})
+        if token:
+            self.session.headers["X-Fleet-Token"] = token
+
+        self._seq = 0
+        self._last: Optional[Dict[str, Any]] = None   # last snapshot queued
+        self._need_full = True
+        self._pending: List[Dict[str, Any]] = []
+        self._stop = threading.Event()
+        self.sent_batches = 0
+        self.sent_bytes = 0
+        self.failures = 0
+
+    # ---------- snapshot queue ----------
+    def _enqueue(self, snapshot: Dict[str, Any]) -> None:
+        self._seq += 1
+        if self._need_full or self._last is None:
+            entry = {"seq": self._seq, "ts": time.time(), "full": True, "data": snapshot}
+            self._need_full = False
+        else:
+            entry = {"seq": self._seq, "ts": time.time(), "data": make_patch(self._last, snapshot) or {}}
+        self._last = snapshot
+        self._pending.append(entry)
+        if len(self._pending) > MAX_PENDING:
+            # Dropping breaks the delta chain: restart it from a full snapshot
+            self._pending.clear()
+            self._seq += 1
+            self._pending.append({"seq": self._seq, "ts": time.time(), "full": True, "data": snapshot})
+
+    def flush(self) -> bool:
+        """Send everything queued; returns True when the hub accepted it."""
+        if not self._pending:
+            return True
+        body = encode_body({"host": self.host_id, "snapshots": self._pending})
+        try:
+            response = self.session.post(f"{self.hub_url}/api/fleet/ingest", data=body, timeout=self.timeout)
+            reply = response.json() if response.content else {}
+        except Exception as e:
+            self.failures += 1
+            print(f"Agent: failed to reach hub: {e}")
+            return False
+
+        if response.status_code == 200 and reply.get("ok"):
+            self._pending.clear()
+            self.sent_batches += 1
+            self.sent_bytes += len(body)
+            return True
+        if reply.get("resync"):
+            self._pending.clear()
+            self._need_full = True
+            return False
+        self.failures += 1
+        print(f"Agent: hub rejected batch ({response.status_code}): {reply.get('error')}")
+        return False
+
+    def tick(self) -> None:
+        """Collect one snapshot and flush when the batch is full."""
+        try:
+            snapshot = self.collect()
+        except Exception as e:
+            print(f"Agent: collector error: {e}")
+            return
+        self._enqueue(snapshot)
+        if len(self._pending) >= self.batch_size and not self.flush() and self._need_full:
+            # Hub asked for a resync: resend right away rather than a tick later
+            self._enqueue(snapshot)
+            self.flush()
+
+    # ---------- loop ----------
+    def run_forever(self) -> None:
+        next_run = time.monotonic()
+        while not self._stop.is_set():
+            self.tick()
+            next_run += self.interval
+            self._stop.wait(max(0.0, next_run - time.monotonic()))
+        self.flush()
+
+    def stop(self) -> None:
+        self._stop.set()
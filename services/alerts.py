@@ -0,0 +1,482 @@
+# services/alerts.py
+"""
+Incremental alert rules evaluated against each new collector sample.
+
+Rules are declarative dicts (see data/alert_rules.json):
+
+    {"name": "memory_high", "type": "threshold", "metric": "memory.percent",
+     "op": ">", "value": 90, "for": 60}
+    {"name": "rtt_spike", "type": "threshold", "metric": "network.rtt_ms",
+     "agg": "avg", "window": 120, "op": ">", "value": 250}
+    {"name": "disk_filling", "type": "rate", "metric": "storage.percent",
+     "window": 1800, "per": 3600, "op": ">", "value": 2}
+    {"name": "new_device", "type": "new_device", "source": "devices"}
+
+Window aggregates are maintained incrementally (running sum, monotonic
+deques), so each sample costs amortised O(1) per rule however long the
+window is. Firing/resolved transitions go to sinks; a rule that stays
+firing is not re-sent.
+"""
+from __future__ import annotations
+
+import json
+import operator
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+ROOT = Path(__file__).resolve().parents[1]
+RULES_FILE = ROOT / "data" / "alert_rules.json"
+
+OPS: Dict[str, Callable[[float, float], bool]] = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+# -------------------------------
+# Sliding-window aggregates
+# -------------------------------
+class SlidingWindow:
+    """
+    Time-based window with O(1) amortised push and O(1) queries for
+    last/avg/min/max/rate. Samples older than `span` seconds are evicted
+    as new ones arrive.
+    """
+
+    __slots__ = ("span", "_items", "_sum", "_max", "_min")
+
+    def __init__(self, span: float):
+        self.span = span
+        self._items: Deque[Tuple[float, float]] = deque()
+        self._sum = 0.0
+        self._max: Deque[Tuple[float, float]] = deque()  # decreasing values
+        self._min: Deque[Tuple[float, float]] = deque()  # increasing values
+
+    def push(self, ts: float, value: float) -> None:
+        self._items.append((ts, value))
+        self._sum += value
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((ts, value))
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((ts, value))
+        self._evict(ts)
+
+    def _evict(self, now: float) -> None:
+        cutoff = now - self.span
+        items = self._items
+        while items and items[0][0] < cutoff:
+            _, v = items.popleft()
+            self._sum -= v
+        while self._max and self._max[0][0] < cutoff:
+            self._max.popleft()
+        while self._min and self._min[0][0] < cutoff:
+            self._min.popleft()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def last(self) -> Optional[float]:
+        return self._items[-1][1] if self._items else None
+
+    def avg(self) -> Optional[float]:
+        return self._sum / len(self._items) if self._items else None
+
+    def max(self) -> Optional[float]:
+        return self._max[0][1] if self._max else None
+
+    def min(self) -> Optional[float]:
+        return self._min[0][1] if self._min else None
+
+    def rate(self, per: float = 1.0) -> Optional[float]:
+        """Change between oldest and newest sample, scaled to `per` seconds."""
+        if len(self._items) < 2:
+            return None
+        (t0, v0), (t1, v1) = self._items[0], self._items[-1]
+        if t1 <= t0:
+            return None
+        return (v1 - v0) / (t1 - t0) * per
+
+
+def _compile_path(metric: str) -> Tuple[str, ...]:
+    return tuple(p for p in metric.split(".") if p)
+
+
+def _extract(sample: Dict[str, Any], path: Tuple[str, ...]) -> Optional[float]:
+    value: Any = sample
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+# -------------------------------
+# Rules
+# -------------------------------
+# (status, key, details) produced by a rule for one sample
+Change = Tuple[str, Optional[str], Dict[str, Any]]
+
+
+class Rule(ABC):
+    """Base rule: turns each sample into zero or more firing/resolved changes."""
+
+    # A latching rule's firing alert stays active until a resolved change;
+    # otherwise each firing change is a one-off notification.
+    latching = True
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+        self.name = spec["name"]
+        self.source = spec.get("source", "system")
+        self.severity = spec.get("severity", "warning")
+        self.hold = float(spec.get("for", 0))
+        self.pending_since: Optional[float] = None
+        self.firing_since: Optional[float] = None
+        self.last_value: Any = None
+
+    @abstractmethod
+    def evaluate(self, sample: Any, ts: float) -> List[Change]:
+        ...
+
+    def describe(self) -> str:
+        return self.spec.get("summary", self.name)
+
+
+class ConditionRule(Rule):
+    """A rule over one condition that must hold for `for` seconds before firing."""
+
+    @abstractmethod
+    def condition(self, sample: Any, ts: float) -> Tuple[Optional[bool], Any]:
+        """(condition, observed value); None if the sample has no value for this rule."""
+
+    def evaluate(self, sample, ts):
+        condition, observed = self.condition(sample, ts)
+        if condition is None:
+            return []
+        self.last_value = observed
+        if condition:
+            if self.pending_since is None:
+                self.pending_since = ts
+            if self.firing_since is None and ts - self.pending_since >= self.hold:
+                self.firing_since = ts
+                return [("firing", None, {"value": observed})]
+            return []
+        self.pending_since = None
+        if self.firing_since is not None:
+            self.firing_since = None
+            return [("resolved", None, {"value": observed})]
+        return []
+
+
+class ThresholdRule(ConditionRule):
+    AGGS = ("last", "avg", "min", "max")
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.path = _compile_path(spec["metric"])
+        self.op = OPS[spec.get("op", ">")]
+        self.value = float(spec["value"])
+        self.agg = spec.get("agg", "last")
+        if self.agg not in self.AGGS:
+            raise ValueError(f"rule {self.name}: unknown agg {self.agg!r}")
+        self.window = SlidingWindow(float(spec.get("window", 0)))
+
+    def condition(self, sample, ts):
+        v = _extract(sample, self.path)
+        if v is None:
+            return None, None
+        self.window.push(ts, v)
+        observed = getattr(self.window, self.agg)()
+        return self.op(observed, self.value), observed
+
+    def describe(self):
+        agg = "" if self.agg == "last" else f"{self.agg}({self.window.span:g}s) "
+        return self.spec.get("summary") or f"{agg}{self.spec['metric']} {self.spec.get('op', '>')} {self.value:g}"
+
+
+class RateRule(ConditionRule):
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.path = _compile_path(spec["metric"])
+        self.op = OPS[spec.get("op", ">")]
+        self.value = float(spec["value"])
+        self.per = float(spec.get("per", 60))
+        self.window = SlidingWindow(float(spec.get("window", 300)))
+        self.min_samples = int(spec.get("min_samples", 2))
+
+    def condition(self, sample, ts):
+        v = _extract(sample, self.path)
+        if v is None:
+            return None, None
+        self.window.push(ts, v)
+        if len(self.window) < self.min_samples:
+            return False, None
+        rate = self.window.rate(self.per)
+        if rate is None:
+            return False, None
+        return self.op(rate, self.value), round(rate, 4)
+
+    def describe(self):
+        return self.spec.get("summary") or (
+            f"rate of {self.spec['metric']} per {self.per:g}s {self.spec.get('op', '>')} {self.value:g}")
+
+
+class NewDeviceRule(Rule):
+    """Fires once per MAC not seen before; the first sample is the baseline."""
+
+    latching = False
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.seen: set = set()
+        self.primed = False
+
+    def new_macs(self, devices: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        fresh = []
+        for d in devices:
+            mac = d.get("mac")
+            if mac and mac not in self.seen:
+                self.seen.add(mac)
+                if self.primed:
+                    fresh.append(d)
+        self.primed = True
+        return fresh
+
+    def evaluate(self, sample, ts):
+        return [("firing", d.get("mac"), d) for d in self.new_macs(sample or [])]
+
+
+RULE_TYPES = {"threshold": ThresholdRule, "rate": RateRule, "new_device": NewDeviceRule}
+
+
+def build_rule(spec: Dict[str, Any]) -> Rule:
+    kind = spec.get("type", "threshold")
+    if kind not in RULE_TYPES:
+        raise ValueError(f"rule {spec.get('name')}: unknown type {kind!r}")
+    return RULE_TYPES[kind](spec)
+
+
+def load_rule_specs(path: Path = RULES_FILE) -> List[Dict[str, Any]]:
+    try:
+        specs = json.loads(path.read_text(encoding="utf-8"))
+        return specs if isinstance(specs, list) else []
+    except FileNotFoundError:
+        return []
+    except Exception as e:
+        print(f"Error loading alert rules: {e}")
+        return []
+
+
+# -------------------------------
+# Sinks
+# -------------------------------
+class WebhookSink:
+    """
+    Batches alert events and POSTs them as {"alerts": [...]} to a webhook.
+
+    Events are flushed every `interval` seconds or once `max_batch` are
+    queued. Within a batch, events with the same fingerprint (rule, key,
+    status) are collapsed to the latest.
+
+    A failed batch is put back in the queue and retried with exponential
+    backoff (up to `max_backoff` seconds). While the webhook is down the
+    queue is capped at `max_queue` events; the oldest are dropped, counted
+    and logged.
+    """
+
+    def __init__(self, url: str, interval: float = 5.0, max_batch: int = 100, timeout: float = 5.0,
+                 max_queue: int = 1000, max_backoff: float = 300.0):
+        self.url = url
+        self.interval = interval
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.max_queue = max_queue
+        self.max_backoff = max_backoff
+        self._queue: Dict[Tuple, Dict[str, Any]] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._session = requests.Session() if requests else None
+        self.retry_delay = 0.0    # 0 while the webhook is healthy
+        self.sent = 0
+        self.deduplicated = 0
+        self.failures = 0
+        self.dropped = 0
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        fingerprint = (event["rule"], event.get("key"), event["status"])
+        with self._cond:
+            if fingerprint in self._queue:
+                self.deduplicated += 1
+                del self._queue[fingerprint]  # re-insert to keep latest last
+            self._queue[fingerprint] = event
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="alert-webhook", daemon=True)
+                self._thread.start()
+            self._trim()
+            if len(self._queue) >= self.max_batch:
+                self._cond.notify()
+
+    def _trim(self) -> None:
+        excess = len(self._queue) - self.max_queue
+        if excess > 0:
+            for fingerprint in list(self._queue)[:excess]:
+                del self._queue[fingerprint]
+            self.dropped += excess
+            print(f"Alert webhook queue full: dropped {excess} oldest alert(s)")
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                # a full batch only cuts the wait short while the webhook is healthy
+                self._cond.wait_for(lambda: not self.retry_delay and len(self._queue) >= self.max_batch,
+                                    timeout=self.retry_delay or self.interval)
+            self.flush()
+
+    def flush(self) -> bool:
+        with self._cond:
+            batch = self._queue
+            self._queue = {}
+        if not batch:
+            return True
+        if self._session is None:
+            self.failures += 1
+            self.dropped += len(batch)
+            print(f"Alert webhook unavailable (requests not installed): dropped {len(batch)} alert(s)")
+            return False
+        try:
+            response = self._session.post(self.url, json={"alerts": list(batch.values())}, timeout=self.timeout)
+            response.raise_for_status()
+        except Exception as e:
+            with self._cond:
+                self.failures += 1
+                self.retry_delay = min(self.max_backoff, max(self.interval, self.retry_delay * 2))
+                # back in front of anything queued meanwhile; newer events for a fingerprint win
+                batch.update(self._queue)
+                self._queue = batch
+                self._trim()
+            print(f"Alert webhook error (retrying in {self.retry_delay:g}s): {e}")
+            return False
+        with self._cond:
+            self.sent += len(batch)
+            self.retry_delay = 0.0
+        return True
+
+
+# -------------------------------
+# Engine
+# -------------------------------
+class AlertEngine:
+    def __init__(self, specs: Iterable[Dict[str, Any]] = (), sinks: Iterable[Any] = (), history: int = 200):
+        self.rules: List[Rule] = [build_rule(s) for s in specs]
+        self.sinks = list(sinks)
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self._active: Dict[Tuple[str, Optional[str]], Dict[str, Any]] = {}
+        self._last_sample: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, source: str, sample: Any, ts: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Evaluate rules for `source` against one sample; returns emitted events."""
+        ts = time.time() if ts is None else ts
+        events: List[Dict[str, Any]] = []
+        with self._lock:
+            # Coalesced callers hand us the same object several times
+            if self._last_sample.get(source) is sample:
+                return events
+            self._last_sample[source] = sample
+
+            for rule in self.rules:
+                if rule.source != source:
+                    continue
+                for status, key, details in rule.evaluate(sample, ts):
+                    event = self._event(rule, status, ts, key, details)
+                    if rule.latching:
+                        if status == "firing":
+                            self._active[(rule.name, key)] = event
+                        else:
+                            self._active.pop((rule.name, key), None)
+                    events.append(event)
+
+            for event in events:
+                self.recent.append(event)
+        for event in events:
+            for sink in self.sinks:
+                sink.emit(event)
+        return events
+
+    def _event(self, rule: Rule, status: str, ts: float, key: Optional[str], details: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "rule": rule.name,
+            "key": key,
+            "status": status,
+            "severity": rule.severity,
+            "summary": rule.describe(),
+            "ts": int(ts),
+            "details": details,
+        }
+
+    def active(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._active.values())
+
+    def history(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self.recent)
+
+    def rules_status(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{
+                "name": r.name,
+                "type": r.spec.get("type", "threshold"),
+                "source": r.source,
+                "summary": r.describe(),
+                "state": "firing" if r.firing_since is not None else "pending" if r.pending_since is not None else "ok",
+                "value": r.last_value,
+            } for r in self.rules]
+
+
+_engine: Optional[AlertEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_alert_engine() -> AlertEngine:
+    """Process-wide engine from data/alert_rules.json; webhook from ALERT_WEBHOOK_URL."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                sinks = []
+                url = os.environ.get("ALERT_WEBHOOK_URL", "").strip()
+                if url:
+                    sinks.append(WebhookSink(url))
+                _engine = AlertEngine(load_rule_specs(), sinks)
+    return _engine
+
+
+def cache_stats() -> Dict[str, Any]:
+    engine = _engine
+    if engine is None:
+        return {}
+    with engine._lock:
+        return {"alerts": {
+            "active": len(engine._active),
+            "recent": len(engine.recent),
+            "seen_macs": sum(len(getattr(r, "seen", ())) for r in engine.rules),
+        }}
@@ -0,0 +1,486 @@
+# services/assets.py
+"""
+Static asset pipeline: minify, recompress, precompress and content-hash.
+
+build_assets() turns static/ into static/dist/: JS and CSS are minified,
+PNGs recompressed, text assets get .gz (and .br when the `brotli` package
+is installed) siblings, and every output is named after its content hash,
+e.g. js/dashboard.1a2b3c4d5e.js. static/dist/manifest.json maps source
+names to those files. Templates resolve names through the manifest, so the
+hashed files can be cached forever: a change produces a new name.
+
+The minifiers are deliberately conservative. They drop comments and
+insignificant whitespace, but keep JS line breaks (automatic semicolon
+insertion) and leave string, template and regex literals untouched.
+
+Sources edited after the last build are served unbuilt until the next
+build. Unchanged sources are reused on rebuild, so running the build on
+every launch is cheap.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import brotli  # type: ignore  # optional: pip install brotli
+except ImportError:
+    brotli = None
+
+ROOT = Path(__file__).resolve().parents[1]
+STATIC_DIR = ROOT / "static"
+DIST_DIR = STATIC_DIR / "dist"
+MANIFEST_NAME = "manifest.json"
+
+MANIFEST_FORMAT = 1
+HASH_LENGTH = 10
+CHECK_INTERVAL = 5.0        # seconds between manifest change checks
+SKIP_SUFFIXES = {".webmanifest"}   # references icons by fixed path
+PRECOMPRESS_SUFFIXES = {".js", ".css", ".svg", ".ico", ".json", ".txt"}
+MIN_SAVING = 0.9            # keep a .gz/.br only if it is below this fraction of the original
+
+
+# -------------------------------
+# JavaScript
+# -------------------------------
+_REGEX_AFTER = set("(,=:[!&|?{};+-*%<>~^")
+_REGEX_KEYWORDS = {"return", "typeof", "instanceof", "in", "of", "new", "delete", "void",
+                   "throw", "case", "do", "else", "yield", "await"}
+_NEWLINE_NOT_NEEDED_AFTER = set("{;,([")
+_NEWLINE_NOT_NEEDED_BEFORE = set("})]")
+
+
+def _is_word(c: str) -> bool:
+    return c.isalnum() or c in "_$" or ord(c) > 127
+
+
+def _needs_space(prev: str, c: str) -> bool:
+    return ((_is_word(prev) and _is_word(c))
+            or (prev == c and c in "+-")          # a + +b, a - -b
+            or (prev == "/" and c in "/*")        # a / /re/ would open a comment
+            or (prev.isdigit() and c == "."))     # 1 .toString()
+
+
+def _skip_string(src: str, i: int) -> int:
+    """Index just past the string literal starting at src[i]."""
+    quote, i, n = src[i], i + 1, len(src)
+    while i < n:
+        c = src[i]
+        if c == "\\":
+            i += 2
+            continue
+        i += 1
+        if c == quote or c == "\n":
+            break
+    return i
+
+
+def _skip_template(src: str, i: int) -> Tuple[int, bool]:
+    """From inside a template literal: (index after the closing ` or after ${, entered_expression)."""
+    n = len(src)
+    while i < n:
+        c = src[i]
+        if c == "\\":
+            i += 2
+        elif c == "`":
+            return i + 1, False
+        elif c == "$" and src.startswith("${", i):
+            return i + 2, True
+        else:
+            i += 1
+    return n, False
+
+
+def _skip_regex(src: str, i: int) -> int:
+    """Index just past the regex literal (flags included) starting at src[i]."""
+    i, n, in_class = i + 1, len(src), False
+    while i < n:
+        c = src[i]
+        if c == "\\":
+            i += 2
+            continue
+        i += 1
+        if c == "\n":
+            break
+        if in_class:
+            in_class = c != "]"
+        elif c == "[":
+            in_class = True
+        elif c == "/":
+            break
+    while i < n and _is_word(src[i]):
+        i += 1
+    return i
+
+
+def minify_js(src: str) -> str:
+    out: List[str] = []
+    prev = ""            # last emitted character
+    last = ""            # last token (word or punctuation) for regex detection
+    pending = ""         # "", " " or "\n": whitespace seen since the last token
+    templates: List[int] = []   # brace depth at each open ${ ... }
+    depth = 0
+    i, n = 0, len(src)
+
+    def emit(text: str) -> None:
+        nonlocal prev, pending
+        if pending and out:
+            c = text[0]
+            if pending == "\n" and prev not in _NEWLINE_NOT_NEEDED_AFTER and c not in _NEWLINE_NOT_NEEDED_BEFORE:
+                out.append("\n")
+            elif _needs_space(prev, c):
+                out.append(" ")
+        out.append(text)
+        prev, pending = text[-1], ""
+
+    while i < n:
+        c = src[i]
+        if c in " \t\r\n\f\v\ufeff":
+            if c == "\n":
+                pending = "\n"
+            elif not pending:
+                pending = " "
+            i += 1
+        elif src.startswith("//", i):
+            end = src.find("\n", i)
+            i = n if end < 0 else end
+        elif src.startswith("/*", i):
+            end = src.find("*/", i + 2)
+            end = n if end < 0 else end + 2
+            if src.startswith("/*!", i):
+                emit(src[i:end])  # license comment
+            elif "\n" in src[i:end]:
+                pending = "\n"
+            elif not pending:
+                pending = " "
+            i = end
+        elif c in "'\"":
+            end = _skip_string(src, i)
+            emit(src[i:end])
+            last, i = '"', end
+        elif c == "`":
+            end, entered = _skip_template(src, i + 1)
+            emit(src[i:end])
+            if entered:
+                templates.append(depth)
+                last = "{"
+            else:
+                last = '"'
+            i = end
+        elif c == "/" and (not last or last in _REGEX_AFTER or last in _REGEX_KEYWORDS):
+            end = _skip_regex(src, i)
+            emit(src[i:end])
+            last, i = '"', end
+        elif _is_word(c):
+            end = i + 1
+            while end < n and _is_word(src[end]):
+                end += 1
+            emit(src[i:end])
+            last, i = src[i:end], end
+        elif c == "}" and templates and templates[-1] == depth:
+            templates.pop()
+            end, entered = _skip_template(src, i + 1)
+            emit(src[i:end])
+            if entered:
+                templates.append(depth)
+                last = "{"
+            else:
+                last = '"'
+            i = end
+        else:
+            if c == "{":
+                depth += 1
+            elif c == "}":
+                depth -= 1
+            emit(c)
+            last, i = c, i + 1
+    return "".join(out) + "\n"
+
+
+# -------------------------------
+# CSS
+# -------------------------------
+_CSS_TIGHT = set("{};,")
+
+
+def minify_css(src: str) -> str:
+    out: List[str] = []
+    pending = False
+    i, n = 0, len(src)
+    while i < n:
+        c = src[i]
+        if src.startswith("/*", i):
+            end = src.find("*/", i + 2)
+            end = n if end < 0 else end + 2
+            if src.startswith("/*!", i):
+                out.append(src[i:end])
+            else:
+                pending = True
+            i = end
+            continue
+        if c.isspace():
+            pending = True
+            i += 1
+            continue
+        if c == "}" and out and out[-1] == ";":
+            out.pop()  # last declaration needs no terminator
+        # "a :hover" and "a:hover" are different selectors, so only drop the space after ":"
+        if pending and out and c not in _CSS_TIGHT and out[-1][-1] not in _CSS_TIGHT and out[-1][-1] != ":":
+            out.append(" ")
+        pending = False
+        if c in "'\"":
+            end = _skip_string(src, i)
+            out.append(src[i:end])
+            i = end
+        else:
+            out.append(c)
+            i += 1
+    return "".join(out) + "\n"
+
+
+# -------------------------------
+# PNG
+# -------------------------------
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# text and timestamp metadata; colour chunks (iCCP, sRGB, gAMA, cHRM) are kept
+PNG_DROP_CHUNKS = {b"tEXt", b"zTXt", b"iTXt", b"tIME"}
+
+
+def _png_chunk(ctype: bytes, body: bytes) -> bytes:
+    return struct.pack(">I", len(body)) + ctype + body + struct.pack(">I", zlib.crc32(ctype + body) & 0xFFFFFFFF)
+
+
+def recompress_png(data: bytes) -> bytes:
+    """Lossless: re-deflate the image data at maximum effort and drop metadata.
+    Returns the input unchanged if it is not a PNG or nothing was saved."""
+    if not data.startswith(PNG_SIGNATURE):
+        return data
+    chunks: List[Tuple[bytes, bytes]] = []
+    pos = len(PNG_SIGNATURE)
+    try:
+        while pos + 8 <= len(data):
+            length, ctype = struct.unpack(">I4s", data[pos:pos + 8])
+            chunks.append((ctype, data[pos + 8:pos + 8 + length]))
+            pos += 12 + length
+            if ctype == b"IEND":
+                break
+        raw = zlib.decompress(b"".join(body for ctype, body in chunks if ctype == b"IDAT"))
+    except (struct.error, zlib.error):
+        return data
+
+    best = None
+    for strategy in (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED):
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+        packed = compressor.compress(raw) + compressor.flush()
+        if best is None or len(packed) < len(best):
+            best = packed
+
+    out = [PNG_SIGNATURE]
+    wrote_idat = False
+    for ctype, body in chunks:
+        if ctype in PNG_DROP_CHUNKS:
+            continue
+        if ctype == b"IDAT":
+            if not wrote_idat:
+                out.append(_png_chunk(b"IDAT", best))
+                wrote_idat = True
+            continue
+        out.append(_png_chunk(ctype, body))
+    result = b"".join(out)
+    return result if len(result) < len(data) else data
+
+
+# -------------------------------
+# Build
+# -------------------------------
+def _minify_text(fn: Callable[[str], str]) -> Callable[[bytes], bytes]:
+    return lambda data: fn(data.decode("utf-8")).encode("utf-8")
+
+
+TRANSFORMS: Dict[str, Callable[[bytes], bytes]] = {
+    ".js": _minify_text(minify_js),
+    ".css": _minify_text(minify_css),
+    ".png": recompress_png,
+}
+
+
+def _write_atomic(dest: Path, data: bytes) -> None:
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=dest.name + ".", suffix=".tmp", dir=str(dest.parent))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, dest)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def _precompress(dest: Path, data: bytes) -> List[str]:
+    encodings = []
+    variants = [("gzip", ".gz", lambda d: gzip.compress(d, 9, mtime=0))]
+    if brotli is not None:
+        variants.insert(0, ("br", ".br", lambda d: brotli.compress(d, quality=11)))
+    for encoding, suffix, compress in variants:
+        packed = compress(data)
+        if len(packed) < len(data) * MIN_SAVING:
+            _write_atomic(dest.with_name(dest.name + suffix), packed)
+            encodings.append(encoding)
+    return encodings
+
+
+def read_manifest(path: Path) -> Dict[str, Dict[str, Any]]:
+    """source name -> entry; {} for a missing or unreadable manifest."""
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("format") != MANIFEST_FORMAT:
+        return {}
+    return data.get("assets", {})
+
+
+def _outputs(entries: Dict[str, Dict[str, Any]]) -> set:
+    files = set()
+    for entry in entries.values():
+        files.add(entry["file"])
+        files.update(entry["file"] + (".br" if e == "br" else ".gz") for e in entry.get("encodings", ()))
+    return files
+
+
+def build_assets(static_dir: Path = STATIC_DIR, dist_dir: Path = DIST_DIR, force: bool = False) -> Dict[str, Any]:
+    """Build every file under static_dir into dist_dir and write the manifest.
+
+    Outputs of the previous build are kept one generation, so pages rendered
+    just before a rebuild still load; older ones are deleted.
+    """
+    manifest_path = dist_dir / MANIFEST_NAME
+    previous = read_manifest(manifest_path)
+    assets: Dict[str, Dict[str, Any]] = {}
+    summary = {"built": 0, "reused": 0, "bytes_in": 0, "bytes_out": 0}
+
+    for src in sorted(static_dir.rglob("*")):
+        if not src.is_file() or dist_dir in src.parents or src.suffix.lower() in SKIP_SUFFIXES:
+            continue
+        name = src.relative_to(static_dir).as_posix()
+        st = src.stat()
+        source = [st.st_mtime_ns, st.st_size]
+        entry = previous.get(name)
+        if not force and entry and entry.get("source") == source and (dist_dir / entry["file"]).exists():
+            assets[name] = entry
+            summary["reused"] += 1
+            continue
+
+        data = src.read_bytes()
+        suffix = src.suffix.lower()
+        transform = TRANSFORMS.get(suffix)
+        try:
+            out = transform(data) if transform else data
+        except (UnicodeDecodeError, ValueError) as e:
+            print(f"Error building {name}, copying unchanged: {e}")
+            out = data
+        digest = hashlib.sha256(out).hexdigest()[:HASH_LENGTH]
+        hashed = Path(name).with_name(f"{src.stem}.{digest}{src.suffix}").as_posix()
+        dest = dist_dir / hashed
+        _write_atomic(dest, out)
+        encodings = _precompress(dest, out) if suffix in PRECOMPRESS_SUFFIXES else []
+        assets[name] = {"file": hashed, "source": source, "size": len(out),
+                        "original_size": len(data), "encodings": encodings}
+        summary["built"] += 1
+        summary["bytes_in"] += len(data)
+        summary["bytes_out"] += len(out)
+
+    _write_atomic(manifest_path, json.dumps(
+        {"format": MANIFEST_FORMAT, "built_at": int(time.time()), "assets": assets},
+        indent=1, sort_keys=True).encode("utf-8"))
+
+    keep = _outputs(assets) | _outputs(previous) | {MANIFEST_NAME}
+    removed = 0
+    for path in list(dist_dir.rglob("*")):
+        if path.is_file() and path.relative_to(dist_dir).as_posix() not in keep:
+            path.unlink()
+            removed += 1
+    summary["removed"] = removed
+    summary["assets"] = len(assets)
+    return summary
+
+
+# -------------------------------
+# Runtime lookup
+# -------------------------------
+def assets_enabled() -> bool:
+    return os.environ.get("NETHEALTH_ASSETS", "on").lower() not in ("0", "off", "false", "no")
+
+
+class AssetManifest:
+    """Source name -> hashed dist file, reloaded when the manifest is rebuilt."""
+
+    def __init__(self, dist_dir: Path = DIST_DIR, static_dir: Path = STATIC_DIR,
+                 check_interval: float = CHECK_INTERVAL):
+        self.dist_dir = dist_dir
+        self.static_dir = static_dir
+        self.check_interval = check_interval
+        self._assets: Dict[str, Dict[str, Any]] = {}
+        self._signature: Optional[Tuple[int, int]] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if self._checked and now - self._checked < self.check_interval:
+            return
+        with self._lock:
+            self._checked = now
+            try:
+                st = (self.dist_dir / MANIFEST_NAME).stat()
+                signature = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                signature = None
+            if signature != self._signature:
+                self._assets = read_manifest(self.dist_dir / MANIFEST_NAME) if signature else {}
+                self._signature = signature
+
+    def lookup(self, name: str) -> Optional[str]:
+        """Hashed path (relative to dist) for a source name, or None to serve the source."""
+        self._refresh()
+        entry = self._assets.get(name)
+        if entry is None:
+            return None
+        try:
+            st = (self.static_dir / name).stat()
+        except OSError:
+            return entry["file"]
+        if [st.st_mtime_ns, st.st_size] != entry["source"]:
+            return None  # edited since the build
+        return entry["file"]
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._assets)
+
+
+_manifest: Optional[AssetManifest] = None
+_manifest_lock = threading.Lock()
+
+
+def get_asset_manifest() -> AssetManifest:
+    global _manifest
+    with _manifest_lock:
+        if _manifest is None:
+            _manifest = AssetManifest()
+        return _manifest
+
+
+def cache_stats() -> Dict[str, int]:
+    manifest = _manifest
+    return {} if manifest is None else {"asset_manifest": len(manifest)}
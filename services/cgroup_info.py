@@ -0,0 +1,302 @@
+# services/cgroup_info.py
+"""
+Container (cgroup v1/v2) resource usage.
+
+Inside a container psutil and shutil.disk_usage report host-wide numbers.
+This collector reads the process's own cgroup instead: memory usage/limit,
+CPU quota and throttling, pids and block I/O. Control files are opened once
+and re-read with os.pread(fd, ..., 0); cgroupfs regenerates the contents on
+every read from offset 0, so nothing is reopened per sample.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+PROC_SELF_CGROUP = Path("/proc/self/cgroup")
+READ_SIZE = 64 * 1024
+
+# v1 reports "no limit" as a page-rounded LONG_MAX
+_UNLIMITED = 1 << 60
+
+_MB = 1024 * 1024
+
+
+def _own_paths(proc_cgroup: Path) -> Dict[str, str]:
+    """controller -> path from /proc/self/cgroup ("" is the v2 unified hierarchy)."""
+    paths: Dict[str, str] = {}
+    try:
+        text = proc_cgroup.read_text()
+    except OSError:
+        return paths
+    for line in text.splitlines():
+        parts = line.split(":", 2)
+        if len(parts) != 3:
+            continue
+        _, controllers, path = parts
+        if not controllers:
+            paths[""] = path
+        for c in controllers.split(","):
+            if c:
+                paths[c.replace("name=", "")] = path
+    return paths
+
+
+def _resolve(mount: Path, path: Optional[str]) -> Path:
+    # With a private cgroup namespace the path is "/" (or points outside the
+    # mount); the container's own cgroup is then the mount root itself.
+    if path:
+        candidate = mount / path.lstrip("/")
+        if candidate.is_dir():
+            return candidate
+    return mount
+
+
+def _to_int(value: str) -> Optional[int]:
+    value = value.strip()
+    if not value or value == "max":
+        return None
+    try:
+        n = int(value)
+    except ValueError:
+        return None
+    return None if n >= _UNLIMITED else n
+
+
+def _parse_flat_keyed(text: str) -> Dict[str, int]:
+    """'key value' per line (cpu.stat, memory.stat)."""
+    out: Dict[str, int] = {}
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) == 2:
+            try:
+                out[parts[0]] = int(parts[1])
+            except ValueError:
+                pass
+    return out
+
+
+def _parse_io_stat(text: str) -> Dict[str, int]:
+    """v2 io.stat: '8:0 rbytes=.. wbytes=.. rios=.. wios=..' summed over devices."""
+    totals = {"rbytes": 0, "wbytes": 0, "rios": 0, "wios": 0}
+    for line in text.splitlines():
+        for field in line.split()[1:]:
+            key, _, value = field.partition("=")
+            if key in totals:
+                try:
+                    totals[key] += int(value)
+                except ValueError:
+                    pass
+    return totals
+
+
+def _parse_blkio(text: str) -> Dict[str, int]:
+    """v1 blkio.throttle.io_service_bytes/io_serviced: '8:0 Read 123' lines."""
+    totals = {"Read": 0, "Write": 0}
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) == 3 and parts[1] in totals:
+            try:
+                totals[parts[1]] += int(parts[2])
+            except ValueError:
+                pass
+    return totals
+
+
+class CgroupCollector:
+    """Holds open descriptors for one cgroup's control files."""
+
+    # logical name -> file name, per version
+    V2_FILES = {
+        "memory_current": "memory.current",
+        "memory_max": "memory.max",
+        "memory_stat": "memory.stat",
+        "cpu_stat": "cpu.stat",
+        "cpu_max": "cpu.max",
+        "pids_current": "pids.current",
+        "pids_max": "pids.max",
+        "io_stat": "io.stat",
+    }
+    # logical name -> (controller, file name)
+    V1_FILES = {
+        "memory_current": ("memory", "memory.usage_in_bytes"),
+        "memory_max": ("memory", "memory.limit_in_bytes"),
+        "memory_stat": ("memory", "memory.stat"),
+        "cpu_stat": ("cpu", "cpu.stat"),
+        "cpu_usage": ("cpuacct", "cpuacct.usage"),
+        "cpu_quota": ("cpu", "cpu.cfs_quota_us"),
+        "cpu_period": ("cpu", "cpu.cfs_period_us"),
+        "pids_current": ("pids", "pids.current"),
+        "pids_max": ("pids", "pids.max"),
+        "io_bytes": ("blkio", "blkio.throttle.io_service_bytes"),
+        "io_ops": ("blkio", "blkio.throttle.io_serviced"),
+    }
+
+    def __init__(self, version: int, files: Dict[str, Path], path: str):
+        self.version = version
+        self.path = path
+        self._fds: Dict[str, int] = {}
+        for name, file_path in files.items():
+            try:
+                self._fds[name] = os.open(file_path, os.O_RDONLY | getattr(os, "O_CLOEXEC", 0))
+            except OSError:
+                continue  # controller not enabled for this cgroup
+
+    @classmethod
+    def detect(cls, root: Path = CGROUP_ROOT, proc_cgroup: Path = PROC_SELF_CGROUP) -> Optional["CgroupCollector"]:
+        if not root.is_dir():
+            return None
+        paths = _own_paths(proc_cgroup)
+
+        if (root / "cgroup.controllers").exists():
+            base = _resolve(root, paths.get(""))
+            files = {name: base / fname for name, fname in cls.V2_FILES.items()}
+            return cls(2, files, paths.get("", "/"))
+
+        files = {}
+        for name, (controller, fname) in cls.V1_FILES.items():
+            mount = next((root / m for m in (controller, "cpu,cpuacct", "cpuacct,cpu")
+                          if (root / m).is_dir() and controller in m.split(",")), None)
+            if mount is not None:
+                files[name] = _resolve(mount, paths.get(controller)) / fname
+        if not files:
+            return None
+        return cls(1, files, paths.get("memory", "/"))
+
+    @property
+    def files(self) -> List[str]:
+        return sorted(self._fds)
+
+    def _read(self, name: str) -> Optional[str]:
+        fd = self._fds.get(name)
+        if fd is None:
+            return None
+        try:
+            return os.pread(fd, READ_SIZE, 0).decode("ascii", "replace")
+        except OSError:
+            return None
+
+    def _read_int(self, name: str) -> Optional[int]:
+        text = self._read(name)
+        return None if text is None else _to_int(text)
+
+    # ---------- sections ----------
+    def _memory(self) -> Dict[str, Optional[float]]:
+        current = self._read_int("memory_current")
+        limit = self._read_int("memory_max")
+        stat = _parse_flat_keyed(self._read("memory_stat") or "")
+        # Like `docker stats`: page cache that can be reclaimed is not "used"
+        inactive = stat.get("inactive_file" if self.version == 2 else "total_inactive_file", 0)
+        used = max(0, current - inactive) if current is not None else None
+        return {
+            "used_mb": round(used / _MB, 2) if used is not None else None,
+            "limit_mb": round(limit / _MB, 2) if limit is not None else None,
+            "percent": round(used / limit * 100, 1) if used is not None and limit else None,
+        }
+
+    def _cpu(self) -> Dict[str, Optional[float]]:
+        stat = _parse_flat_keyed(self._read("cpu_stat") or "")
+        if self.version == 2:
+            usage_s = stat["usage_usec"] / 1e6 if "usage_usec" in stat else None
+            throttled_s = stat["throttled_usec"] / 1e6 if "throttled_usec" in stat else None
+            quota_period = (self._read("cpu_max") or "").split()
+            quota = _to_int(quota_period[0]) if quota_period else None
+            period = _to_int(quota_period[1]) if len(quota_period) > 1 else None
+        else:
+            usage_ns = self._read_int("cpu_usage")
+            usage_s = usage_ns / 1e9 if usage_ns is not None else None
+            throttled_s = stat["throttled_time"] / 1e9 if "throttled_time" in stat else None
+            quota = self._read_int("cpu_quota")
+            quota = quota if quota is not None and quota > 0 else None  # -1 = unlimited
+            period = self._read_int("cpu_period")
+
+        periods = stat.get("nr_periods")
+        throttled = stat.get("nr_throttled")
+        return {
+            "usage_seconds": round(usage_s, 3) if usage_s is not None else None,
+            "limit_cores": round(quota / period, 2) if quota and period else None,
+            "periods": periods,
+            "throttled_periods": throttled,
+            "throttled_seconds": round(throttled_s, 3) if throttled_s is not None else None,
+            "throttled_percent": round(throttled / periods * 100, 1) if periods else None,
+        }
+
+    def _pids(self) -> Dict[str, Optional[int]]:
+        return {"current": self._read_int("pids_current"), "max": self._read_int("pids_max")}
+
+    def _io(self) -> Dict[str, Optional[float]]:
+        if self.version == 2:
+            text = self._read("io_stat")
+            if text is None:
+                return {"read_mb": None, "write_mb": None, "read_ops": None, "write_ops": None}
+            t = _parse_io_stat(text)
+            rbytes, wbytes, rios, wios = t["rbytes"], t["wbytes"], t["rios"], t["wios"]
+        else:
+            b, o = self._read("io_bytes"), self._read("io_ops")
+            if b is None and o is None:
+                return {"read_mb": None, "write_mb": None, "read_ops": None, "write_ops": None}
+            bb, oo = _parse_blkio(b or ""), _parse_blkio(o or "")
+            rbytes, wbytes, rios, wios = bb["Read"], bb["Write"], oo["Read"], oo["Write"]
+        return {
+            "read_mb": round(rbytes / _MB, 2),
+            "write_mb": round(wbytes / _MB, 2),
+            "read_ops": rios,
+            "write_ops": wios,
+        }
+
+    def read(self) -> Dict[str, Any]:
+        return {
+            "cgroup_version": self.version,
+            "cgroup_path": self.path,
+            "memory": self._memory(),
+            "cpu": self._cpu(),
+            "pids": self._pids(),
+            "io": self._io(),
+        }
+
+    def close(self) -> None:
+        fds, self._fds = self._fds, {}
+        for fd in fds.values():
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+_collector: Optional[CgroupCollector] = None
+_detected = False
+_collector_lock = threading.Lock()
+
+
+def get_container_info() -> Optional[Dict[str, Any]]:
+    """cgroup usage for this process, or None when not under a cgroup (macOS, Windows)."""
+    global _collector, _detected
+    with _collector_lock:
+        if not _detected:
+            _detected = True
+            try:
+                _collector = CgroupCollector.detect()
+            except Exception as e:
+                print(f"Error detecting cgroup: {e}")
+                _collector = None
+        collector = _collector
+    if collector is None:
+        return None
+    try:
+        return collector.read()
+    except Exception as e:
+        print(f"Error reading cgroup stats: {e}")
+        return None
+
+
+def reset(collector: Optional[CgroupCollector] = None) -> None:
+    """Drop the cached collector (tests, or after the process moves cgroups)."""
+    global _collector, _detected
+    with _collector_lock:
+        if _collector is not None and _collector is not collector:
+            _collector.close()
+        _collector = collector
+        _detected = collector is not None
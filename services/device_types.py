@@ -0,0 +1,107 @@
+# services/device_types.py
+from __future__ import annotations
+
+import functools
+import json
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+RULES_FILE = ROOT / "data" / "device_types.json"
+
+UNKNOWN = "Unknown"
+
+
+class DeviceTypeClassifier:
+    """
+    Vendor-name classifier compiled from ordered keyword rules.
+
+    Rules are a list of {"type": ..., "keywords": [...]} evaluated in order:
+    the first rule with any keyword occurring in the lowercased vendor wins.
+    All keywords are compiled into one regex of zero-width lookaheads, one
+    named group per rule, so a vendor string is scanned once regardless of
+    how many rules exist.
+    """
+
+    def __init__(self, rules: List[Dict]):
+        self.rules = []
+        keywords = []
+        for rule in rules:
+            # An empty alternative would match every vendor, so blank keywords
+            # are dropped, along with rules left with none.
+            words = [k.lower() for k in rule.get("keywords") or () if isinstance(k, str) and k.strip()]
+            if rule.get("type") and words:
+                self.rules.append(rule)
+                keywords.append(words)
+        self.types = [r["type"] for r in self.rules]
+        alternatives = []
+        for i, words in enumerate(keywords):
+            alternatives.append(f"(?P<r{i}>{'|'.join(re.escape(w) for w in words)})")
+        # Lookahead keeps matches zero-width, so every position is tried and
+        # overlapping keywords from higher-priority rules are never consumed.
+        self._pattern: Optional[re.Pattern] = (
+            re.compile(f"(?=(?:{'|'.join(alternatives)}))") if alternatives else None
+        )
+
+    def classify(self, vendor: str) -> str:
+        if not vendor or self._pattern is None:
+            return UNKNOWN
+        best = len(self.types)
+        for match in self._pattern.finditer(vendor.lower()):
+            # lastindex is the group index of the rule that matched here
+            idx = match.lastindex - 1
+            if idx < best:
+                best = idx
+                if best == 0:
+                    break
+        return self.types[best] if best < len(self.types) else UNKNOWN
+
+
+def load_rules(path: Path = RULES_FILE) -> List[Dict]:
+    """Load classification rules from a JSON data file."""
+    try:
+        rules = json.loads(path.read_text(encoding="utf-8"))
+        if isinstance(rules, list):
+            return rules
+        print(f"Error loading device type rules: expected a list in {path}")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Error loading device type rules: {e}")
+    return []
+
+
+_classifier: Optional[DeviceTypeClassifier] = None
+_classifier_lock = threading.Lock()
+
+
+def get_classifier() -> DeviceTypeClassifier:
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = DeviceTypeClassifier(load_rules())
+    return _classifier
+
+
+@functools.lru_cache(maxsize=4096)
+def classify_vendor(vendor: str) -> str:
+    """Memoised classification; vendor strings repeat heavily across devices."""
+    return get_classifier().classify(vendor)
+
+
+def reload_rules(path: Path = RULES_FILE) -> DeviceTypeClassifier:
+    """Recompile from the rules file and drop memoised results."""
+    global _classifier
+    with _classifier_lock:
+        _classifier = DeviceTypeClassifier(load_rules(path))
+    classify_vendor.cache_clear()
+    return _classifier
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    info = classify_vendor.cache_info()
+    return {"device_type_lru": {"entries": info.currsize, "max": info.maxsize,
+                                "hits": info.hits, "misses": info.misses}}
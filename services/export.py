@@ -0,0 +1,231 @@
+# services/export.py
+"""
+Streaming bulk export of history datasets.
+
+Every format is produced by a generator that yields byte chunks as rows are
+read, so memory use does not depend on the time range. Arrow (IPC stream)
+and Parquet are available when pyarrow is installed.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = None
+    pq = None
+
+# Rows are flushed to the client in chunks of roughly this many bytes
+CHUNK_BYTES = 64 * 1024
+# Rows per Arrow record batch / Parquet row group
+BATCH_ROWS = 5000
+
+
+class ExportError(ValueError):
+    """Unknown dataset/format or a bad time range."""
+
+
+# -------------------------------
+# Datasets
+# -------------------------------
+def _iter_price_rows(start: Optional[int], end: Optional[int]) -> Iterator[Tuple]:
+    """Price history (CSV base + ingested rows) as (ts, date, item, price) in time order."""
+    from services.prices import get_price_store
+    return get_price_store().iter_history(start, end)
+
+
+def _system_rows(start, end):
+    from services.history import get_history_store
+    return get_history_store().iter_system_metrics(start, end)
+
+
+def _device_rows(start, end):
+    from services.history import get_history_store
+    return get_history_store().iter_device_sightings(start, end)
+
+
+def _datasets() -> Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...], Callable]]:
+    """name -> (columns, arrow type names, row iterator factory)."""
+    from services.history import DEVICE_COLUMNS, SYSTEM_COLUMNS
+    return {
+        "system": (
+            SYSTEM_COLUMNS,
+            ("int64", "float64", "float64", "float64", "float64", "float64", "int8", "string", "int64"),
+            _system_rows,
+        ),
+        "devices": (DEVICE_COLUMNS, ("int64",) + ("string",) * 5, _device_rows),
+        "prices": (("ts", "date", "item", "price"), ("int64", "string", "string", "float64"), _iter_price_rows),
+    }
+
+
+DATASETS = ("system", "devices", "prices")
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXTENSIONS = {"ndjson": "ndjson", "csv": "csv", "arrow": "arrows", "parquet": "parquet"}
+
+
+# SQLite integers are 64-bit; anything near that is not a real timestamp
+MAX_TIME = 2 ** 53
+
+
+def parse_time(value: Optional[str]) -> Optional[int]:
+    """Epoch seconds or an ISO date/datetime (UTC if no offset)."""
+    if value is None or value == "":
+        return None
+    value = value.strip()
+    try:
+        ts = int(float(value))
+    except (ValueError, OverflowError):  # not a number, or nan/inf
+        pass
+    else:
+        if abs(ts) > MAX_TIME:
+            raise ExportError(f"invalid time: {value!r}")
+        return ts
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ExportError(f"invalid time: {value!r}")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+# -------------------------------
+# Encoders
+# -------------------------------
+def _ndjson(columns, rows: Iterable[Tuple]) -> Iterator[bytes]:
+    buf: List[str] = []
+    size = 0
+    for row in rows:
+        line = json.dumps(dict(zip(columns, row)), separators=(",", ":")) + "\n"
+        buf.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield "".join(buf).encode("utf-8")
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf).encode("utf-8")
+
+
+def _csv(columns, rows: Iterable[Tuple]) -> Iterator[bytes]:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        if out.tell() >= CHUNK_BYTES:
+            yield out.getvalue().encode("utf-8")
+            out.seek(0)
+            out.truncate()
+    if out.tell():
+        yield out.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to the generator."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        b = bytes(data)
+        self.chunks.append(b)
+        self.position += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _batches(columns, rows: Iterable[Tuple]) -> Iterator[List[Tuple]]:
+    batch: List[Tuple] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_ROWS:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _arrow_schema(columns, types):
+    return pa.schema([(c, getattr(pa, t)()) for c, t in zip(columns, types)])
+
+
+def _record_batch(schema, columns, batch: List[Tuple]):
+    arrays = [pa.array([row[i] for row in batch], type=schema.field(i).type) for i in range(len(columns))]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _arrow(columns, types, rows: Iterable[Tuple]) -> Iterator[bytes]:
+    schema = _arrow_schema(columns, types)
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+    for batch in _batches(columns, rows):
+        writer.write_batch(_record_batch(schema, columns, batch))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def _parquet(columns, types, rows: Iterable[Tuple]) -> Iterator[bytes]:
+    schema = _arrow_schema(columns, types)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    for batch in _batches(columns, rows):
+        # each batch becomes its own row group and is flushed immediately
+        writer.write_table(pa.Table.from_batches([_record_batch(schema, columns, batch)]))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def stream_export(dataset: str, fmt: str = "ndjson", start: Optional[int] = None,
+                  end: Optional[int] = None) -> Iterator[bytes]:
+    """Validate arguments eagerly, then return a generator of encoded chunks."""
+    datasets = _datasets()
+    if dataset not in datasets:
+        raise ExportError(f"unknown dataset {dataset!r}; choose from {', '.join(DATASETS)}")
+    if fmt not in FORMATS:
+        raise ExportError(f"unknown format {fmt!r}; choose from {', '.join(FORMATS)}")
+    if fmt in ("arrow", "parquet") and pa is None:
+        raise ExportError(f"{fmt} export requires pyarrow (pip install pyarrow)")
+
+    columns, types, factory = datasets[dataset]
+    rows = factory(start, end)
+    if fmt == "ndjson":
+        return _ndjson(columns, rows)
+    if fmt == "csv":
+        return _csv(columns, rows)
+    if fmt == "arrow":
+        return _arrow(columns, types, rows)
+    return _parquet(columns, types, rows)
@@ -0,0 +1,215 @@
+# services/fleet.py
+"""
+Hub side of multi-host mode: in-memory latest state per agent.
+
+Agents (services/agent.py) push batches of snapshots. The first snapshot,
+and any sent after a resync request, is full; the rest are merge-patch
+deltas against the previous one, numbered by a per-host sequence. Unlike
+RFC 7386, null is a value here (fields like rtt_ms go null): removed keys
+are listed under "$delete" instead.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+# Reject request bodies that inflate beyond this many bytes
+MAX_INGEST_BYTES = 8 * 1024 * 1024
+# Hosts tracked at once; the least recently seen is dropped to admit a new one
+MAX_HOSTS = 1000
+DELETE_KEY = "$delete"
+
+
+class IngestError(ValueError):
+    """Malformed ingest payload."""
+
+
+class PayloadTooLarge(IngestError):
+    """Ingest body over MAX_INGEST_BYTES (after inflating)."""
+
+
+# -------------------------------
+# JSON merge-patch helpers
+# -------------------------------
+def make_patch(old: Any, new: Any) -> Any:
+    """Smallest merge-patch turning `old` into `new` (None if equal)."""
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return None if old == new else new
+    patch = {}
+    for key, value in new.items():
+        if key not in old:
+            patch[key] = value
+        elif value is None:
+            if old[key] is not None:
+                patch[key] = None
+        else:
+            sub = make_patch(old[key], value)
+            if sub is not None:
+                patch[key] = sub
+    deleted = [key for key in old if key not in new]
+    if deleted:
+        patch[DELETE_KEY] = deleted
+    return patch or None
+
+
+def apply_patch(target: Any, patch: Any) -> Any:
+    """Apply a merge-patch, returning the new document (target is not mutated)."""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    deleted = patch.get(DELETE_KEY, [])
+    if not isinstance(deleted, list):
+        raise IngestError(f"{DELETE_KEY} must be a list")
+    for key in deleted:
+        result.pop(key, None)
+    for key, value in patch.items():
+        if key != DELETE_KEY:
+            result[key] = apply_patch(result.get(key), value)
+    return result
+
+
+def decode_body(body: bytes, content_encoding: Optional[str]) -> Dict[str, Any]:
+    """Inflate (gzip/deflate, size-capped) and parse an ingest request body."""
+    encoding = (content_encoding or "").lower()
+    if encoding in ("gzip", "deflate"):
+        wbits = 16 + zlib.MAX_WBITS if encoding == "gzip" else zlib.MAX_WBITS
+        inflater = zlib.decompressobj(wbits)
+        try:
+            body = inflater.decompress(body, MAX_INGEST_BYTES)
+        except zlib.error as e:
+            raise IngestError(f"bad {encoding} body: {e}")
+        if inflater.unconsumed_tail:
+            raise PayloadTooLarge("payload too large")
+    elif encoding not in ("", "identity"):
+        raise IngestError(f"unsupported Content-Encoding: {content_encoding}")
+    elif len(body) > MAX_INGEST_BYTES:
+        raise PayloadTooLarge("payload too large")
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise IngestError(f"invalid JSON: {e}")
+    if not isinstance(payload, dict):
+        raise IngestError("payload must be an object")
+    return payload
+
+
+def encode_body(payload: Dict[str, Any]) -> bytes:
+    """Compact JSON, gzip-compressed; the agent's wire format."""
+    return gzip.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"), compresslevel=6)
+
+
+def _checked_state(state: Any) -> Dict[str, Any]:
+    """The summary reads these as objects; anything else would break /api/fleet for every host."""
+    if not isinstance(state, dict):
+        raise IngestError("snapshot data must be an object")
+    for section in ("system", "devices"):
+        if state.get(section) is not None and not isinstance(state[section], dict):
+            raise IngestError(f"snapshot {section} must be an object")
+    return state
+
+
+# -------------------------------
+# Store
+# -------------------------------
+class HostState:
+    __slots__ = ("host", "seq", "state", "last_seen", "received", "resyncs")
+
+    def __init__(self, host: str):
+        self.host = host
+        self.seq = 0
+        self.state: Dict[str, Any] = {}
+        self.last_seen = 0.0
+        self.received = 0
+        self.resyncs = 0
+
+
+class FleetStore:
+    """Latest state per host. Each ingest holds the lock only to apply patches."""
+
+    def __init__(self):
+        self._hosts: Dict[str, HostState] = {}
+        self._lock = threading.Lock()
+
+    def ingest(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        host = payload.get("host")
+        snapshots = payload.get("snapshots")
+        if not isinstance(host, str) or not host or len(host) > 255:
+            raise IngestError("missing host")
+        if not isinstance(snapshots, list):
+            raise IngestError("snapshots must be a list")
+
+        with self._lock:
+            hs = self._hosts.get(host)
+            if hs is None:
+                if len(self._hosts) >= MAX_HOSTS:
+                    del self._hosts[min(self._hosts.values(), key=lambda h: h.last_seen).host]
+                hs = self._hosts[host] = HostState(host)
+            for snap in snapshots:
+                if not isinstance(snap, dict) or not isinstance(snap.get("seq"), int):
+                    raise IngestError("snapshot needs an integer seq")
+                seq = snap["seq"]
+                if snap.get("full"):
+                    hs.state = _checked_state(snap.get("data") or {})
+                elif seq == hs.seq + 1 and hs.seq:
+                    hs.state = _checked_state(apply_patch(hs.state, snap.get("data")))
+                elif seq <= hs.seq and hs.seq:
+                    continue  # duplicate from a retried batch
+                else:
+                    # gap in the chain (hub restart or dropped batch)
+                    hs.resyncs += 1
+                    return {"ok": False, "resync": True, "seq": hs.seq}
+                hs.seq = seq
+                hs.received += 1
+            hs.last_seen = time.time()
+            return {"ok": True, "seq": hs.seq}
+
+    def hosts(self) -> List[str]:
+        with self._lock:
+            return sorted(self._hosts)
+
+    def get(self, host: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            hs = self._hosts.get(host)
+            if hs is None:
+                return None
+            return {"host": hs.host, "seq": hs.seq, "last_seen": hs.last_seen, "state": hs.state}
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Compact per-host overview for the fleet view."""
+        now = time.time()
+        with self._lock:
+            states = [(hs.host, hs.seq, hs.last_seen, hs.received, hs.state) for hs in self._hosts.values()]
+        out = []
+        for host, seq, last_seen, received, state in sorted(states):
+            system = state.get("system") or {}
+            devices = state.get("devices") or {}
+            out.append({
+                "host": host,
+                "seq": seq,
+                "last_seen": int(last_seen),
+                "age_s": round(now - last_seen, 1),
+                "snapshots": received,
+                "platform": system.get("platform"),
+                "memory_percent": (system.get("memory") or {}).get("percent"),
+                "storage_percent": (system.get("storage") or {}).get("percent"),
+                "online": (system.get("network") or {}).get("online"),
+                "rtt_ms": (system.get("network") or {}).get("rtt_ms"),
+                "device_count": len(devices),
+            })
+        return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self._hosts.clear()
+
+
+# Process-wide store used by the API
+fleet_store = FleetStore()
+
+
+def cache_stats() -> Dict[str, int]:
+    return {"fleet_hosts": len(fleet_store.hosts())}
@@ -0,0 +1,234 @@
+# services/history.py
+"""
+Local metrics history (SQLite).
+
+Each new system sample and device scan served by the API is appended here.
+Readers stream rows with fetchmany(), so exports of any time range keep
+memory flat. WAL mode lets exports read while new samples are written.
+Rows older than NETHEALTH_HISTORY_DAYS (default 30; 0 keeps everything)
+are deleted by the writer at most once per PRUNE_INTERVAL.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_DB = ROOT / "data" / "history.db"
+DEFAULT_RETENTION_DAYS = 30
+PRUNE_INTERVAL = 3600.0
+
+SYSTEM_COLUMNS = (
+    "ts", "memory_percent", "memory_used_mb", "storage_percent", "storage_used_gb",
+    "rtt_ms", "online", "interface", "uptime_seconds",
+)
+DEVICE_COLUMNS = ("ts", "ip", "mac", "vendor", "device_type", "interface")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS system_metrics (
+    ts INTEGER NOT NULL,
+    memory_percent REAL,
+    memory_used_mb REAL,
+    storage_percent REAL,
+    storage_used_gb REAL,
+    rtt_ms REAL,
+    online INTEGER,
+    interface TEXT,
+    uptime_seconds INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_system_metrics_ts ON system_metrics (ts);
+CREATE TABLE IF NOT EXISTS device_sightings (
+    ts INTEGER NOT NULL,
+    ip TEXT,
+    mac TEXT,
+    vendor TEXT,
+    device_type TEXT,
+    interface TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_device_sightings_ts ON device_sightings (ts);
+"""
+
+
+def history_enabled() -> bool:
+    return os.environ.get("NETHEALTH_HISTORY", "on").lower() not in ("0", "off", "false", "no")
+
+
+def retention_days() -> float:
+    value = os.environ.get("NETHEALTH_HISTORY_DAYS", "").strip().lower()
+    if value in ("0", "off", "false", "no"):
+        return 0.0
+    try:
+        return max(0.0, float(value)) if value else float(DEFAULT_RETENTION_DAYS)
+    except ValueError:
+        return float(DEFAULT_RETENTION_DAYS)
+
+
+def db_path() -> Path:
+    return Path(os.environ.get("NETHEALTH_HISTORY_DB") or DEFAULT_DB)
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(path), check_same_thread=False, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class HistoryStore:
+    """Single writer connection guarded by a lock; readers open their own."""
+
+    def __init__(self, path: Path, retention: Optional[float] = None):
+        self.path = path
+        self.retention = retention_days() if retention is None else retention
+        self._last_prune = 0.0
+        self.pruned = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = _connect(path)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._last: Dict[str, Any] = {}
+
+    def _is_repeat(self, source: str, sample: Any) -> bool:
+        # Coalesced callers hand us the same object several times
+        if self._last.get(source) is sample:
+            return True
+        self._last[source] = sample
+        return False
+
+    def record_system(self, info: Dict[str, Any]) -> None:
+        mem = info.get("memory") or {}
+        sto = info.get("storage") or {}
+        net = info.get("network") or {}
+        online = net.get("online")
+        row = (
+            int(info.get("timestamp") or time.time()),
+            mem.get("percent"), mem.get("used_mb"),
+            sto.get("percent"), sto.get("used_gb"),
+            net.get("rtt_ms"), None if online is None else int(bool(online)),
+            net.get("interface"), info.get("uptime_seconds"),
+        )
+        with self._lock:
+            if self._is_repeat("system", info):
+                return
+            with self._conn:
+                self._conn.execute(
+                    f"INSERT INTO system_metrics ({', '.join(SYSTEM_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(SYSTEM_COLUMNS))})", row)
+            self._maybe_prune()
+
+    def record_devices(self, devices: Sequence[Dict[str, Any]], ts: Optional[int] = None) -> None:
+        ts = int(ts or time.time())
+        rows = [(ts, d.get("ip"), d.get("mac"), d.get("vendor"), d.get("device_type"), d.get("interface"))
+                for d in devices]
+        with self._lock:
+            if self._is_repeat("devices", devices) or not rows:
+                return
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT INTO device_sightings ({', '.join(DEVICE_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._maybe_prune()
+
+    def _maybe_prune(self) -> None:
+        # Called with the lock held, after a write
+        now = time.time()
+        if self.retention <= 0 or now - self._last_prune < PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        self._delete_before(int(now - self.retention * 86400))
+
+    def prune(self, before: int) -> int:
+        """Delete rows with ts < before; returns how many were removed."""
+        with self._lock:
+            return self._delete_before(before)
+
+    def _delete_before(self, before: int) -> int:
+        removed = 0
+        with self._conn:
+            for table in ("system_metrics", "device_sightings"):
+                removed += self._conn.execute(f"DELETE FROM {table} WHERE ts < ?", (int(before),)).rowcount
+        self.pruned += removed
+        return removed
+
+    def _iter(self, table: str, columns: Tuple[str, ...], start: Optional[int], end: Optional[int],
+              batch: int) -> Iterator[Tuple]:
+        where, params = [], []
+        if start is not None:
+            where.append("ts >= ?")
+            params.append(int(start))
+        if end is not None:
+            where.append("ts < ?")
+            params.append(int(end))
+        sql = f"SELECT {', '.join(columns)} FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts"
+
+        conn = _connect(self.path)
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+
+    def iter_system_metrics(self, start: Optional[int] = None, end: Optional[int] = None,
+                            batch: int = 1000) -> Iterator[Tuple]:
+        return self._iter("system_metrics", SYSTEM_COLUMNS, start, end, batch)
+
+    def iter_device_sightings(self, start: Optional[int] = None, end: Optional[int] = None,
+                              batch: int = 1000) -> Iterator[Tuple]:
+        return self._iter("device_sightings", DEVICE_COLUMNS, start, end, batch)
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "system_metrics": self._conn.execute("SELECT COUNT(*) FROM system_metrics").fetchone()[0],
+                "device_sightings": self._conn.execute("SELECT COUNT(*) FROM device_sightings").fetchone()[0],
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_store: Optional[HistoryStore] = None
+_store_lock = threading.Lock()
+
+
+def get_history_store() -> HistoryStore:
+    global _store
+    with _store_lock:
+        path = db_path()
+        if _store is None or _store.path != path:
+            _store = HistoryStore(path)
+        return _store
+
+
+def cache_stats() -> Dict[str, int]:
+    store = _store
+    return {} if store is None else {"history_last_samples": len(store._last)}
+
+
+def record_system(info: Dict[str, Any]) -> None:
+    if not history_enabled():
+        return
+    try:
+        get_history_store().record_system(info)
+    except Exception as e:
+        print(f"Error recording system history: {e}")
+
+
+def record_devices(devices: List[Dict[str, Any]]) -> None:
+    if not history_enabled():
+        return
+    try:
+        get_history_store().record_devices(devices)
+    except Exception as e:
+        print(f"Error recording device history: {e}")
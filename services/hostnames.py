@@ -0,0 +1,313 @@
+# services/hostnames.py
+"""
+Hostname enrichment for discovered devices.
+
+Each IP is resolved in the background by a chain of resolvers (DNS PTR,
+then a unicast mDNS reverse query to the device, then a NetBIOS node status
+query); the first name wins. Every resolver call is bounded by a timeout,
+and lookups run on a small thread pool. Results, including "no name", go
+into a TTL cache.
+
+enrich() never waits. It attaches whatever is cached and schedules lookups
+for the misses, so a device's name shows up on a later poll.
+"""
+from __future__ import annotations
+
+import os
+import random
+import re
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
+from ipaddress import ip_address
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from services.replay import replaying
+
+# resolver(ip, timeout) -> hostname or None
+Resolver = Callable[[str, float], Optional[str]]
+
+LOOKUP_TIMEOUT = 1.0       # seconds, per resolver call
+MAX_WORKERS = 8
+MAX_PENDING = 256          # misses beyond this wait for a later poll
+POSITIVE_TTL = 3600.0
+NEGATIVE_TTL = 600.0
+MAX_CACHE_ENTRIES = 4096
+
+RESOLV_CONF = Path("/etc/resolv.conf")
+
+# Names come from the network and end up in HTML; keep only DNS-ish characters
+_UNSAFE = re.compile(r"[^A-Za-z0-9._-]")
+
+
+def clean_hostname(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    name = _UNSAFE.sub("", name.strip().rstrip("."))[:253]
+    if name.lower().endswith(".local"):
+        name = name[:-6]
+    return name or None
+
+
+# -------------------------------
+# DNS wire format (PTR only)
+# -------------------------------
+def reverse_name(ip: str) -> str:
+    return ip_address(ip).reverse_pointer
+
+
+def _encode_name(name: str) -> bytes:
+    out = b""
+    for label in name.rstrip(".").split("."):
+        raw = label.encode("ascii")
+        out += bytes([len(raw)]) + raw
+    return out + b"\x00"
+
+
+def build_ptr_query(ip: str, qid: int, unicast_response: bool = False) -> bytes:
+    header = struct.pack("!HHHHHH", qid, 0x0100, 1, 0, 0, 0)  # RD=1, one question
+    qclass = 0x8001 if unicast_response else 0x0001
+    return header + _encode_name(reverse_name(ip)) + struct.pack("!HH", 12, qclass)
+
+
+def _read_name(buf: bytes, off: int) -> Tuple[str, int]:
+    labels, end, jumps = [], None, 0
+    while True:
+        length = buf[off]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = off + 2
+            off = ((length & 0x3F) << 8) | buf[off + 1]
+            jumps += 1
+            if jumps > 32:
+                raise ValueError("compression loop")
+            continue
+        off += 1
+        if length == 0:
+            break
+        labels.append(buf[off:off + length].decode("utf-8", "replace"))
+        off += length
+    return ".".join(labels), (end if end is not None else off)
+
+
+def parse_ptr_response(buf: bytes, qid: Optional[int] = None) -> Optional[str]:
+    """First PTR answer in a DNS/mDNS response."""
+    try:
+        rid, flags, qd, an = struct.unpack("!HHHH", buf[:8])
+        if qid is not None and rid != qid:
+            return None
+        if flags & 0x000F:  # rcode != NOERROR
+            return None
+        off = 12
+        for _ in range(qd):
+            _, off = _read_name(buf, off)
+            off += 4
+        for _ in range(an):
+            _, off = _read_name(buf, off)
+            rtype, _, _, rdlen = struct.unpack("!HHIH", buf[off:off + 10])
+            off += 10
+            if rtype == 12:
+                return _read_name(buf, off)[0]
+            off += rdlen
+    except (struct.error, IndexError, ValueError):
+        return None
+    return None
+
+
+def _udp_exchange(payload: bytes, addr: Tuple[str, int], timeout: float) -> Optional[bytes]:
+    family = socket.AF_INET6 if ":" in addr[0] else socket.AF_INET
+    with socket.socket(family, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.sendto(payload, addr)
+            deadline = time.monotonic() + timeout
+            while True:
+                data, src = sock.recvfrom(4096)
+                if src[0] == addr[0]:
+                    return data
+                sock.settimeout(max(0.01, deadline - time.monotonic()))
+        except OSError:
+            return None
+
+
+def _nameservers(path: Path = RESOLV_CONF) -> List[str]:
+    try:
+        lines = path.read_text().splitlines()
+    except OSError:
+        return []
+    return [line.split()[1] for line in lines if line.startswith("nameserver") and len(line.split()) > 1]
+
+
+# -------------------------------
+# Resolvers
+# -------------------------------
+def dns_ptr(ip: str, timeout: float) -> Optional[str]:
+    """PTR via the first resolv.conf nameserver; the OS resolver where there is none."""
+    servers = _nameservers()
+    if not servers:
+        # Windows: no resolv.conf, and gethostbyaddr has no timeout of its own
+        try:
+            return clean_hostname(socket.gethostbyaddr(ip)[0])
+        except OSError:
+            return None
+    qid = random.randrange(1 << 16)
+    data = _udp_exchange(build_ptr_query(ip, qid), (servers[0], 53), timeout)
+    return clean_hostname(parse_ptr_response(data, qid)) if data else None
+
+
+def mdns_ptr(ip: str, timeout: float) -> Optional[str]:
+    """Unicast mDNS reverse query sent to the device itself (answered by Apple/Avahi hosts)."""
+    qid = random.randrange(1 << 16)
+    data = _udp_exchange(build_ptr_query(ip, qid, unicast_response=True), (ip, 5353), timeout)
+    return clean_hostname(parse_ptr_response(data)) if data else None
+
+
+_NBSTAT_QUERY_NAME = b"\x20" + b"CK" + b"A" * 30 + b"\x00"  # "*" padded, first-level encoded
+
+
+def build_nbstat_query(qid: int) -> bytes:
+    return struct.pack("!HHHHHH", qid, 0, 1, 0, 0, 0) + _NBSTAT_QUERY_NAME + struct.pack("!HH", 0x21, 1)
+
+
+def parse_nbstat_response(buf: bytes) -> Optional[str]:
+    """Workstation name (suffix 0x00, unique) from a NetBIOS node status reply."""
+    try:
+        off = 12 + len(_NBSTAT_QUERY_NAME) + 10  # header, name, type/class/ttl/rdlength
+        count = buf[off]
+        off += 1
+        for _ in range(count):
+            raw, suffix, flags = buf[off:off + 15], buf[off + 15], struct.unpack("!H", buf[off + 16:off + 18])[0]
+            off += 18
+            if suffix == 0x00 and not flags & 0x8000:  # not a group name
+                return clean_hostname(raw.decode("ascii", "replace").strip())
+    except (IndexError, struct.error):
+        return None
+    return None
+
+
+def netbios_name(ip: str, timeout: float) -> Optional[str]:
+    if ":" in ip:
+        return None
+    data = _udp_exchange(build_nbstat_query(random.randrange(1 << 16)), (ip, 137), timeout)
+    return parse_nbstat_response(data) if data else None
+
+
+DEFAULT_RESOLVERS: Tuple[Resolver, ...] = (dns_ptr, mdns_ptr, netbios_name)
+
+
+# -------------------------------
+# Enricher
+# -------------------------------
+class HostnameEnricher:
+    def __init__(self, resolvers: Sequence[Resolver] = DEFAULT_RESOLVERS, max_workers: int = MAX_WORKERS,
+                 timeout: float = LOOKUP_TIMEOUT, ttl: float = POSITIVE_TTL, negative_ttl: float = NEGATIVE_TTL):
+        self.resolvers = list(resolvers)
+        self.timeout = timeout
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hostname")
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[Optional[str], float]] = {}
+        self._inflight: Dict[str, Future] = {}
+        self.lookups = 0
+        self.resolved = 0
+        self.skipped = 0
+
+    def _resolve(self, ip: str) -> Optional[str]:
+        name = None
+        for resolver in self.resolvers:
+            try:
+                name = resolver(ip, self.timeout)
+            except Exception:
+                name = None
+            if name:
+                break
+        with self._lock:
+            expires = time.monotonic() + (self.ttl if name else self.negative_ttl)
+            self._cache[ip] = (name, expires)
+            self._inflight.pop(ip, None)
+            self.lookups += 1
+            self.resolved += bool(name)
+            if len(self._cache) > MAX_CACHE_ENTRIES:
+                self._prune()
+        return name
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for ip, (_, expires) in list(self._cache.items()):
+            if expires <= now:
+                del self._cache[ip]
+        while len(self._cache) > MAX_CACHE_ENTRIES:
+            del self._cache[next(iter(self._cache))]
+
+    def cached(self, ip: str) -> Tuple[Optional[str], bool]:
+        """(name, fresh); schedules a lookup when the entry is missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(ip)
+            fresh = entry is not None and entry[1] > now
+            if not fresh and ip not in self._inflight:
+                if len(self._inflight) >= MAX_PENDING:
+                    self.skipped += 1
+                else:
+                    self._inflight[ip] = self._pool.submit(self._resolve, ip)
+        # expired names are still shown until the refresh lands
+        return (entry[0] if entry else None), fresh
+
+    def enrich(self, devices: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Copies of the device dicts with a "hostname" key; never blocks on lookups."""
+        return [{**d, "hostname": self.cached(d["ip"])[0] if d.get("ip") else None} for d in devices]
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Block until currently scheduled lookups finish (CLI, tests)."""
+        with self._lock:
+            pending = list(self._inflight.values())
+        wait_futures(pending, timeout=timeout)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "cached": len(self._cache),
+                "pending": len(self._inflight),
+                "lookups": self.lookups,
+                "resolved": self.resolved,
+                "skipped": self.skipped,
+            }
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def hostnames_enabled() -> bool:
+    return os.environ.get("NETHEALTH_HOSTNAMES", "on").lower() not in ("0", "off", "false", "no")
+
+
+_enricher: Optional[HostnameEnricher] = None
+_enricher_lock = threading.Lock()
+
+
+def get_hostname_enricher() -> HostnameEnricher:
+    global _enricher
+    with _enricher_lock:
+        if _enricher is None:
+            _enricher = HostnameEnricher()
+        return _enricher
+
+
+def cache_stats() -> Dict[str, int]:
+    enricher = _enricher
+    return {} if enricher is None else {"hostnames": enricher.stats()["cached"]}
+
+
+def enrich_devices(devices: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    # replayed devices belong to another network; resolving them would hit the wire
+    if not hostnames_enabled() or replaying():
+        return [{**d, "hostname": None} for d in devices]
+    try:
+        return get_hostname_enricher().enrich(devices)
+    except Exception as e:
+        print(f"Error enriching hostnames: {e}")
+        return devices
@@ -0,0 +1,252 @@
+# services/net_topology.py
+"""
+Active interface detection from the routing table.
+
+The active interface is the one carrying the default route (lowest metric),
+which is what multi-homed hosts actually use; "first interface that is up
+with an IPv4 address" is only the fallback. The result is cached and only
+recomputed when links, addresses or routes change:
+
+- Linux: a non-blocking rtnetlink socket subscribed to link/address/route
+  groups is drained on each call; any pending message marks the cache
+  stale. Without netlink (sandboxes, seccomp) the default routes in
+  /proc/net are re-read and compared at most every POLL_INTERVAL seconds.
+- macOS/BSD: `route -n get default`, refreshed after ROUTE_TTL seconds.
+- Elsewhere: the fallback heuristic, refreshed after ROUTE_TTL seconds.
+"""
+from __future__ import annotations
+
+import platform
+import socket
+import struct
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+PROC_ROUTE = Path("/proc/net/route")
+PROC_IPV6_ROUTE = Path("/proc/net/ipv6_route")
+
+POLL_INTERVAL = 2.0   # seconds between /proc/net/route comparisons without netlink
+ROUTE_TTL = 30.0      # seconds a cached result lives where no change signal exists
+
+# <linux/rtnetlink.h>
+_RTMGRP_LINK = 0x1
+_RTMGRP_IPV4_IFADDR = 0x10
+_RTMGRP_IPV4_ROUTE = 0x40
+_RTMGRP_IPV6_IFADDR = 0x100
+_RTMGRP_IPV6_ROUTE = 0x400
+_NETLINK_ROUTE = 0
+_RTF_UP = 0x1
+
+
+def parse_proc_route(text: str) -> Optional[Tuple[str, Optional[str], int]]:
+    """IPv4 default route with the lowest metric: (iface, gateway, metric)."""
+    best = None
+    for line in text.splitlines()[1:]:
+        f = line.split()
+        if len(f) < 8:
+            continue
+        try:
+            dest, flags, metric, mask = int(f[1], 16), int(f[3], 16), int(f[6]), int(f[7], 16)
+            gw_raw = int(f[2], 16)
+        except ValueError:
+            continue
+        if dest != 0 or mask != 0 or not flags & _RTF_UP:
+            continue
+        if best is None or metric < best[2]:
+            gateway = socket.inet_ntoa(struct.pack("<I", gw_raw)) if gw_raw else None
+            best = (f[0], gateway, metric)
+    return best
+
+
+def parse_proc_ipv6_route(text: str) -> Optional[Tuple[str, Optional[str], int]]:
+    """IPv6 default route (::/0) with the lowest metric."""
+    best = None
+    for line in text.splitlines():
+        f = line.split()
+        if len(f) < 10 or f[9] == "lo":
+            continue
+        try:
+            prefix_len, metric, flags = int(f[1], 16), int(f[5], 16), int(f[8], 16)
+        except ValueError:
+            continue
+        if int(f[0], 16) != 0 or prefix_len != 0 or not flags & _RTF_UP:
+            continue
+        if best is None or metric < best[2]:
+            gw = bytes.fromhex(f[4])
+            gateway = socket.inet_ntop(socket.AF_INET6, gw) if any(gw) else None
+            best = (f[9], gateway, metric)
+    return best
+
+
+def parse_route_get(output: str) -> Tuple[Optional[str], Optional[str]]:
+    """(interface, gateway) from `route -n get default` (macOS/BSD)."""
+    iface = gateway = None
+    for line in output.splitlines():
+        key, _, value = line.strip().partition(":")
+        if key == "interface":
+            iface = value.strip() or None
+        elif key == "gateway":
+            gateway = value.strip() or None
+    return iface, gateway
+
+
+def _open_netlink() -> Optional[socket.socket]:
+    if not hasattr(socket, "AF_NETLINK"):
+        return None
+    try:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, _NETLINK_ROUTE)
+        sock.bind((0, _RTMGRP_LINK | _RTMGRP_IPV4_IFADDR | _RTMGRP_IPV4_ROUTE
+                   | _RTMGRP_IPV6_IFADDR | _RTMGRP_IPV6_ROUTE))
+        sock.setblocking(False)
+        return sock
+    except OSError:
+        return None
+
+
+class TopologyService:
+    """Caches the default-route interface; see module docstring for refresh rules."""
+
+    def __init__(self, fallback: Optional[Callable[[], Optional[str]]] = None,
+                 proc_route: Path = PROC_ROUTE, proc_ipv6_route: Path = PROC_IPV6_ROUTE,
+                 system: Optional[str] = None, use_netlink: bool = True):
+        self.fallback = fallback
+        self.proc_route = proc_route
+        self.proc_ipv6_route = proc_ipv6_route
+        self.system = system or platform.system()
+        self._lock = threading.Lock()
+        self._cached: Optional[Dict[str, Any]] = None
+        self._expires = 0.0
+        self._signature: Optional[tuple] = None
+        self._next_poll = 0.0
+        self._netlink = _open_netlink() if use_netlink and self.system == "Linux" else None
+        self.refreshes = 0
+
+    @property
+    def watch_mode(self) -> str:
+        if self.system == "Linux":
+            return "netlink" if self._netlink is not None else "poll"
+        return "ttl"
+
+    # ---------- change detection ----------
+    def _drain_netlink(self) -> bool:
+        changed = False
+        while True:
+            try:
+                if not self._netlink.recv(65536):
+                    break
+                changed = True
+            except BlockingIOError:
+                break
+            except OSError:
+                # ENOBUFS: events were dropped, so we cannot know what changed
+                changed = True
+                break
+        return changed
+
+    def _default_routes(self) -> tuple:
+        # Parsed rather than raw text: ipv6_route carries per-route use counters
+        routes = []
+        for path, parse in ((self.proc_route, parse_proc_route), (self.proc_ipv6_route, parse_proc_ipv6_route)):
+            try:
+                routes.append(parse(path.read_text(encoding="utf-8", errors="replace")))
+            except OSError:
+                routes.append(None)
+        return tuple(routes)
+
+    def _stale(self, now: float) -> bool:
+        if self._cached is None:
+            return True
+        if self.system != "Linux":
+            return now >= self._expires
+        if self._netlink is not None:
+            return self._drain_netlink()
+        if now < self._next_poll:
+            return False
+        self._next_poll = now + POLL_INTERVAL
+        return self._default_routes() != self._signature
+
+    # ---------- lookup ----------
+    def _linux_default(self) -> Tuple[Optional[str], Optional[str], Optional[int], str]:
+        self._signature = v4, v6 = self._default_routes()
+        for found, family in ((v4, "ipv4"), (v6, "ipv6")):
+            if found:
+                return found[0], found[1], found[2], family
+        return None, None, None, ""
+
+    def _route_get_default(self) -> Tuple[Optional[str], Optional[str]]:
+        try:
+            out = subprocess.run(["route", "-n", "get", "default"], capture_output=True, text=True,
+                                 timeout=2).stdout
+        except Exception:
+            return None, None
+        return parse_route_get(out)
+
+    def _lookup(self) -> Dict[str, Any]:
+        iface = gateway = metric = None
+        family = ""
+        if self.system == "Linux":
+            iface, gateway, metric, family = self._linux_default()
+        elif self.system in ("Darwin", "FreeBSD", "OpenBSD", "NetBSD"):
+            iface, gateway = self._route_get_default()
+            family = "ipv4" if iface else ""
+
+        source = "route"
+        if not iface and self.fallback is not None:
+            try:
+                iface = self.fallback()
+            except Exception:
+                iface = None
+            source = "heuristic"
+        return {
+            "interface": iface,
+            "gateway": gateway,
+            "metric": metric,
+            "family": family or None,
+            "source": source if iface else None,
+        }
+
+    def get(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            if self._stale(now):
+                self._cached = self._lookup()
+                self._cached["updated"] = int(time.time())
+                self._expires = now + ROUTE_TTL
+                self.refreshes += 1
+            return dict(self._cached)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._cached = None
+
+    def close(self) -> None:
+        if self._netlink is not None:
+            self._netlink.close()
+            self._netlink = None
+
+
+_service: Optional[TopologyService] = None
+_service_lock = threading.Lock()
+
+
+def get_topology_service(fallback: Optional[Callable[[], Optional[str]]] = None) -> TopologyService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = TopologyService(fallback=fallback)
+        elif fallback is not None and _service.fallback is None:
+            _service.fallback = fallback
+        return _service
+
+
+def cache_stats() -> Dict[str, int]:
+    service = _service
+    return {} if service is None else {"topology_cache": int(service._cached is not None)}
+
+
+def topology_status() -> Dict[str, Any]:
+    service = get_topology_service()
+    return {**service.get(), "watch": service.watch_mode, "refreshes": service.refreshes}
@@ -1,48 +1,81 @@
 # services/network_devices.py
 from __future__ import annotations
+import ipaddress
 import re
+import socket
 import subprocess
 import platform
+import threading
+import time
+from operator import attrgetter
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Iterable, Iterator, List, Dict, Optional
 
-# Path to OUI database
+from services.device_types import classify_vendor
+from services.oui import OUI_COMPILED, OUI_TEXT, parse_oui_lines, read_artifact
+from services.replay import recordable
+from services.singleflight import coalesce
+
+# Path to OUI database: compiled artifact (scripts/download_oui.py) or raw registry text
 ROOT = Path(__file__).resolve().parents[1]
-OUI_FILE = ROOT / "data" / "oui.txt"
+OUI_FILE = OUI_TEXT
+OUI_COMPILED_FILE = OUI_COMPILED
+OUI_CHECK_INTERVAL = 5.0   # seconds between artifact stat() calls
 
 
 def load_oui_database() -> Dict[str, str]:
     """Load OUI (Organizationally Unique Identifier) database."""
-    oui_map = {}
-    if not OUI_FILE.exists():
-        return oui_map
+    try:
+        return read_artifact(OUI_COMPILED_FILE)[1]
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"Error loading compiled OUI database: {e}")
 
+    if not OUI_FILE.exists():
+        return {}
     try:
         with OUI_FILE.open('r', encoding='utf-8', errors='ignore') as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    continue
-                match = re.match(
-                    r'^([0-9A-Fa-f]{2})-([0-9A-Fa-f]{2})-([0-9A-Fa-f]{2})\s+\(hex\)\s+(.+)$', line)
-                if match:
-                    prefix = f"{match.group(1)}:{match.group(2)}:{match.group(3)}".upper()
-                    vendor = match.group(4).strip()
-                    oui_map[prefix] = vendor
+            return dict(parse_oui_lines(f))
     except Exception as e:
         print(f"Error loading OUI database: {e}")
-
-    return oui_map
+        return {}
 
 
-# OUI database cache
+# OUI database cache, reloaded when the compiled artifact is replaced
 _oui_cache = None
+_oui_signature = None
+_oui_checked = 0.0
+_oui_lock = threading.Lock()
+
+
+def _oui_file_signature():
+    for path in (OUI_COMPILED_FILE, OUI_FILE):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        # os.replace gives the artifact a new inode even within one mtime tick
+        return (str(path), st.st_ino, st.st_mtime_ns, st.st_size)
+    return None
+
 
 def get_oui_database():
-    global _oui_cache
-    if _oui_cache is None:
-        _oui_cache = load_oui_database()
-    return _oui_cache
+    global _oui_cache, _oui_signature, _oui_checked
+    now = time.monotonic()
+    if _oui_cache is not None and now - _oui_checked < OUI_CHECK_INTERVAL:
+        return _oui_cache
+    with _oui_lock:
+        _oui_checked = now
+        signature = _oui_file_signature()
+        if _oui_cache is None or signature != _oui_signature:
+            _oui_cache = load_oui_database()
+            _oui_signature = signature
+        return _oui_cache
+
+
+def cache_stats() -> Dict[str, int]:
+    return {"oui_database": len(_oui_cache or ())}
 
 
 def lookup_vendor(mac_address: str) -> str:
@@ -59,182 +92,225 @@ def lookup_vendor(mac_address: str) -> str:
     return get_oui_database().get(prefix, "Unknown Vendor")
 
 
-def _should_skip_device(ip: str, mac: str) -> bool:
-    """Filter out broadcast, multicast, and special addresses."""
-    if mac.lower() == 'ff:ff:ff:ff:ff:ff':
-        return True
+_MAC_BROADCAST = 0xFFFFFFFFFFFF
+_MAC_SPLIT = re.compile(r'[:\-.]')
 
-    first_octet = mac.split(':')[0]
+
+def _parse_mac(mac: str) -> Optional[int]:
+    """Parse colon/dash/dot separated MAC text (octets may be unpadded) into a 48-bit int."""
+    parts = _MAC_SPLIT.split(mac.strip())
     try:
-        if int(first_octet, 16) & 0x01:
-            return True
+        if len(parts) == 6:
+            value = 0
+            for p in parts:
+                octet = int(p, 16)
+                if not 0 <= octet <= 0xFF:
+                    return None
+                value = (value << 8) | octet
+            return value
+        if len(parts) == 3:  # Cisco style aabb.ccdd.eeff
+            value = 0
+            for p in parts:
+                group = int(p, 16)
+                if not 0 <= group <= 0xFFFF:
+                    return None
+                value = (value << 16) | group
+            return value
     except ValueError:
         pass
+    return None
 
-    ip_parts = ip.split('.')
-    if len(ip_parts) == 4:
-        try:
-            first_octet_ip = int(ip_parts[0])
-            if 224 <= first_octet_ip <= 239 or ip_parts[3] == '255':
-                return True
-            if first_octet_ip == 169 and ip_parts[1] == '254':
-                return True
-        except ValueError:
-            pass
 
+def _format_mac(value: int) -> str:
+    return ':'.join(f"{(value >> shift) & 0xFF:02x}" for shift in range(40, -8, -8))
+
+
+class DeviceRecord:
+    """
+    Compact neighbour entry: integer IP and MAC, interfaces as a tuple.
+
+    Records stay in this form through parsing, dedup and sorting; dicts are
+    only built by to_dict() at the JSON boundary.
+    """
+
+    __slots__ = ("version", "ip", "mac", "interfaces")
+
+    def __init__(self, version: int, ip: int, mac: int, interfaces: tuple = ()):
+        self.version = version
+        self.ip = ip
+        self.mac = mac
+        self.interfaces = interfaces
+
+    @property
+    def ip_str(self) -> str:
+        if self.version == 4:
+            return socket.inet_ntoa(self.ip.to_bytes(4, 'big'))
+        return str(ipaddress.IPv6Address(self.ip))
+
+    @property
+    def mac_str(self) -> str:
+        return _format_mac(self.mac)
+
+    def to_dict(self) -> Dict[str, str]:
+        mac = self.mac_str
+        vendor = lookup_vendor(mac)
+        return {
+            'ip': self.ip_str,
+            'mac': mac,
+            'vendor': vendor,
+            'interface': ', '.join(self.interfaces),
+            'device_type': guess_device_type(vendor, mac),
+        }
+
+    def __repr__(self) -> str:
+        return f"DeviceRecord({self.ip_str}, {self.mac_str}, {self.interfaces!r})"
+
+
+def _should_skip_device(addr, mac: int) -> bool:
+    """Filter out broadcast, multicast, and special addresses."""
+    if mac == _MAC_BROADCAST or (mac >> 40) & 0x01:
+        return True
+    if addr.is_multicast:
+        return True
+    if addr.version == 4:
+        if int(addr) & 0xFF == 255 or addr.is_link_local:
+            return True
     return False
 
 
-def parse_arp_cache_linux() -> List[Dict[str, str]]:
-    """Parse /proc/net/arp on Linux systems."""
-    devices = []
+def _make_record(ip: str, mac: str, interface: str) -> Optional[DeviceRecord]:
+    """Build a record from raw parser fields, or None if invalid/special."""
+    mac_int = _parse_mac(mac)
+    if mac_int is None or mac_int == 0:
+        return None
+    try:
+        addr = ipaddress.ip_address(ip)
+    except ValueError:
+        return None
+    if _should_skip_device(addr, mac_int):
+        return None
+    return DeviceRecord(addr.version, int(addr), mac_int, (interface,) if interface else ())
+
+
+def _records_from_proc_arp(lines: Iterable[str]) -> Iterator[DeviceRecord]:
+    """/proc/net/arp rows: IP, HW type, Flags, HW address, Mask, Device."""
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 6:
+            record = _make_record(parts[0], parts[3], parts[5])
+            if record is not None:
+                yield record
+
+
+_MACOS_ARP = re.compile(r'\(([0-9a-f.:]+)\)\s+at\s+([0-9a-f:]+)\s+on\s+(\S+)', re.IGNORECASE)
+_WINDOWS_ARP = re.compile(r'\s+([0-9.]+)\s+([0-9a-f-]+)\s+\w+', re.IGNORECASE)
+
+
+def _records_from_arp_a_macos(lines: Iterable[str]) -> Iterator[DeviceRecord]:
+    for line in lines:
+        if '(incomplete)' in line.lower():
+            continue
+        match = _MACOS_ARP.search(line)
+        if match:
+            record = _make_record(match.group(1), match.group(2), match.group(3))
+            if record is not None:
+                yield record
+
+
+def _records_from_arp_a_windows(lines: Iterable[str]) -> Iterator[DeviceRecord]:
+    for line in lines:
+        match = _WINDOWS_ARP.search(line)
+        if match:
+            record = _make_record(match.group(1), match.group(2), 'N/A')
+            if record is not None:
+                yield record
+
+
+def parse_arp_cache_linux() -> Iterator[DeviceRecord]:
+    """Stream records from /proc/net/arp on Linux systems."""
     arp_file = Path('/proc/net/arp')
     if not arp_file.exists():
-        return devices
+        return
 
     try:
         with arp_file.open('r') as f:
-            lines = f.readlines()[1:]
-            for line in lines:
-                parts = line.split()
-                if len(parts) >= 6:
-                    ip = parts[0]
-                    mac = parts[3]
-                    interface = parts[5]
-                    if mac in ['00:00:00:00:00:00', '<incomplete>']:
-                        continue
-                    if _should_skip_device(ip, mac):
-                        continue
-                    devices.append({
-                        'ip': ip,
-                        'mac': mac,
-                        'vendor': lookup_vendor(mac),
-                        'interface': interface
-                    })
+            next(f, None)  # header
+            yield from _records_from_proc_arp(f)
     except Exception as e:
         print(f"Error parsing ARP cache: {e}")
 
-    return devices
-
 
-def parse_arp_cache_macos() -> List[Dict[str, str]]:
-    """Parse arp -a output on macOS."""
-    devices = []
+def parse_arp_cache_macos() -> Iterator[DeviceRecord]:
+    """Stream records from arp -a output on macOS."""
     try:
         result = subprocess.run(['arp', '-a'], capture_output=True, text=True, timeout=30)
-        pattern = r'\(([0-9.]+)\)\s+at\s+([0-9a-f:]+)\s+on\s+(\S+)'
-        for line in result.stdout.splitlines():
-            if '(incomplete)' in line.lower():
-                continue
-            match = re.search(pattern, line, re.IGNORECASE)
-            if match:
-                ip = match.group(1)
-                mac = match.group(2)
-                interface = match.group(3)
-                if _should_skip_device(ip, mac):
-                    continue
-                devices.append({
-                    'ip': ip,
-                    'mac': mac,
-                    'vendor': lookup_vendor(mac),
-                    'interface': interface
-                })
     except subprocess.TimeoutExpired:
-        print("Error: arp command timed out after 15 seconds")
+        print("Error: arp command timed out after 30 seconds")
+        return
     except Exception as e:
         print(f"Error running arp command: {e}")
+        return
+    yield from _records_from_arp_a_macos(result.stdout.splitlines())
 
-    return devices
 
-
-def parse_arp_cache_windows() -> List[Dict[str, str]]:
-    """Parse arp -a output on Windows."""
-    devices = []
+def parse_arp_cache_windows() -> Iterator[DeviceRecord]:
+    """Stream records from arp -a output on Windows."""
     try:
         result = subprocess.run(['arp', '-a'], capture_output=True, text=True, timeout=5)
-        pattern = r'\s+([0-9.]+)\s+([0-9a-f-]+)\s+\w+'
-        for line in result.stdout.splitlines():
-            match = re.search(pattern, line, re.IGNORECASE)
-            if match:
-                ip = match.group(1)
-                mac = match.group(2).replace('-', ':')
-                if _should_skip_device(ip, mac):
-                    continue
-                devices.append({
-                    'ip': ip,
-                    'mac': mac,
-                    'vendor': lookup_vendor(mac),
-                    'interface': 'N/A'
-                })
     except Exception as e:
         print(f"Error running arp command: {e}")
-
-    return devices
+        return
+    yield from _records_from_arp_a_windows(result.stdout.splitlines())
 
 
 # ✅ Deduplicate devices by IP, merging interfaces if needed
-def deduplicate_devices(devices: List[Dict[str, str]]) -> List[Dict[str, str]]:
+def deduplicate_devices(records: Iterable[DeviceRecord]) -> List[DeviceRecord]:
     """
     Remove duplicate devices that appear on multiple interfaces.
     If duplicates are found, their interfaces are merged (e.g., 'en0, en13').
+    Keys are integer (version, ip) pairs, so no string work per entry.
     """
-    merged = {}
-    for d in devices:
-        ip = d.get("ip")
-        if not ip:
-            continue
-        if ip in merged:
-            existing_iface = merged[ip].get("interface", "")
-            new_iface = d.get("interface", "")
-            if new_iface and new_iface not in existing_iface:
-                merged[ip]["interface"] = f"{existing_iface}, {new_iface}".strip(", ")
+    merged: Dict[tuple, DeviceRecord] = {}
+    for r in records:
+        key = (r.version, r.ip)
+        existing = merged.get(key)
+        if existing is None:
+            merged[key] = r
         else:
-            merged[ip] = d
+            for iface in r.interfaces:
+                if iface not in existing.interfaces:
+                    existing.interfaces += (iface,)
     return list(merged.values())
 
 
-def get_network_devices() -> List[Dict[str, str]]:
-    """Get list of devices from ARP cache (cross-platform)."""
+def _arp_records() -> Iterator[DeviceRecord]:
     system = platform.system()
     if system == 'Linux':
-        devices = parse_arp_cache_linux()
-    elif system == 'Darwin':  # macOS
-        devices = parse_arp_cache_macos()
-    elif system == 'Windows':
-        devices = parse_arp_cache_windows()
-    else:
-        devices = []
+        return parse_arp_cache_linux()
+    if system == 'Darwin':  # macOS
+        return parse_arp_cache_macos()
+    if system == 'Windows':
+        return parse_arp_cache_windows()
+    return iter(())
 
+
+def collect_device_records() -> List[DeviceRecord]:
+    """Deduplicated, IP-sorted records from the ARP cache (cross-platform)."""
     # Deduplicate by IP across all interfaces
-    devices = deduplicate_devices(devices)
-
-    # Sort by IP for consistent UI ordering
-    devices.sort(key=lambda d: tuple(int(x) for x in d["ip"].split('.')) if "ip" in d else ())
-
-    # Guess device type for UI labeling
-    for d in devices:
-        d["device_type"] = guess_device_type(d.get("vendor", ""), d.get("mac", ""))
-
-    return devices
-
-
-def guess_device_type(vendor: str, mac: str) -> str:
-    """Guess device type from vendor name."""
-    vendor_lower = vendor.lower()
-
-    if any(x in vendor_lower for x in ['cisco', 'netgear', 'tp-link', 'linksys', 'asus router', 'd-link', 'ubiquiti', 'unifi']):
-        return 'Router/AP'
-    if any(x in vendor_lower for x in ['lg', 'samsung tv', 'sony tv', 'vizio', 'arcadyan', 'roku', 'chromecast', 'amazon fire']):
-        return 'TV/Streaming'
-    if any(x in vendor_lower for x in ['apple', 'samsung', 'google', 'huawei', 'xiaomi', 'oneplus', 'oppo']):
-        return 'Mobile Device'
-    if any(x in vendor_lower for x in ['dell', 'hp', 'lenovo', 'microsoft', 'asus computer', 'acer', 'msi', 'intel']):
-        return 'Computer'
-    if any(x in vendor_lower for x in ['philips', 'sonos', 'nest', 'ring', 'ecobee', 'wyze', 'espressif']):
-        return 'Smart Device'
-    if any(x in vendor_lower for x in ['sony', 'nintendo', 'microsoft xbox']):
-        return 'Gaming Console'
-    if any(x in vendor_lower for x in ['canon', 'epson', 'brother', 'xerox']):
-        return 'Printer'
-
-    return 'Unknown'
\ No newline at end of file
+    records = deduplicate_devices(_arp_records())
+
+    # Sort by integer IP (IPv4 before IPv6) for consistent UI ordering
+    records.sort(key=attrgetter('version', 'ip'))
+    return records
+
+
+@coalesce("network_devices")
+@recordable("network_devices")
+def get_network_devices() -> List[Dict[str, str]]:
+    """Get list of devices from ARP cache, serialised for JSON."""
+    return [r.to_dict() for r in collect_device_records()]
+
+
+def guess_device_type(vendor: str, mac: str = "") -> str:
+    """Guess device type from vendor name (rules in data/device_types.json)."""
+    return classify_vendor(vendor or "")
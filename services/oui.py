@@ -0,0 +1,83 @@
+# services/oui.py
+"""
+IEEE OUI registry: parsing and the compiled lookup artifact.
+
+The registry text (oui.txt, ~6 MB) is parsed line by line as it downloads
+and compiled into data/oui.json: {"meta": {...}, "ouis": {"AA:BB:CC": vendor}}.
+Loading that is a single json.load. The artifact is written to a temp file
+in the same directory and swapped in with os.replace, so readers see
+either the old or the new table, never a partial one. The meta block
+keeps the ETag/Last-Modified needed for the next conditional refresh.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+OUI_TEXT = ROOT / "data" / "oui.txt"
+OUI_COMPILED = ROOT / "data" / "oui.json"
+
+ARTIFACT_FORMAT = 1
+
+_HEX_LINE = re.compile(r'^([0-9A-Fa-f]{2})-([0-9A-Fa-f]{2})-([0-9A-Fa-f]{2})\s+\(hex\)\s+(.+)$')
+
+
+def parse_oui_lines(lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """(AA:BB:CC, vendor) for every "(hex)" line; works on a streaming line iterator."""
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        match = _HEX_LINE.match(line)
+        if match:
+            prefix = f"{match.group(1)}:{match.group(2)}:{match.group(3)}".upper()
+            yield prefix, match.group(4).strip()
+
+
+def write_artifact(ouis: Dict[str, str], dest: Path, meta: Optional[Dict[str, Any]] = None) -> None:
+    """Atomically replace `dest` with the compiled table."""
+    meta = dict(meta or {})
+    meta.update({"format": ARTIFACT_FORMAT, "count": len(ouis), "compiled_at": int(time.time())})
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=dest.name + ".", suffix=".tmp", dir=str(dest.parent))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "ouis": ouis}, f, separators=(",", ":"), ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, dest)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def compile_lines(lines: Iterable[str], dest: Path, meta: Optional[Dict[str, Any]] = None,
+                  min_entries: int = 0) -> int:
+    """Parse and compile in one pass; refuses to replace the artifact with a truncated table."""
+    ouis = dict(parse_oui_lines(lines))
+    if len(ouis) < min_entries:
+        raise ValueError(f"only {len(ouis)} OUI entries parsed (expected at least {min_entries})")
+    write_artifact(ouis, dest, meta)
+    return len(ouis)
+
+
+def read_artifact(path: Path) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """(meta, ouis); raises OSError/ValueError for a missing or unreadable artifact."""
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or data.get("meta", {}).get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"{path} is not a format-{ARTIFACT_FORMAT} OUI artifact")
+    return data["meta"], data["ouis"]
+
+
+def artifact_meta(path: Path) -> Dict[str, Any]:
+    try:
+        return read_artifact(path)[0]
+    except (OSError, ValueError):
+        return {}
@@ -0,0 +1,553 @@
+# services/prices.py
+"""
+Price store: hand-edited CSV base + append-only ingestion log + compacted snapshot.
+
+Writes (POST /api/prices) go to numbered log segments in data/prices/ as
+NDJSON. A single writer thread group-commits whatever batches are queued:
+one write and one fsync per round, however many requests are waiting.
+
+A compactor thread periodically merges the unmerged tail into a per-item
+columnar snapshot (sorted ts/date/price lists). Each item lives in its own
+file under items/, so a compaction rewrites only the items the tail touched
+plus the small snapshot.json that points at them, then deletes log segments
+it fully covers. Readers take one immutable (snapshot, tail) view without
+locking, so ingestion never blocks them. The last two logged prices of every
+item are also kept in an index, so latest() never scans the tail.
+"""
+from __future__ import annotations
+
+import csv
+import hashlib
+import heapq
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+DATA_DIR = ROOT / "data"
+PRICES_CSV = DATA_DIR / "prices.csv"
+STORE_DIR = DATA_DIR / "prices"
+
+SEGMENT_BYTES = 4 * 1024 * 1024   # rotate log segments at this size
+COMPACT_INTERVAL = 10.0           # seconds between compactions
+COMPACT_ROWS = 50_000             # ...or sooner once the tail is this long
+MAX_BATCH_ROWS = 10_000
+CSV_CHECK_INTERVAL = 1.0          # how often readers stat prices.csv
+
+# item -> (ts list, date list, price list), each sorted by ts
+Columns = Tuple[List[Optional[int]], List[str], List[float]]
+# item -> last two logged (sort ts, log sequence, price), oldest first
+LatestIndex = Dict[str, Tuple[Tuple[float, int, float], ...]]
+
+
+class PriceValidationError(ValueError):
+    def __init__(self, errors: List[Dict[str, Any]]):
+        super().__init__(f"{len(errors)} invalid row(s)")
+        self.errors = errors
+
+
+def _sort_ts(ts: Optional[int]) -> float:
+    # Undated CSV rows sort after dated ones, as the original loader did
+    return math.inf if ts is None else ts
+
+
+def _date_to_ts(date: str) -> int:
+    dt = datetime.fromisoformat(date.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def validate_rows(rows: Any) -> List[Tuple[int, str, str, float]]:
+    """Validate an ingestion batch; returns (ts, date, item, price) tuples or raises."""
+    if not isinstance(rows, list) or not rows:
+        raise PriceValidationError([{"error": "rows must be a non-empty list"}])
+    if len(rows) > MAX_BATCH_ROWS:
+        raise PriceValidationError([{"error": f"at most {MAX_BATCH_ROWS} rows per batch"}])
+
+    out, errors = [], []
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    for i, r in enumerate(rows):
+        if not isinstance(r, dict):
+            errors.append({"row": i, "error": "row must be an object"})
+            continue
+        item = r.get("item")
+        price = r.get("price")
+        date = r.get("date") or now.isoformat()
+        if not isinstance(item, str) or not item.strip() or len(item) > 100 or "\n" in item:
+            errors.append({"row": i, "error": "item must be a non-empty string (max 100 chars)"})
+            continue
+        if isinstance(price, bool) or not isinstance(price, (int, float)) or not math.isfinite(price) or price < 0:
+            errors.append({"row": i, "error": "price must be a non-negative number"})
+            continue
+        try:
+            ts = _date_to_ts(str(date))
+        except ValueError:
+            errors.append({"row": i, "error": "date must be ISO 8601"})
+            continue
+        out.append((ts, str(date), item.strip(), float(price)))
+    if errors:
+        raise PriceValidationError(errors)
+    return out
+
+
+def _load_csv_columns(path: Path) -> Dict[str, Columns]:
+    rows: Dict[str, List[Tuple[Optional[int], str, float]]] = {}
+    if not path.exists():
+        return {}
+    with path.open(newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            try:
+                d = (r.get("date") or "").strip()
+                item = (r.get("item") or "").strip()
+                price = float((r.get("price") or "0").strip())
+                ts = _date_to_ts(d) if d else None
+            except Exception:
+                continue
+            rows.setdefault(item, []).append((ts, d, price))
+    return {item: _to_columns(sorted(lst, key=lambda x: _sort_ts(x[0]))) for item, lst in rows.items()}
+
+
+def _to_columns(rows: List[Tuple[Optional[int], str, float]]) -> Columns:
+    return ([r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows])
+
+
+def _iter_columns(cols: Columns) -> Iterator[Tuple[Optional[int], str, float]]:
+    return zip(*cols)
+
+
+class _Pending:
+    __slots__ = ("rows", "done", "error")
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+class PriceStore:
+    def __init__(self, store_dir: Path = STORE_DIR, csv_path: Path = PRICES_CSV,
+                 compact_interval: float = COMPACT_INTERVAL, compact_rows: int = COMPACT_ROWS):
+        self.dir = store_dir
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.csv_path = csv_path
+        self.compact_interval = compact_interval
+        self.compact_rows = compact_rows
+
+        self._lock = threading.Lock()          # guards view swaps and tail appends
+        self._cond = threading.Condition()     # writer queue
+        self._queue: List[_Pending] = []
+        self._compact_wake = threading.Event()
+        self._compact_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self._base: Dict[str, Columns] = {}
+        self._base_mtime: Optional[float] = None
+        self._base_checked = 0.0
+        self._refresh_base(force=True)
+
+        self._item_files: Dict[str, str] = {}
+        snapshot, position = self._load_snapshot()
+        tail = self._replay(position)
+        # tail rows: (ts, date, item, price, gen, end_offset)
+        self._view: Tuple[Dict[str, Columns], List[tuple]] = (snapshot, tail)
+
+        # Snapshot rows get negative sequence numbers so logged rows win ties
+        self._seq = 0
+        self._latest: LatestIndex = {
+            item: tuple((_sort_ts(ts[i]), i - len(ts), price[i]) for i in range(max(0, len(ts) - 2), len(ts)))
+            for item, (ts, _, price) in snapshot.items()
+        }
+        self._index(tail)
+
+        # Always start a fresh segment so a torn last line is never appended to
+        self._gen = max([position[0]] + self._segment_gens()) + 1
+        self._fh = open(self._segment_path(self._gen), "ab")
+        self.commits = 0
+        self.rows_written = 0
+        self.compactions = 0
+
+        self._writer = threading.Thread(target=self._write_loop, name="prices-writer", daemon=True)
+        self._compactor = threading.Thread(target=self._compact_loop, name="prices-compactor", daemon=True)
+        self._writer.start()
+        self._compactor.start()
+
+    # ---------- files ----------
+    def _segment_path(self, gen: int) -> Path:
+        return self.dir / f"prices-{gen:06d}.log"
+
+    def _segment_gens(self) -> List[int]:
+        gens = []
+        for p in self.dir.glob("prices-*.log"):
+            try:
+                gens.append(int(p.stem.split("-")[1]))
+            except (IndexError, ValueError):
+                continue
+        return sorted(gens)
+
+    @property
+    def _snapshot_path(self) -> Path:
+        return self.dir / "snapshot.json"
+
+    @property
+    def _items_dir(self) -> Path:
+        return self.dir / "items"
+
+    def _load_snapshot(self) -> Tuple[Dict[str, Columns], Tuple[int, int]]:
+        try:
+            data = json.loads(self._snapshot_path.read_text(encoding="utf-8"))
+            items, files = {}, {}
+            for item, ref in data.get("items", {}).items():
+                if isinstance(ref, str):
+                    ref_cols = json.loads((self._items_dir / ref).read_text(encoding="utf-8"))
+                    files[item] = ref
+                else:
+                    ref_cols = ref  # older snapshots kept the columns inline
+                items[item] = (ref_cols[0], ref_cols[1], ref_cols[2])
+            position = tuple(data.get("position", (0, 0)))
+        except FileNotFoundError:
+            return {}, (0, 0)
+        except Exception as e:
+            print(f"Error loading price snapshot: {e}")
+            return {}, (0, 0)
+
+        # Item files written by a compaction that never got to swap snapshot.json
+        self._item_files = files
+        referenced = set(files.values())
+        for p in self._items_dir.glob("*.json"):
+            if p.name not in referenced:
+                p.unlink(missing_ok=True)
+        return items, position
+
+    @staticmethod
+    def _write_json(path: Path, data: Any) -> None:
+        tmp = path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _replay(self, position: Tuple[int, int]) -> List[tuple]:
+        """Rows logged after the snapshot position, in log order."""
+        tail = []
+        for gen in self._segment_gens():
+            if gen < position[0]:
+                continue
+            start = position[1] if gen == position[0] else 0
+            with self._segment_path(gen).open("rb") as f:
+                f.seek(start)
+                offset = start
+                for line in f:
+                    offset += len(line)
+                    try:
+                        ts, date, item, price = json.loads(line)
+                    except ValueError:
+                        continue  # torn write at the end of a segment
+                    tail.append((ts, date, item, price, gen, offset))
+        return tail
+
+    def _refresh_base(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._base_checked < CSV_CHECK_INTERVAL:
+            return
+        self._base_checked = now
+        try:
+            mtime = self.csv_path.stat().st_mtime
+        except OSError:
+            mtime = None
+        if force or mtime != self._base_mtime:
+            self._base = _load_csv_columns(self.csv_path)
+            self._base_mtime = mtime
+
+    # ---------- writes (group commit) ----------
+    def append(self, rows: List[Tuple[int, str, str, float]], timeout: float = 10.0) -> int:
+        """Queue validated rows and wait until they are fsynced."""
+        pending = _Pending(rows)
+        with self._cond:
+            self._queue.append(pending)
+            self._cond.notify()
+        if not pending.done.wait(timeout):
+            raise TimeoutError("price log commit timed out")
+        if pending.error is not None:
+            raise pending.error
+        return len(rows)
+
+    def _write_loop(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._stop.is_set())
+                batch, self._queue = self._queue, []
+            if not batch:
+                return
+            try:
+                self._commit(batch)
+            except Exception as e:
+                print(f"Error writing price log: {e}")
+                for p in batch:
+                    p.error = e
+            for p in batch:
+                p.done.set()
+
+    def _rotate(self) -> None:
+        if not self._fh.closed:
+            self._fh.close()
+        self._gen += 1
+        self._fh = open(self._segment_path(self._gen), "ab")
+
+    def _abandon_write(self, size: int) -> None:
+        """Cut the segment back to before a failed write and continue in a new one.
+
+        Otherwise a partly written batch would be replayed on restart although
+        its callers were told it failed, and a torn line would swallow the
+        first line of the next batch.
+        """
+        path = self._segment_path(self._gen)
+        try:
+            self._fh.close()
+        except OSError:
+            pass  # flushing the rest of the failed write; it is cut off below
+        try:
+            os.truncate(path, size)
+        except OSError as e:
+            print(f"Error truncating price log {path.name}: {e}")
+        self._rotate()
+
+    def _commit(self, batch: List[_Pending]) -> None:
+        if self._fh.closed or self._fh.tell() >= SEGMENT_BYTES:
+            self._rotate()
+
+        gen, start = self._gen, self._fh.tell()
+        offset = start
+        chunks, rows = [], []
+        for p in batch:
+            for ts, date, item, price in p.rows:
+                line = (json.dumps([ts, date, item, price], separators=(",", ":")) + "\n").encode("utf-8")
+                offset += len(line)
+                chunks.append(line)
+                rows.append((ts, date, item, price, gen, offset))
+        try:
+            self._fh.write(b"".join(chunks))
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+        except BaseException:
+            self._abandon_write(start)
+            raise
+
+        with self._lock:
+            tail = self._view[1]
+            tail.extend(rows)
+            tail_len = len(tail)
+            self._index(rows)
+        self.commits += 1
+        self.rows_written += len(rows)
+        if tail_len >= self.compact_rows:
+            self._compact_wake.set()
+
+    def _index(self, rows: List[tuple]) -> None:
+        """Fold logged rows into the latest-price index (writer side, under _lock)."""
+        index = self._latest
+        if any(r[2] not in index for r in rows):
+            index = dict(index)  # new items: copy so readers never see the dict resize
+        for ts, _, item, price, _, _ in rows:
+            entry = (_sort_ts(ts), self._seq, price)
+            self._seq += 1
+            index[item] = tuple(sorted(index.get(item, ()) + (entry,)))[-2:]
+        self._latest = index
+
+    # ---------- compaction ----------
+    def _compact_loop(self) -> None:
+        while not self._stop.is_set():
+            self._compact_wake.wait(self.compact_interval)
+            self._compact_wake.clear()
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"Error compacting price log: {e}")
+
+    def compact(self) -> int:
+        """Merge the current tail into a new snapshot; returns rows merged."""
+        with self._compact_lock:
+            return self._compact()
+
+    def _compact(self) -> int:
+        snapshot, tail = self._view
+        n = len(tail)
+        if n == 0:
+            return 0
+        merged_rows = tail[:n]
+
+        by_item: Dict[str, List[Tuple[int, str, float]]] = {}
+        for ts, date, item, price, _, _ in merged_rows:
+            by_item.setdefault(item, []).append((ts, date, price))
+
+        # Untouched items share their (immutable) columns with the old snapshot
+        new_snapshot = dict(snapshot)
+        for item, rows in by_item.items():
+            rows.sort(key=lambda r: r[0])
+            old = snapshot.get(item)
+            merged = heapq.merge(_iter_columns(old), rows, key=lambda r: r[0]) if old else rows
+            new_snapshot[item] = _to_columns(list(merged))
+
+        position = (merged_rows[-1][4], merged_rows[-1][5])
+
+        # Only touched items (and any still inline from an older snapshot) are rewritten
+        self._items_dir.mkdir(exist_ok=True)
+        files = dict(self._item_files)
+        touched = set(by_item) | {item for item in new_snapshot if item not in files}
+        for item in touched:
+            digest = hashlib.sha1(item.encode("utf-8")).hexdigest()[:16]
+            files[item] = f"{digest}-{position[0]:06d}-{position[1]}.json"
+            self._write_json(self._items_dir / files[item], list(new_snapshot[item]))
+        self._write_json(self._snapshot_path, {"position": position, "items": files})
+        stale = [self._item_files[item] for item in touched if item in self._item_files]
+        self._item_files = files
+
+        with self._lock:
+            _, current_tail = self._view
+            self._view = (new_snapshot, current_tail[n:])
+
+        for name in stale:
+            (self._items_dir / name).unlink(missing_ok=True)
+        for gen in self._segment_gens():
+            if gen < position[0]:
+                self._segment_path(gen).unlink(missing_ok=True)
+        self.compactions += 1
+        return n
+
+    # ---------- reads ----------
+    def _sources(self):
+        self._refresh_base()
+        snapshot, tail = self._view
+        n = len(tail)  # rows appended after this point are not part of this read
+        return self._base, snapshot, tail, n
+
+    def latest(self) -> List[Dict[str, Any]]:
+        """Latest price per item with change vs. the previous entry."""
+        self._refresh_base()
+        base, index = self._base, self._latest
+        candidates: Dict[str, List[Tuple[float, int, int, float]]] = {}
+        # (sort ts, source rank, order, price): later rows win ties, like file order did
+        for item, (ts, _, price) in base.items():
+            candidates[item] = [(_sort_ts(ts[i]), 0, i, price[i]) for i in range(max(0, len(ts) - 2), len(ts))]
+        for item, entries in list(index.items()):
+            candidates.setdefault(item, []).extend((t, 1, seq, p) for t, seq, p in entries)
+
+        result = []
+        for item, lst in candidates.items():
+            lst.sort(key=lambda c: c[:3])
+            latest = lst[-1][3]
+            prev = lst[-2][3] if len(lst) >= 2 else None
+
+            if prev is None:
+                change, direction = None, "flat"
+            else:
+                delta = latest - prev
+                if abs(delta) < 1e-9:
+                    direction = "flat"
+                elif delta > 0:
+                    direction = "up"
+                else:
+                    direction = "down"
+                change = delta
+
+            result.append({
+                "item": item,
+                "price": latest,
+                "change": change,
+                "direction": direction
+            })
+
+        result.sort(key=lambda x: x["item"].lower())
+        return result
+
+    @staticmethod
+    def _tail_by_item(tail: List[tuple], n: int, only: Optional[str] = None) -> Dict[str, List[tuple]]:
+        grouped: Dict[str, List[tuple]] = {}
+        for i in range(n):
+            ts, date, item, price, _, _ = tail[i]
+            if only is None or item == only:
+                grouped.setdefault(item, []).append((ts, date, price))
+        for rows in grouped.values():
+            rows.sort(key=lambda r: _sort_ts(r[0]))
+        return grouped
+
+    @staticmethod
+    def _item_stream(item: str, base, snapshot, tail_rows) -> Iterator[Tuple[Optional[int], str, float]]:
+        streams = [_iter_columns(source[item]) for source in (base, snapshot) if item in source]
+        streams.append(tail_rows.get(item, ()))
+        return heapq.merge(*streams, key=lambda r: _sort_ts(r[0]))
+
+    def history(self, item: str, start: Optional[int] = None, end: Optional[int] = None) -> List[Dict[str, Any]]:
+        base, snapshot, tail, n = self._sources()
+        tail_rows = self._tail_by_item(tail, n, only=item)
+        return [
+            {"ts": ts, "date": date, "price": price}
+            for ts, date, price in self._item_stream(item, base, snapshot, tail_rows)
+            if _in_range(ts, start, end)
+        ]
+
+    def iter_history(self, start: Optional[int] = None, end: Optional[int] = None) -> Iterator[Tuple]:
+        """All items as (ts, date, item, price), merged in time order."""
+        base, snapshot, tail, n = self._sources()
+        tail_rows = self._tail_by_item(tail, n)
+        items = set(base) | set(snapshot) | set(tail_rows)
+
+        def tagged(item):
+            for ts, date, price in self._item_stream(item, base, snapshot, tail_rows):
+                yield ts, date, item, price
+
+        for row in heapq.merge(*(tagged(i) for i in sorted(items)), key=lambda r: _sort_ts(r[0])):
+            if _in_range(row[0], start, end):
+                yield row
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot, tail = self._view
+        return {
+            "commits": self.commits,
+            "rows_written": self.rows_written,
+            "compactions": self.compactions,
+            "tail_rows": len(tail),
+            "snapshot_items": len(snapshot),
+            "segment": self._gen,
+        }
+
+    def close(self) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        self._compact_wake.set()
+        self._writer.join(5)
+        self._compactor.join(5)
+        self._fh.close()
+
+
+def _in_range(ts: Optional[int], start: Optional[int], end: Optional[int]) -> bool:
+    if ts is None:
+        return start is None and end is None
+    return (start is None or ts >= start) and (end is None or ts < end)
+
+
+_store: Optional[PriceStore] = None
+_store_lock = threading.Lock()
+
+
+def get_price_store() -> PriceStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            store_dir = Path(os.environ.get("NETHEALTH_PRICES_DIR") or STORE_DIR)
+            _store = PriceStore(store_dir)
+        return _store
+
+
+def cache_stats() -> Dict[str, Any]:
+    if _store is None:
+        return {}
+    stats = _store.stats()
+    return {"prices": {"tail_rows": stats["tail_rows"], "snapshot_items": stats["snapshot_items"]}}
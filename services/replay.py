@@ -0,0 +1,275 @@
+# services/replay.py
+"""
+Record and replay collector outputs and upstream responses.
+
+Record mode (NETHEALTH_RECORD=path) appends one compact JSON line per call
+of every @recordable function: wall time, kind, key, duration and the
+returned value (or the error type and HTTP status). The file is append-only and line-buffered,
+so it survives crashes and can be captured from a production host.
+
+Replay mode (NETHEALTH_REPLAY=path) serves those values instead of calling
+psutil, arp or WeatherAPI. Records are replayed on the recorded timeline,
+scaled by NETHEALTH_REPLAY_SPEED (2 = twice as fast). Speed 0 steps to the
+next record on every call, which is what deterministic benchmarks want.
+NETHEALTH_REPLAY_LATENCY=on also sleeps for the recorded call duration
+(scaled by speed), so slow upstreams are slow again. The timeline loops
+unless NETHEALTH_REPLAY_LOOP=off.
+
+When replay has no record for a local collector, the live function runs.
+For upstream calls it raises ReplayMiss, so a replay never touches the network.
+"""
+from __future__ import annotations
+
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+RECORD_ENV = "NETHEALTH_RECORD"
+REPLAY_ENV = "NETHEALTH_REPLAY"
+SPEED_ENV = "NETHEALTH_REPLAY_SPEED"
+LOOP_ENV = "NETHEALTH_REPLAY_LOOP"
+LATENCY_ENV = "NETHEALTH_REPLAY_LATENCY"
+
+
+class ReplayMiss(LookupError):
+    """Replay file has no record for this upstream call."""
+
+
+class ReplayedError(RuntimeError):
+    """An upstream error captured in record mode, raised again on replay."""
+
+
+def _truthy(value: Optional[str], default: bool) -> bool:
+    if value is None or value == "":
+        return default
+    return value.lower() not in ("0", "off", "false", "no")
+
+
+class Recorder:
+    def __init__(self, path: Path):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = path.open("a", encoding="utf-8", buffering=1)
+        self._lock = threading.Lock()
+        self.records = 0
+
+    def record(self, kind: str, key: Optional[str], value: Any, duration: float,
+               error: Optional[str] = None) -> None:
+        entry: Dict[str, Any] = {"ts": round(time.time(), 3), "k": kind, "d": round(duration, 4)}
+        if key is not None:
+            entry["id"] = key
+        if error is not None:
+            entry["e"] = error
+        else:
+            entry["v"] = value
+        line = json.dumps(entry, separators=(",", ":"), default=str)
+        with self._lock:
+            self._fh.write(line + "\n")
+            self.records += 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._fh.close()
+
+
+class Replayer:
+    def __init__(self, path: Path, speed: float = 1.0, loop: bool = True, latency: bool = False):
+        self.path = path
+        self.speed = max(0.0, speed)
+        self.loop = loop
+        self.latency = latency
+        # (kind, key) -> parallel lists of offsets and (duration, value, error)
+        self._offsets: Dict[Tuple[str, Optional[str]], List[float]] = {}
+        self._entries: Dict[Tuple[str, Optional[str]], List[Tuple[float, Any, Optional[str]]]] = {}
+        self._cursor: Dict[Tuple[str, Optional[str]], int] = {}
+        self._lock = threading.Lock()
+        self.duration = 0.0
+        self.served = 0
+        self.misses = 0
+        self._load()
+        self._started = time.monotonic()
+
+    def _load(self) -> None:
+        rows = []
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    continue  # torn last line of a recording that was still running
+        if not rows:
+            return
+        rows.sort(key=lambda r: r["ts"])
+        first = rows[0]["ts"]
+        self.duration = rows[-1]["ts"] - first
+        for r in rows:
+            track = (r["k"], r.get("id"))
+            self._offsets.setdefault(track, []).append(r["ts"] - first)
+            self._entries.setdefault(track, []).append((r.get("d", 0.0), r.get("v"), r.get("e")))
+
+    @property
+    def tracks(self) -> Dict[str, int]:
+        return {f"{k}:{key}" if key is not None else k: len(v) for (k, key), v in self._entries.items()}
+
+    def size(self) -> Tuple[int, int]:
+        """(tracks, records) held in memory."""
+        with self._lock:
+            return len(self._entries), sum(len(v) for v in self._entries.values())
+
+    def _position(self) -> float:
+        elapsed = (time.monotonic() - self._started) * self.speed
+        if self.loop and self.duration > 0:
+            # one extra second so the last record is not skipped on wrap-around
+            return elapsed % (self.duration + 1.0)
+        return elapsed
+
+    def lookup(self, kind: str, key: Optional[str]) -> Optional[Tuple[float, Any, Optional[str]]]:
+        track = (kind, key)
+        entries = self._entries.get(track)
+        if not entries:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            if self.speed == 0:
+                i = self._cursor.get(track, 0)
+                nxt = i + 1
+                self._cursor[track] = nxt % len(entries) if self.loop else min(nxt, len(entries) - 1)
+            else:
+                i = max(0, bisect.bisect_right(self._offsets[track], self._position()) - 1)
+            self.served += 1
+        return entries[i]
+
+    def replay(self, kind: str, key: Optional[str]) -> Tuple[bool, Any]:
+        """(hit, value); raises ReplayedError for a recorded failure."""
+        entry = self.lookup(kind, key)
+        if entry is None:
+            return False, None
+        duration, value, error = entry
+        if self.latency and duration:
+            time.sleep(duration / self.speed if self.speed else duration)
+        if error is not None:
+            raise ReplayedError(error)
+        return True, value
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": str(self.path), "speed": self.speed, "loop": self.loop, "latency": self.latency,
+                "duration_s": round(self.duration, 3), "served": self.served, "misses": self.misses,
+                "tracks": self.tracks}
+
+
+_recorder: Optional[Recorder] = None
+_replayer: Optional[Replayer] = None
+_configured = False
+_config_lock = threading.Lock()
+
+
+def configure(record: Optional[str] = None, replay: Optional[str] = None, speed: float = 1.0,
+              loop: bool = True, latency: bool = False) -> None:
+    """Set the mode explicitly (tests, scripts); replaces any current recorder/replayer."""
+    global _recorder, _replayer, _configured
+    if record and replay:
+        raise ValueError("record and replay are mutually exclusive")
+    with _config_lock:
+        if _recorder is not None:
+            _recorder.close()
+        _recorder = Recorder(Path(record)) if record else None
+        _replayer = Replayer(Path(replay), speed, loop, latency) if replay else None
+        _configured = True
+
+
+def _ensure_configured() -> None:
+    if _configured:
+        return
+    env = os.environ
+    try:
+        configure(
+            record=env.get(RECORD_ENV) or None,
+            replay=env.get(REPLAY_ENV) or None,
+            speed=float(env.get(SPEED_ENV) or 1.0),
+            loop=_truthy(env.get(LOOP_ENV), True),
+            latency=_truthy(env.get(LATENCY_ENV), False),
+        )
+    except (OSError, ValueError) as e:
+        print(f"Error configuring record/replay: {e}")
+        configure()
+
+
+def reset() -> None:
+    """Forget the current mode; the next call re-reads the environment."""
+    global _recorder, _replayer, _configured
+    with _config_lock:
+        if _recorder is not None:
+            _recorder.close()
+        _recorder = _replayer = None
+        _configured = False
+
+
+def replaying() -> bool:
+    _ensure_configured()
+    return _replayer is not None
+
+
+def status() -> Dict[str, Any]:
+    _ensure_configured()
+    if _replayer is not None:
+        return {"mode": "replay", **_replayer.stats()}
+    if _recorder is not None:
+        return {"mode": "record", "path": str(_recorder.path), "records": _recorder.records}
+    return {"mode": "live"}
+
+
+def cache_stats() -> Dict[str, int]:
+    replayer = _replayer
+    if replayer is None:
+        return {}
+    tracks, records = replayer.size()
+    return {"replay_tracks": tracks, "replay_records": records}
+
+
+def error_text(e: Exception) -> str:
+    """Exception type and HTTP status only: requests' messages include the URL, API key and all."""
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    return type(e).__name__ if status is None else f"{type(e).__name__}: {status}"
+
+
+def recordable(kind: str, key: Optional[Callable[..., str]] = None, upstream: bool = False) -> Callable:
+    """Decorator: record the function's results, or serve them back in replay mode.
+
+    `key` maps the call arguments to a replay key (never include secrets);
+    `upstream` marks calls that must not fall through to the network on a miss.
+    """
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            _ensure_configured()
+            replayer, recorder = _replayer, _recorder
+            if replayer is None and recorder is None:
+                return fn(*args, **kwargs)
+
+            k = key(*args, **kwargs) if key else None
+            if replayer is not None:
+                hit, value = replayer.replay(kind, k)
+                if hit:
+                    return value
+                if upstream:
+                    raise ReplayMiss(f"no recorded {kind} response for {k!r}")
+                return fn(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                value = fn(*args, **kwargs)
+            except Exception as e:
+                recorder.record(kind, k, None, time.perf_counter() - start, error=error_text(e))
+                raise
+            recorder.record(kind, k, value, time.perf_counter() - start)
+            return value
+
+        return wrapper
+
+    return decorator
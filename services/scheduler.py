@@ -0,0 +1,328 @@
+# services/scheduler.py
+"""
+Server-side collector scheduler.
+
+Each collector registers an interval, jitter, timeout and CPU-time budget.
+A single timer thread hands due collectors to a bounded worker pool, and
+results are published into a shared snapshot that routes read instead of
+collecting on demand. Subscribers (alerts, history) see every published
+sample exactly once.
+
+- At most one run per collector is in flight. A collector still running
+  when it is due again is skipped for that slot.
+- A run that exceeds its timeout is marked timed out (threads cannot be
+  killed; the collector just isn't rescheduled until it returns). A late
+  result is still published.
+- CPU time is measured with time.thread_time() in the worker. A run over
+  its budget, a timeout or an error doubles the collector's backoff, up to
+  MAX_BACKOFF x interval. Each clean run halves it again.
+"""
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+MAX_WORKERS = 4
+MAX_BACKOFF = 8.0
+STALE_AFTER = 3.0   # snapshot entries older than this many intervals are not served
+
+
+class Collector:
+    def __init__(self, name: str, fn: Callable[[], Any], interval: float, jitter: float = 0.1,
+                 timeout: Optional[float] = None, cpu_budget: Optional[float] = None):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.jitter = jitter            # fraction of the interval
+        self.timeout = timeout          # seconds of wall time
+        self.cpu_budget = cpu_budget    # seconds of CPU time per run
+        self.backoff = 1.0
+        self.next_run = 0.0
+        self.running_since: Optional[float] = None
+        self.timed_out = False
+        self.runs = 0
+        self.errors = 0
+        self.skipped = 0
+        self.timeouts = 0
+        self.over_budget = 0
+        self.last_wall: Optional[float] = None
+        self.last_cpu: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_run: Optional[float] = None
+
+    def delay(self) -> float:
+        base = self.interval * self.backoff
+        return max(0.0, base + random.uniform(-self.jitter, self.jitter) * self.interval)
+
+    def status(self, now: float) -> Dict[str, Any]:
+        running = self.running_since is not None
+        return {
+            "name": self.name,
+            "interval": self.interval,
+            "jitter": self.jitter,
+            "timeout": self.timeout,
+            "cpu_budget": self.cpu_budget,
+            "backoff": self.backoff,
+            "running": running,
+            "running_for": round(now - self.running_since, 3) if running else None,
+            "next_in": None if running else round(max(0.0, self.next_run - now), 3),
+            "runs": self.runs,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "timeouts": self.timeouts,
+            "over_budget": self.over_budget,
+            "last_run": self.last_run,
+            "last_wall_ms": round(self.last_wall * 1000, 1) if self.last_wall is not None else None,
+            "last_cpu_ms": round(self.last_cpu * 1000, 1) if self.last_cpu is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+class Scheduler:
+    def __init__(self, max_workers: int = MAX_WORKERS):
+        self.max_workers = max_workers
+        self._collectors: Dict[str, Collector] = {}
+        self._subscribers: Dict[str, List[Callable[[Any], None]]] = {}
+        # name -> (wall ts, monotonic ts, value); replaced wholesale on publish
+        self._snapshot: Dict[str, Tuple[float, float, Any]] = {}
+        self._cond = threading.Condition()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    # ---------- registration ----------
+    def register(self, name: str, fn: Callable[[], Any], interval: float, jitter: float = 0.1,
+                 timeout: Optional[float] = None, cpu_budget: Optional[float] = None) -> Collector:
+        collector = Collector(name, fn, interval, jitter, timeout, cpu_budget)
+        with self._cond:
+            if name in self._collectors:
+                raise ValueError(f"collector {name!r} already registered")
+            # spread first runs over the jitter window instead of firing together
+            collector.next_run = time.monotonic() + random.uniform(0, jitter * interval)
+            self._collectors[name] = collector
+            self._cond.notify()
+        return collector
+
+    def subscribe(self, name: str, fn: Callable[[Any], None]) -> None:
+        with self._cond:
+            self._subscribers.setdefault(name, []).append(fn)
+
+    # ---------- snapshot ----------
+    def publish(self, name: str, value: Any) -> None:
+        with self._cond:
+            snapshot = dict(self._snapshot)
+            snapshot[name] = (time.time(), time.monotonic(), value)
+            self._snapshot = snapshot
+            subscribers = list(self._subscribers.get(name, ()))
+        for fn in subscribers:
+            try:
+                fn(value)
+            except Exception as e:
+                print(f"Error in {name} subscriber: {e}")
+
+    def latest(self, name: str, max_age: Optional[float] = None) -> Optional[Any]:
+        """Last published value, or None if missing or older than max_age
+        (default: STALE_AFTER intervals of that collector, backoff included)."""
+        entry = self._snapshot.get(name)
+        if entry is None:
+            return None
+        if max_age is None:
+            collector = self._collectors.get(name)
+            if collector is not None:
+                max_age = STALE_AFTER * collector.interval * collector.backoff
+        if max_age is not None and time.monotonic() - entry[1] > max_age:
+            return None
+        return entry[2]
+
+    def published_at(self, name: str) -> Optional[float]:
+        entry = self._snapshot.get(name)
+        return entry[0] if entry else None
+
+    # ---------- running ----------
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> "Scheduler":
+        with self._cond:
+            if self.running:
+                return self
+            self._stopping = False
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="collector")
+            self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, wait: bool = False) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(5)
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+        self._thread = None
+
+    def _loop(self) -> None:
+        with self._cond:
+            while not self._stopping:
+                now = time.monotonic()
+                for c in self._collectors.values():
+                    if c.running_since is not None:
+                        self._check_timeout(c, now)
+                    if c.next_run > now:
+                        continue
+                    if c.running_since is not None:
+                        c.skipped += 1
+                        c.next_run = now + c.delay()
+                        continue
+                    c.running_since, c.timed_out = now, False
+                    # the slot after this one; if the run is still going then, it is skipped
+                    c.next_run = now + c.delay()
+                    self._pool.submit(self._execute, c)
+                waits = [c.next_run - now for c in self._collectors.values()]
+                waits += [c.running_since + c.timeout - now for c in self._collectors.values()
+                          if c.running_since is not None and c.timeout and not c.timed_out]
+                timeout = max(0.01, min(waits)) if waits else None
+                self._cond.wait(timeout)
+
+    def _check_timeout(self, c: Collector, now: float) -> None:
+        if c.timeout and not c.timed_out and now - c.running_since > c.timeout:
+            c.timed_out = True
+            c.timeouts += 1
+            c.last_error = "timeout"
+
+    def _execute(self, c: Collector) -> None:
+        cpu0 = time.thread_time()
+        wall0 = time.monotonic()
+        result, failed = None, False
+        try:
+            result = c.fn()
+        except Exception as e:
+            failed = True
+            with self._cond:
+                c.errors += 1
+                c.last_error = f"{type(e).__name__}: {e}"
+        cpu = time.thread_time() - cpu0
+        wall = time.monotonic() - wall0
+
+        if not failed and result is not None:
+            self.publish(c.name, result)
+
+        with self._cond:
+            timed_out = c.timed_out or bool(c.timeout and wall > c.timeout)
+            if timed_out and not c.timed_out:
+                c.timeouts += 1
+                c.last_error = "timeout"
+            over = bool(c.cpu_budget and cpu > c.cpu_budget)
+            if over:
+                c.over_budget += 1
+            if failed or timed_out or over:
+                c.backoff = min(MAX_BACKOFF, c.backoff * 2)
+            else:
+                c.backoff = max(1.0, c.backoff / 2)
+                c.last_error = None
+            c.runs += 1
+            c.last_run = time.time()
+            c.last_wall, c.last_cpu = wall, cpu
+            c.running_since = None
+            c.next_run = time.monotonic() + c.delay()
+            self._cond.notify()
+
+    def status(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._cond:
+            collectors = [c.status(now) for c in self._collectors.values()]
+        for entry in collectors:
+            entry["published_at"] = self.published_at(entry["name"])
+        return {"running": self.running, "max_workers": self.max_workers, "collectors": collectors}
+
+
+# -------------------------------
+# Default collectors
+# -------------------------------
+def _collect_weather() -> Optional[List[Dict[str, Any]]]:
+    """Refresh every configured location; also keeps the forecast cache warm for /api/weather."""
+    from services import weather
+    api_key = os.environ.get("WEATHERAPI_KEY", "").strip()
+    if not weather.requests or not api_key:
+        return None
+    return weather.get_forecasts(api_key, weather.configured_locations())
+
+
+def _observe_system(info: Dict[str, Any]) -> None:
+    from services.alerts import get_alert_engine
+    from services.history import record_system
+    get_alert_engine().observe("system", info)
+    record_system(info)
+
+
+def _observe_devices(devices: List[Dict[str, Any]]) -> None:
+    from services.alerts import get_alert_engine
+    from services.history import record_devices
+    from services.hostnames import enrich_devices
+    get_alert_engine().observe("devices", devices)
+    record_devices(devices)
+    enrich_devices(devices)  # start hostname lookups before anyone asks
+
+
+def register_default_collectors(scheduler: Scheduler) -> None:
+    from services.network_devices import get_network_devices
+    from services.system_info import get_system_info
+
+    # intervals follow the dashboard's polling (static/js/dashboard.js)
+    scheduler.register("system", get_system_info, interval=30, jitter=0.1, timeout=5, cpu_budget=0.5)
+    scheduler.register("network_devices", get_network_devices, interval=120, jitter=0.1, timeout=15,
+                       cpu_budget=1.0)
+    scheduler.register("weather", _collect_weather, interval=600, jitter=0.05, timeout=20, cpu_budget=1.0)
+    scheduler.subscribe("system", _observe_system)
+    scheduler.subscribe("network_devices", _observe_devices)
+
+
+def scheduler_enabled() -> bool:
+    return os.environ.get("NETHEALTH_SCHEDULER", "on").lower() not in ("0", "off", "false", "no")
+
+
+_scheduler: Optional[Scheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
+
+
+def start_scheduler() -> Optional[Scheduler]:
+    """Register the default collectors and start (app entrypoint)."""
+    if not scheduler_enabled():
+        return None
+    scheduler = get_scheduler()
+    with _scheduler_lock:
+        if not scheduler._collectors:
+            register_default_collectors(scheduler)
+    return scheduler.start()
+
+
+def scheduled(name: str) -> Optional[Any]:
+    """Fresh published value for a collector, or None (scheduler off, not yet run, or stale)."""
+    scheduler = _scheduler
+    if scheduler is None or not scheduler.running:
+        return None
+    return scheduler.latest(name)
+
+
+def cache_stats() -> Dict[str, Any]:
+    scheduler = _scheduler
+    if scheduler is None:
+        return {}
+    snapshot = scheduler._snapshot  # replaced wholesale on publish, so safe to read
+    return {"scheduler_snapshot": {
+        name: len(value) if isinstance(value, (list, dict)) else 1 for name, (_, _, value) in snapshot.items()
+    }}
@@ -0,0 +1,296 @@
+# services/selfmon.py
+"""
+Self-monitoring: the NetHealth process's own memory, threads, GC and caches.
+
+A background thread samples RSS and thread count every SAMPLE_INTERVAL
+seconds so slow growth over days shows up as a trend. A gc.callbacks hook
+times every collection per generation. Cache sizes come from the
+cache_stats() of the modules that own them, and only for modules already
+imported, so this module never loads a subsystem just to report on it.
+
+Allocation tracing is opt-in (NETHEALTH_TRACEMALLOC=<frames>) because
+tracemalloc slows every allocation. When on, it reports the top allocation
+sites and the difference against a baseline snapshot.
+"""
+from __future__ import annotations
+
+import gc
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+try:
+    import psutil  # type: ignore
+except Exception:  # pragma: no cover
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SAMPLE_INTERVAL = 30.0    # seconds between background samples
+SAMPLE_HISTORY = 2880     # 24h at the default interval
+RECENT_PAUSES = 50
+
+_MB = 1024 * 1024
+
+
+def _rss_bytes() -> Optional[int]:
+    if psutil:
+        try:
+            return psutil.Process().memory_info().rss
+        except Exception:
+            pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, KiB elsewhere
+
+
+def _mb(n: Optional[int]) -> Optional[float]:
+    return round(n / _MB, 2) if n is not None else None
+
+
+# Modules that own in-process caches; each exposes cache_stats()
+CACHE_MODULES = (
+    "services.network_devices",
+    "services.device_types",
+    "services.weather",
+    "services.singleflight",
+    "api.admission",
+    "services.fleet",
+    "services.alerts",
+    "services.prices",
+    "api.routes",
+    "services.hostnames",
+    "services.assets",
+    "services.scheduler",
+    "services.net_topology",
+    "services.history",
+    "services.replay",
+)
+
+
+def cache_sizes() -> Dict[str, Any]:
+    """Entry counts of every in-process cache that has been created."""
+    sizes: Dict[str, Any] = {}
+    for name in CACHE_MODULES:
+        stats = getattr(sys.modules.get(name), "cache_stats", None)
+        if stats is not None:
+            sizes.update(stats())
+    return sizes
+
+
+def tracemalloc_frames() -> int:
+    """Frames to keep per allocation from NETHEALTH_TRACEMALLOC; 0 = off."""
+    value = os.environ.get("NETHEALTH_TRACEMALLOC", "").strip().lower()
+    if value in ("", "0", "off", "false", "no"):
+        return 0
+    if value in ("1", "on", "true", "yes"):
+        return 1
+    try:
+        return max(1, min(int(value), 64))
+    except ValueError:
+        return 1
+
+
+class SelfMonitor:
+    def __init__(self, interval: float = SAMPLE_INTERVAL, history: int = SAMPLE_HISTORY):
+        self.interval = interval
+        self.started = time.time()
+        self.samples: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._baseline_at: Optional[float] = None
+
+        # Updated from gc.callbacks. No locks there: a collection can start
+        # while this thread already holds one.
+        self._gc_started = 0.0
+        self._pause_count = [0, 0, 0]
+        self._pause_total = [0.0, 0.0, 0.0]
+        self._pause_max = [0.0, 0.0, 0.0]
+        self._recent_pauses: Deque[tuple] = deque(maxlen=RECENT_PAUSES)
+
+    # ---------- GC ----------
+    def _gc_callback(self, phase: str, info: Dict[str, int]) -> None:
+        if phase == "start":
+            self._gc_started = time.perf_counter()
+            return
+        pause = time.perf_counter() - self._gc_started
+        gen = min(info.get("generation", 0), 2)
+        self._pause_count[gen] += 1
+        self._pause_total[gen] += pause
+        if pause > self._pause_max[gen]:
+            self._pause_max[gen] = pause
+        self._recent_pauses.append((round(time.time(), 3), gen, round(pause * 1000, 3)))
+
+    def _gc_report(self) -> Dict[str, Any]:
+        generations = []
+        for gen, stats in enumerate(gc.get_stats()[:3]):
+            count = self._pause_count[gen]
+            generations.append({
+                "generation": gen,
+                "collections": stats.get("collections"),
+                "collected": stats.get("collected"),
+                "uncollectable": stats.get("uncollectable"),
+                "timed_collections": count,
+                "pause_total_ms": round(self._pause_total[gen] * 1000, 3),
+                "pause_max_ms": round(self._pause_max[gen] * 1000, 3),
+                "pause_avg_ms": round(self._pause_total[gen] / count * 1000, 3) if count else None,
+            })
+        return {
+            "enabled": gc.isenabled(),
+            "counts": list(gc.get_count()),
+            "thresholds": list(gc.get_threshold()),
+            "garbage": len(gc.garbage),
+            "generations": generations,
+            "recent_pauses": [{"ts": ts, "generation": g, "ms": ms} for ts, g, ms in list(self._recent_pauses)],
+        }
+
+    # ---------- background sampling ----------
+    def start(self) -> "SelfMonitor":
+        with self._lock:
+            if self._thread is not None:
+                return self
+            if self._gc_callback not in gc.callbacks:
+                gc.callbacks.append(self._gc_callback)
+            frames = tracemalloc_frames()
+            if frames and not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            self._thread = threading.Thread(target=self._run, name="selfmon", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._gc_callback in gc.callbacks:
+            gc.callbacks.remove(self._gc_callback)
+
+    def _run(self) -> None:
+        while True:
+            self.sample()
+            if self._stop.wait(self.interval):
+                return
+
+    def sample(self) -> Dict[str, Any]:
+        s = {
+            "ts": int(time.time()),
+            "rss_mb": _mb(_rss_bytes()),
+            "threads": threading.active_count(),
+            "gc_counts": list(gc.get_count()),
+        }
+        self.samples.append(s)
+        return s
+
+    def _trend(self) -> Dict[str, Any]:
+        samples = [s for s in list(self.samples) if s["rss_mb"] is not None]
+        if len(samples) < 2:
+            return {"samples": len(samples), "rss_growth_mb": None, "rss_growth_mb_per_hour": None}
+        first, last = samples[0], samples[-1]
+        hours = (last["ts"] - first["ts"]) / 3600
+        growth = last["rss_mb"] - first["rss_mb"]
+        return {
+            "samples": len(samples),
+            "since": first["ts"],
+            "rss_growth_mb": round(growth, 2),
+            "rss_growth_mb_per_hour": round(growth / hours, 3) if hours > 0 else None,
+            "threads_min": min(s["threads"] for s in samples),
+            "threads_max": max(s["threads"] for s in samples),
+        }
+
+    # ---------- report ----------
+    def report(self) -> Dict[str, Any]:
+        rss = _rss_bytes()
+        return {
+            "pid": os.getpid(),
+            "uptime_seconds": int(time.time() - self.started),
+            "python": sys.version.split()[0],
+            "memory": {"rss_mb": _mb(rss), "peak_rss_mb": _mb(_peak_rss_bytes())},
+            "threads": {
+                "count": threading.active_count(),
+                "names": sorted(t.name for t in threading.enumerate()),
+            },
+            "gc": self._gc_report(),
+            "caches": cache_sizes(),
+            "trend": self._trend(),
+            "tracemalloc": {"enabled": tracemalloc.is_tracing(), "frames": tracemalloc.get_traceback_limit()
+                            if tracemalloc.is_tracing() else 0, "baseline_at": self._baseline_at},
+        }
+
+    # ---------- tracemalloc ----------
+    def take_baseline(self) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is off; start the app with NETHEALTH_TRACEMALLOC=<frames>")
+        snapshot = tracemalloc.take_snapshot()
+        with self._lock:
+            self._baseline, self._baseline_at = snapshot, time.time()
+        current, peak = tracemalloc.get_traced_memory()
+        return {"baseline_at": self._baseline_at, "traced_mb": _mb(current), "traced_peak_mb": _mb(peak)}
+
+    def allocations(self, limit: int = 20, group_by: str = "lineno") -> Dict[str, Any]:
+        """Top allocation sites now, and the top changes since the baseline if one was taken."""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is off; start the app with NETHEALTH_TRACEMALLOC=<frames>")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        out: Dict[str, Any] = {
+            "traced_mb": _mb(current),
+            "traced_peak_mb": _mb(peak),
+            "group_by": group_by,
+            "top": [_stat(s) for s in snapshot.statistics(group_by)[:limit]],
+        }
+        with self._lock:
+            baseline, baseline_at = self._baseline, self._baseline_at
+        if baseline is not None:
+            out["baseline_at"] = baseline_at
+            out["diff"] = [_stat_diff(d) for d in snapshot.compare_to(baseline, group_by)[:limit]]
+        return out
+
+
+def _where(traceback: tracemalloc.Traceback) -> List[str]:
+    return [f"{frame.filename}:{frame.lineno}" for frame in traceback]
+
+
+def _stat(s: tracemalloc.Statistic) -> Dict[str, Any]:
+    return {"where": _where(s.traceback), "size_kb": round(s.size / 1024, 1), "count": s.count}
+
+
+def _stat_diff(d: tracemalloc.StatisticDiff) -> Dict[str, Any]:
+    return {
+        "where": _where(d.traceback),
+        "size_kb": round(d.size / 1024, 1),
+        "size_diff_kb": round(d.size_diff / 1024, 1),
+        "count": d.count,
+        "count_diff": d.count_diff,
+    }
+
+
+_monitor: Optional[SelfMonitor] = None
+_monitor_lock = threading.Lock()
+
+
+def get_self_monitor(start: bool = True) -> SelfMonitor:
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            _monitor = SelfMonitor()
+        monitor = _monitor
+    return monitor.start() if start else monitor
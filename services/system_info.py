@@ -8,6 +8,11 @@ import socket
 import time
 from typing import Any, Dict, Optional
 
+from services.cgroup_info import get_container_info
+from services.net_topology import get_topology_service
+from services.replay import recordable
+from services.singleflight import coalesce
+
 try:
     import psutil  # type: ignore
 except Exception:  # pragma: no cover
@@ -122,8 +127,8 @@ def _list_up_non_loopback_ifaces() -> list[str]:
     return names
 
 
-def _active_interface_name() -> Optional[str]:
-    """Best-effort guess of an active interface name (cross-platform)."""
+def _heuristic_interface_name() -> Optional[str]:
+    """Best-effort guess of an active interface name when there is no default route."""
     # 1) Prefer up, non-loopback, with IPv4
     candidates = _list_up_non_loopback_ifaces()
     if candidates:
@@ -183,7 +188,9 @@ def _friendly_interface_label(name: Optional[str]) -> Optional[str]:
 
 def _network_info() -> Dict[str, Optional[Any]]:
     """Shape compatible with your frontend."""
-    iface_raw = _active_interface_name()
+    # default-route interface, cached until links/addresses/routes change
+    topology = get_topology_service(_heuristic_interface_name).get()
+    iface_raw = topology["interface"]
     return {
         "online": _detect_online(),
         "effective_type": None,     # browser concept; kept for consistency
@@ -191,11 +198,14 @@ def _network_info() -> Dict[str, Optional[Any]]:
         "rtt_ms": _measure_rtt(),   # quick TCP RTT estimate
         "interface": iface_raw,
         "interface_friendly": _friendly_interface_label(iface_raw),
+        "gateway": topology["gateway"],
     }
 
 
 # ---------- Public ----------
 
+@coalesce("system_info")
+@recordable("system_info")
 def get_system_info() -> Dict[str, Any]:
     uname = platform.uname()
     cpu_name = uname.processor or platform.machine() or ""
@@ -222,6 +232,8 @@ def get_system_info() -> Dict[str, Any]:
         "memory": _memory_info(),
         "storage": _storage_info(),
         "network": _network_info(),
+        # cgroup limits/usage when running in a container (None otherwise)
+        "container": get_container_info(),
 
         # convenient extra
         "uptime_seconds": _uptime_seconds(),
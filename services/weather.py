@@ -0,0 +1,304 @@
+# services/weather.py
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.replay import error_text, recordable
+from services.singleflight import coalesce
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+API_BASE = "https://api.weatherapi.com/v1"
+
+# API-key validation cache TTLs (seconds)
+KEY_VALID_TTL = 6 * 60 * 60
+KEY_INVALID_TTL = 5 * 60
+KEY_ERROR_TTL = 30          # connection/upstream errors: retry soon
+KEY_REFRESH_AFTER = 0.8     # fraction of TTL after which a hit refreshes in background
+
+# Parsed forecasts are reused for this long per (key, location)
+FORECAST_TTL = 5 * 60
+# ?location= takes any string, so the cache is an LRU of at most this many entries
+MAX_FORECAST_ENTRIES = 64
+MAX_CONCURRENT_FETCHES = 8
+
+
+# -------------------------------
+# Pooled upstream session
+# -------------------------------
+_session = None
+_session_owner = None
+_session_lock = threading.Lock()
+
+
+def _http():
+    """Keep-alive session shared by all upstream calls (rebuilt if `requests` is swapped)."""
+    global _session, _session_owner
+    with _session_lock:
+        if _session is None or _session_owner is not requests:
+            session = requests.Session()
+            adapter_cls = getattr(getattr(requests, "adapters", None), "HTTPAdapter", None)
+            if adapter_cls is not None:
+                adapter = adapter_cls(pool_connections=2, pool_maxsize=MAX_CONCURRENT_FETCHES)
+                session.mount("https://", adapter)
+            _session, _session_owner = session, requests
+        return _session
+
+
+def configured_locations() -> List[str]:
+    """WEATHER_LOCATIONS (';'-separated) or the single WEATHER_LOCATION."""
+    raw = os.environ.get("WEATHER_LOCATIONS", "")
+    locations = [loc.strip() for loc in raw.split(";") if loc.strip()]
+    if not locations:
+        locations = [os.environ.get("WEATHER_LOCATION", "auto:ip").strip() or "auto:ip"]
+    # de-duplicate, keep order
+    return list(dict.fromkeys(locations))
+
+
+def _parse_forecast(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a forecast.json response into the payload served by /api/weather."""
+    current = data.get("current", {})
+    location_data = data.get("location", {})
+    forecast_days = data.get("forecast", {}).get("forecastday", [])
+
+    # Build hourly forecast (next 5 hours from now)
+    hourly = []
+    now_epoch = current.get("last_updated_epoch", 0)
+
+    for day in forecast_days[:2]:  # Today and tomorrow
+        for hour in day.get("hour", []):
+            hour_epoch = hour.get("time_epoch", 0)
+            if hour_epoch > now_epoch and len(hourly) < 5:
+                hourly.append({
+                    "time": hour.get("time", "")[-5:],  # "HH:MM"
+                    "temp_f": round(hour.get("temp_f", 0)),
+                    "condition": hour.get("condition", {}).get("text", ""),
+                    "code": hour.get("condition", {}).get("code", 1000),
+                    "chance_of_rain": hour.get("chance_of_rain", 0)
+                })
+
+    # Build daily forecast (7 days)
+    daily = []
+    for day in forecast_days:
+        day_data = day.get("day", {})
+        daily.append({
+            "date": day.get("date", ""),
+            "high_f": round(day_data.get("maxtemp_f", 0)),
+            "low_f": round(day_data.get("mintemp_f", 0)),
+            "condition": day_data.get("condition", {}).get("text", ""),
+            "code": day_data.get("condition", {}).get("code", 1000),
+            "chance_of_rain": day_data.get("daily_chance_of_rain", 0)
+        })
+
+    return {
+        "temperature_f": round(current.get("temp_f", 0)),
+        "feels_like_f": round(current.get("feelslike_f", 0)),
+        "humidity": current.get("humidity", 0),
+        "wind_mph": round(current.get("wind_mph", 0)),
+        "location": f"{location_data.get('name', '')}, {location_data.get('region', '')}",
+        "conditions": current.get("condition", {}).get("text", ""),
+        "code": current.get("condition", {}).get("code", 1000),
+        "hourly": hourly,
+        "daily": daily
+    }
+
+
+# Raw upstream responses are what gets recorded, so replays exercise the parser too.
+# Keyed by location only: the API key is never written to a recording.
+@recordable("weather_forecast", key=lambda api_key, location: location.lower(), upstream=True)
+def _fetch_forecast_raw(api_key: str, location: str) -> Dict[str, Any]:
+    params = {"key": api_key, "q": location, "days": 7, "aqi": "no", "alerts": "no"}
+    response = _http().get(f"{API_BASE}/forecast.json", params=params, timeout=8)
+    response.raise_for_status()
+    return response.json()
+
+
+@coalesce("weather")
+def fetch_forecast(api_key: str, location: str) -> Dict[str, Any]:
+    """Fetch current weather + 7-day forecast. Raises on upstream errors."""
+    return _parse_forecast(_fetch_forecast_raw(api_key, location))
+
+
+# (key hash, location) -> (stored_at, parsed payload), least recently used first
+_forecast_cache: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_forecast_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_forecast(api_key: str, location: str) -> Dict[str, Any]:
+    """
+    Forecast for one location, parsed once per upstream response and reused
+    for FORECAST_TTL. Raises on upstream errors (errors are not cached).
+    """
+    cache_key = (_key_hash(api_key), location.lower())
+    now = time.monotonic()
+    with _forecast_lock:
+        entry = _forecast_cache.get(cache_key)
+        if entry is not None and now - entry[0] < FORECAST_TTL:
+            _forecast_cache.move_to_end(cache_key)
+            return entry[1]
+
+    payload = fetch_forecast(api_key, location)
+    with _forecast_lock:
+        now = time.monotonic()
+        _forecast_cache[cache_key] = (now, payload)
+        _forecast_cache.move_to_end(cache_key)
+        for key in [k for k, (stored_at, _) in _forecast_cache.items() if now - stored_at >= FORECAST_TTL]:
+            del _forecast_cache[key]
+        while len(_forecast_cache) > MAX_FORECAST_ENTRIES:
+            _forecast_cache.popitem(last=False)
+    return payload
+
+
+def get_forecasts(api_key: str, locations: List[str]) -> List[Dict[str, Any]]:
+    """Fetch several locations concurrently; each entry has either the payload or an error."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_FETCHES, thread_name_prefix="weather")
+
+    futures = [(loc, _executor.submit(get_forecast, api_key, loc)) for loc in locations]
+    results = []
+    for loc, future in futures:
+        try:
+            results.append({"query": loc, "ok": True, **future.result()})
+        except Exception as e:
+            results.append({"query": loc, "ok": False, "error": error_text(e)})
+    return results
+
+
+def invalidate_forecast_cache() -> None:
+    with _forecast_lock:
+        _forecast_cache.clear()
+
+
+@recordable("weather_key_status", upstream=True)
+def _key_status(api_key: str) -> int:
+    params = {"key": api_key, "q": "London"}
+    return _http().get(f"{API_BASE}/current.json", params=params, timeout=5).status_code
+
+
+@coalesce("api_key_validation")
+def validate_api_key(api_key: str) -> Dict[str, Any]:
+    """Test an API key with a simple request; returns the /settings/api_status payload."""
+    try:
+        status_code = _key_status(api_key)
+        if status_code == 200:
+            return {
+                "configured": True,
+                "valid": True,
+                "message": "API key is valid"
+            }
+        elif status_code == 401:
+            return {
+                "configured": True,
+                "valid": False,
+                "message": "API key is invalid"
+            }
+        else:
+            return {
+                "configured": True,
+                "valid": False,
+                "message": f"API error: {status_code}"
+            }
+    except Exception as e:
+        return {
+            "configured": True,
+            "valid": False,
+            "message": f"Connection error: {error_text(e)}"
+        }
+
+
+# -------------------------------
+# API-key validation cache
+# -------------------------------
+# sha256(key) -> (stored_at, ttl, payload); raw keys are never kept in memory here
+_key_cache: Dict[str, Tuple[float, float, Dict[str, Any]]] = {}
+_key_cache_lock = threading.Lock()
+_key_refreshing: set = set()
+
+
+def _key_hash(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+def _ttl_for(result: Dict[str, Any]) -> float:
+    if result.get("valid"):
+        return KEY_VALID_TTL
+    if result.get("message") == "API key is invalid":
+        return KEY_INVALID_TTL
+    return KEY_ERROR_TTL
+
+
+def _validate_and_store(api_key: str) -> Dict[str, Any]:
+    result = validate_api_key(api_key)
+    with _key_cache_lock:
+        _key_cache[_key_hash(api_key)] = (time.monotonic(), _ttl_for(result), result)
+    return result
+
+
+def revalidate_in_background(api_key: str) -> None:
+    """Validate a key on a daemon thread so the next status check is a cache hit."""
+    digest = _key_hash(api_key)
+    with _key_cache_lock:
+        if digest in _key_refreshing:
+            return
+        _key_refreshing.add(digest)
+
+    def run():
+        try:
+            _validate_and_store(api_key)
+        finally:
+            with _key_cache_lock:
+                _key_refreshing.discard(digest)
+
+    threading.Thread(target=run, name="api-key-revalidate", daemon=True).start()
+
+
+def check_api_key(api_key: str, background_refresh: bool = True) -> Dict[str, Any]:
+    """
+    Cached validate_api_key(). Positive results live for KEY_VALID_TTL,
+    rejected keys for KEY_INVALID_TTL and transient errors for KEY_ERROR_TTL.
+    Hits past KEY_REFRESH_AFTER of their TTL are refreshed in the background.
+    """
+    digest = _key_hash(api_key)
+    now = time.monotonic()
+    with _key_cache_lock:
+        entry = _key_cache.get(digest)
+
+    if entry is not None:
+        stored_at, ttl, result = entry
+        age = now - stored_at
+        if age < ttl:
+            if background_refresh and age > ttl * KEY_REFRESH_AFTER:
+                revalidate_in_background(api_key)
+            return result
+
+    return _validate_and_store(api_key)
+
+
+def invalidate_api_key_cache(api_key: Optional[str] = None) -> None:
+    """Drop one cached validation (or all of them when no key is given)."""
+    with _key_cache_lock:
+        if api_key is None:
+            _key_cache.clear()
+        else:
+            _key_cache.pop(_key_hash(api_key), None)
+
+
+def cache_stats() -> Dict[str, int]:
+    with _forecast_lock:
+        forecasts = len(_forecast_cache)
+    with _key_cache_lock:
+        keys = len(_key_cache)
+    return {"weather_forecasts": forecasts, "weather_api_keys": keys}
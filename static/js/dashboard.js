@@ -771,6 +771,16 @@ async function loadNetworkDevices() {
           </div>
         </div>
         <div class="device-details">
+          ${
+            device.hostname
+              ? `
+          <div class="device-detail">
+            <span class="label">Hostname</span>
+            <span class="value">${device.hostname}</span>
+          </div>
+          `
+              : ""
+          }
           <div class="device-detail">
             <span class="label">MAC Address</span>
             <span class="value">${device.mac}</span>
@@ -2,6 +2,25 @@
 import sys
 from pathlib import Path
 
+import pytest
+
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
-    sys.path.insert(0, str(ROOT))
\ No newline at end of file
+    sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(autouse=True)
+def _fresh_admission_budgets():
+    # Every test client shares 127.0.0.1, so start each test with full buckets
+    from api import admission
+    admission.reset()
+    yield
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _stores_outside_repo(tmp_path_factory):
+    # Routes record history and ingest prices; keep test runs out of data/
+    import os
+    os.environ["NETHEALTH_HISTORY_DB"] = str(tmp_path_factory.mktemp("history") / "history.db")
+    os.environ["NETHEALTH_PRICES_DIR"] = str(tmp_path_factory.mktemp("prices"))
+    yield
@@ -0,0 +1,81 @@
+import pytest
+from flask import Flask, jsonify
+
+from api.admission import RouteClass, TokenBucket, admit, admission_stats, ROUTE_CLASSES
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setitem(ROUTE_CLASSES, "test", RouteClass(
+        "test", client_rate=1 / 60, client_burst=2, global_rate=1 / 60, global_burst=3, max_concurrent=1,
+        queue_timeout=0.01))
+    calls = {"n": 0}
+    app = Flask(__name__)
+
+    @app.get("/expensive")
+    @admit("test")
+    def expensive():
+        calls["n"] += 1
+        return jsonify({"n": calls["n"]})
+
+    @app.get("/cheap")
+    def cheap():
+        return jsonify({"ok": True})
+
+    app.calls = calls
+    return app
+
+
+def test_token_bucket_refills_over_time():
+    b = TokenBucket(rate=2, capacity=2, now=0)
+    b.tokens = 0
+    assert b.wait_time() == 0.5
+    b.refill(0.25)
+    assert b.tokens == 0.5
+    b.refill(10)
+    assert b.tokens == 2
+
+
+def test_over_budget_serves_cached_copy_then_429(app):
+    client = app.test_client()
+    env_a = {"REMOTE_ADDR": "10.0.0.1"}
+    assert client.get("/expensive", environ_base=env_a).get_json() == {"n": 1}
+    assert client.get("/expensive", environ_base=env_a).get_json() == {"n": 2}
+
+    cached = client.get("/expensive", environ_base=env_a)
+    assert cached.status_code == 200
+    assert cached.headers["X-NetHealth-Admission"] == "cached"
+    assert cached.get_json() == {"n": 2}
+    assert app.calls["n"] == 2
+
+    # a different client still has its own bucket, then the global one runs dry
+    env_b = {"REMOTE_ADDR": "10.0.0.2"}
+    assert client.get("/expensive?x=1", environ_base=env_b).get_json() == {"n": 3}
+    rejected = client.get("/expensive?x=2", environ_base=env_b)
+    assert rejected.status_code == 429
+    assert int(rejected.headers["Retry-After"]) >= 1
+
+    assert admission_stats()["test"]["served_cached"] == 1
+    assert admission_stats()["test"]["rejected"] == 1
+    assert client.get("/cheap", environ_base=env_a).status_code == 200
+
+
+def test_disabled_by_env(app, monkeypatch):
+    monkeypatch.setenv("NETHEALTH_ADMISSION", "off")
+    client = app.test_client()
+    for i in range(5):
+        assert client.get("/expensive").get_json() == {"n": i + 1}
+
+
+def test_client_buckets_stay_capped_while_all_are_active(monkeypatch):
+    from api import admission
+
+    monkeypatch.setattr(admission, "MAX_TRACKED_CLIENTS", 4)
+    now = [100.0]
+    monkeypatch.setattr(admission.time, "monotonic", lambda: now[0])
+    rc = RouteClass("t", client_rate=0.001, client_burst=2, global_rate=1000, global_burst=1000, max_concurrent=1)
+    for i in range(10):
+        now[0] += 1
+        assert rc.take(f"10.0.0.{i}")[0]
+        assert len(rc._clients) <= 4
+    assert sorted(rc._clients) == ["10.0.0.6", "10.0.0.7", "10.0.0.8", "10.0.0.9"]
@@ -0,0 +1,116 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from services.alerts import AlertEngine, SlidingWindow, WebhookSink, load_rule_specs
+
+
+def _system(mem=50.0, disk=40.0, rtt=10.0):
+    return {"memory": {"percent": mem}, "storage": {"percent": disk}, "network": {"rtt_ms": rtt}}
+
+
+@pytest.fixture
+def webhook():
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.append(json.loads(body))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/hook", received
+    server.shutdown()
+
+
+def test_sliding_window_aggregates():
+    w = SlidingWindow(10)
+    for t, v in [(0, 5), (4, 1), (8, 9), (12, 3)]:
+        w.push(t, v)
+    # sample at t=0 evicted (cutoff 2)
+    assert len(w) == 3
+    assert w.avg() == pytest.approx(13 / 3)
+    assert (w.min(), w.max(), w.last()) == (1, 9, 3)
+    assert w.rate(per=1) == pytest.approx((3 - 1) / 8)
+
+
+def test_threshold_with_for_duration_fires_once_and_resolves():
+    engine = AlertEngine([{"name": "mem", "metric": "memory.percent", "op": ">", "value": 90, "for": 60}])
+    assert engine.observe("system", _system(mem=95), ts=0) == []
+    assert engine.observe("system", _system(mem=96), ts=30) == []
+    (fired,) = engine.observe("system", _system(mem=97), ts=61)
+    assert fired["status"] == "firing" and fired["details"]["value"] == 97
+    assert engine.observe("system", _system(mem=98), ts=90) == []
+    assert [a["rule"] for a in engine.active()] == ["mem"]
+    (resolved,) = engine.observe("system", _system(mem=50), ts=120)
+    assert resolved["status"] == "resolved"
+    assert engine.active() == []
+
+
+def test_rate_rule_detects_filling_disk():
+    engine = AlertEngine([{"name": "fill", "type": "rate", "metric": "storage.percent",
+                           "window": 600, "per": 3600, "op": ">", "value": 2}])
+    events = []
+    for i in range(5):
+        events += engine.observe("system", _system(disk=40 + i * 0.5), ts=i * 60)
+    # 0.5 % per minute = 30 % per hour
+    assert [e["rule"] for e in events] == ["fill"]
+
+
+def test_same_sample_object_is_only_evaluated_once():
+    engine = AlertEngine([{"name": "mem", "metric": "memory.percent", "op": ">", "value": 90}])
+    sample = _system(mem=95)
+    assert len(engine.observe("system", sample, ts=0)) == 1
+    assert engine.observe("system", sample, ts=1) == []
+
+
+def test_new_device_rule_and_default_rules_load():
+    engine = AlertEngine([{"name": "new", "type": "new_device", "source": "devices"}])
+    assert engine.observe("devices", [{"mac": "aa"}, {"mac": "bb"}]) == []
+    (event,) = engine.observe("devices", [{"mac": "aa"}, {"mac": "cc"}])
+    assert event["key"] == "cc"
+    assert {s["name"] for s in load_rule_specs()} >= {"memory_high", "new_device"}
+
+
+def test_webhook_sink_batches_and_dedups(webhook):
+    url, received = webhook
+    sink = WebhookSink(url, interval=60, max_batch=100)
+    for _ in range(3):
+        sink.emit({"rule": "mem", "key": None, "status": "firing", "ts": 1})
+    sink.emit({"rule": "new", "key": "aa", "status": "firing", "ts": 1})
+    assert sink.flush()
+    assert len(received) == 1
+    assert [a["rule"] for a in received[0]["alerts"]] == ["mem", "new"]
+    assert sink.deduplicated == 2
+
+
+def test_api_alerts_endpoint():
+    from app import create_app
+    data = create_app().test_client().get("/api/alerts").get_json()
+    assert set(data) == {"active", "recent", "rules"}
+
+
+def test_webhook_sink_requeues_failed_batches(webhook):
+    url, received = webhook
+    sink = WebhookSink("http://127.0.0.1:9/unreachable", interval=1, max_queue=2, max_backoff=4)
+    sink.emit({"rule": "a", "key": None, "status": "firing", "ts": 1})
+    assert not sink.flush()
+    assert sink.retry_delay == 1 and sink.failures == 1
+    sink.emit({"rule": "b", "key": None, "status": "firing", "ts": 2})
+    assert not sink.flush()
+    assert sink.retry_delay == 2
+    sink.emit({"rule": "c", "key": None, "status": "firing", "ts": 3})
+    assert sink.dropped == 1  # capped at max_queue: the oldest goes
+
+    sink.url = url
+    assert sink.flush()
+    assert [a["rule"] for a in received[0]["alerts"]] == ["b", "c"]
+    assert sink.retry_delay == 0 and sink.sent == 2
@@ -0,0 +1,135 @@
+import gzip
+import json
+import os
+import struct
+import zlib
+
+import pytest
+
+from services import assets
+
+
+def test_minify_js_keeps_literals_and_line_breaks():
+    src = """
+    // comment
+    const re = /\\/\\*[a-z]+ \\//g;   /* block */
+    let s = "a  // not a comment", t = `x  ${ {a: 1}.a }  y ${s}`;
+    let n = a + +b - -c, d = 10 / 2 / x;
+    return
+    value
+    """
+    out = assets.minify_js(src)
+    assert "/\\/\\*[a-z]+ \\//g" in out
+    assert '"a  // not a comment"' in out
+    assert "`x  ${{a:1}.a}  y ${s}`" in out
+    assert "a+ +b- -c" in out and "d=10/2/x" in out
+    assert "return\nvalue" in out  # ASI: must not become "return value"
+    assert "comment" not in out.replace("not a comment", "") and "block" not in out
+
+
+def test_minify_css_is_conservative():
+    src = """/* header */
+    a :hover, b > c { color : red ;  margin: 0 auto; }
+    .x::after { content: "  a ; b  "; width: calc(100% - 2px); }
+    """
+    out = assets.minify_css(src)
+    assert out == 'a :hover,b > c{color :red;margin:0 auto}.x::after{content:"  a ; b  ";width:calc(100% - 2px)}\n'
+
+
+def _png(width=64, height=32, text=b"Software\x00tool"):
+    raw = b"".join(b"\x00" + bytes((x * y) % 256 for x in range(width)) for y in range(height))
+    idat = zlib.compress(raw, 1)
+    return (assets.PNG_SIGNATURE
+            + assets._png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+            + assets._png_chunk(b"tEXt", text)
+            + assets._png_chunk(b"IDAT", idat[:40]) + assets._png_chunk(b"IDAT", idat[40:])
+            + assets._png_chunk(b"IEND", b"")), raw
+
+
+def test_recompress_png_is_lossless():
+    data, raw = _png()
+    out = assets.recompress_png(data)
+    assert len(out) < len(data)
+    assert b"tEXt" not in out and out.count(b"IDAT") == 1
+    start = out.index(b"IDAT") - 4
+    length = struct.unpack(">I", out[start:start + 4])[0]
+    assert zlib.decompress(out[start + 8:start + 8 + length]) == raw
+    assert assets.recompress_png(b"not a png") == b"not a png"
+
+
+@pytest.fixture
+def static_tree(tmp_path):
+    static = tmp_path / "static"
+    (static / "js").mkdir(parents=True)
+    (static / "css").mkdir()
+    (static / "img").mkdir()
+    (static / "js" / "dashboard.js").write_text("function  f ( a ) {\n  return a + 1; // one\n}\n" * 50)
+    (static / "css" / "main.css").write_text("body {\n  color : red;\n}\n" * 50)
+    (static / "img" / "p.png").write_bytes(_png()[0])
+    (static / "site.webmanifest").write_text("{}")
+    return static
+
+
+def test_build_hashes_precompresses_and_reuses(static_tree):
+    dist = static_tree / "dist"
+    summary = assets.build_assets(static_tree, dist)
+    assert summary["built"] == 3 and summary["reused"] == 0
+
+    manifest = assets.read_manifest(dist / "manifest.json")
+    entry = manifest["js/dashboard.js"]
+    built = (dist / entry["file"]).read_bytes()
+    assert entry["file"].startswith("js/dashboard.") and entry["file"].endswith(".js")
+    assert len(built) < entry["original_size"]
+    assert gzip.decompress((dist / (entry["file"] + ".gz")).read_bytes()) == built
+    assert "site.webmanifest" not in manifest
+
+    assert assets.build_assets(static_tree, dist)["reused"] == 3
+
+    # an edit makes a new name; the previous generation is kept once, then pruned
+    first = entry["file"]
+    (static_tree / "js" / "dashboard.js").write_text("let x = 1;\n")
+    os.utime(static_tree / "js" / "dashboard.js", ns=(1, 1))
+    assets.build_assets(static_tree, dist)
+    second = assets.read_manifest(dist / "manifest.json")["js/dashboard.js"]["file"]
+    assert second != first and (dist / first).exists()
+    (static_tree / "js" / "dashboard.js").write_text("let y = 2;\n")
+    assets.build_assets(static_tree, dist)
+    assert not (dist / first).exists() and (dist / second).exists()
+
+
+def test_manifest_falls_back_for_edited_sources(static_tree):
+    dist = static_tree / "dist"
+    assets.build_assets(static_tree, dist)
+    manifest = assets.AssetManifest(dist, static_tree, check_interval=0)
+    assert manifest.lookup("css/main.css").startswith("css/main.")
+    assert manifest.lookup("css/missing.css") is None
+    (static_tree / "css" / "main.css").write_text("a{}\n")
+    assert manifest.lookup("css/main.css") is None
+
+
+def test_pages_use_hashed_assets_with_immutable_caching(static_tree, monkeypatch):
+    from app import create_app
+
+    dist = static_tree / "dist"
+    assets.build_assets(static_tree, dist)
+    monkeypatch.setattr(assets, "DIST_DIR", dist)
+    monkeypatch.setattr(assets, "_manifest", assets.AssetManifest(dist, static_tree))
+    client = create_app().test_client()
+
+    html = client.get("/").get_data(as_text=True)
+    hashed = json.loads((dist / "manifest.json").read_text())["assets"]["js/dashboard.js"]["file"]
+    assert f"/assets/{hashed}" in html
+    assert "/static/css/themes.css" in html  # not in this build: plain static URL
+
+    plain = client.get(f"/assets/{hashed}")
+    assert plain.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert "Content-Encoding" not in plain.headers
+    packed = client.get(f"/assets/{hashed}", headers={"Accept-Encoding": "gzip"})
+    assert packed.headers["Content-Encoding"] == "gzip"
+    assert packed.headers["Vary"] == "Accept-Encoding"
+    assert packed.mimetype in ("application/javascript", "text/javascript")
+    assert gzip.decompress(packed.data) == plain.data
+    assert client.get("/assets/../../app.py").status_code == 404
+
+    monkeypatch.setenv("NETHEALTH_ASSETS", "off")
+    assert "/static/js/dashboard.js" in client.get("/").get_data(as_text=True)
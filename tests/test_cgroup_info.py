@@ -0,0 +1,114 @@
+import pytest
+
+from services import cgroup_info
+from services.cgroup_info import CgroupCollector
+
+
+def _write(root, files):
+    for rel, text in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+
+@pytest.fixture
+def v2(tmp_path):
+    root = tmp_path / "cgroup"
+    _write(root, {
+        "cgroup.controllers": "cpu io memory pids\n",
+        "app/memory.current": str(300 * 1024 * 1024),
+        "app/memory.max": str(512 * 1024 * 1024),
+        "app/memory.stat": f"anon 1000\ninactive_file {44 * 1024 * 1024}\n",
+        "app/cpu.stat": "usage_usec 2500000\nnr_periods 200\nnr_throttled 50\nthrottled_usec 1500000\n",
+        "app/cpu.max": "150000 100000\n",
+        "app/pids.current": "12\n",
+        "app/pids.max": "max\n",
+        "app/io.stat": "8:0 rbytes=1048576 wbytes=2097152 rios=10 wios=20 dbytes=0 dios=0\n"
+                       "8:16 rbytes=1048576 wbytes=0 rios=5 wios=0 dbytes=0 dios=0\n",
+    })
+    proc = tmp_path / "proc_cgroup"
+    proc.write_text("0::/app\n")
+    c = CgroupCollector.detect(root, proc)
+    yield c, root
+    c.close()
+
+
+def test_v2_reads_all_sections(v2):
+    c, _ = v2
+    info = c.read()
+    assert info["cgroup_version"] == 2 and info["cgroup_path"] == "/app"
+    assert info["memory"] == {"used_mb": 256.0, "limit_mb": 512.0, "percent": 50.0}
+    assert info["cpu"] == {"usage_seconds": 2.5, "limit_cores": 1.5, "periods": 200, "throttled_periods": 50,
+                           "throttled_seconds": 1.5, "throttled_percent": 25.0}
+    assert info["pids"] == {"current": 12, "max": None}
+    assert info["io"] == {"read_mb": 2.0, "write_mb": 2.0, "read_ops": 15, "write_ops": 20}
+
+
+def test_open_descriptors_see_new_values(v2):
+    c, root = v2
+    fds = dict(c._fds)
+    (root / "app/pids.current").write_text("40\n")  # same inode, rewritten in place
+    assert c.read()["pids"]["current"] == 40
+    assert c._fds == fds
+
+
+def test_v1_with_namespaced_root_and_unlimited_memory(tmp_path):
+    root = tmp_path / "cgroup"
+    _write(root, {
+        "memory/memory.usage_in_bytes": str(100 * 1024 * 1024),
+        "memory/memory.limit_in_bytes": "9223372036854771712\n",
+        "memory/memory.stat": "total_inactive_file 0\n",
+        "cpu,cpuacct/cpu.stat": "nr_periods 10\nnr_throttled 1\nthrottled_time 2000000000\n",
+        "cpu,cpuacct/cpuacct.usage": "3000000000\n",
+        "cpu,cpuacct/cpu.cfs_quota_us": "-1\n",
+        "cpu,cpuacct/cpu.cfs_period_us": "100000\n",
+        "pids/pids.current": "7\n",
+        "pids/pids.max": "100\n",
+        "blkio/blkio.throttle.io_service_bytes": "8:0 Read 1048576\n8:0 Write 0\nTotal 1048576\n",
+        "blkio/blkio.throttle.io_serviced": "8:0 Read 3\n8:0 Write 4\nTotal 7\n",
+    })
+    proc = tmp_path / "proc_cgroup"
+    # paths that do not exist under the mount resolve to the mount root
+    proc.write_text("4:memory:/docker/abc\n3:cpu,cpuacct:/docker/abc\n2:pids:/\n1:blkio:/\n")
+
+    c = CgroupCollector.detect(root, proc)
+    try:
+        info = c.read()
+    finally:
+        c.close()
+    assert info["cgroup_version"] == 1
+    assert info["memory"] == {"used_mb": 100.0, "limit_mb": None, "percent": None}
+    assert info["cpu"]["usage_seconds"] == 3.0
+    assert info["cpu"]["limit_cores"] is None
+    assert info["cpu"]["throttled_seconds"] == 2.0
+    assert info["pids"] == {"current": 7, "max": 100}
+    assert info["io"] == {"read_mb": 1.0, "write_mb": 0.0, "read_ops": 3, "write_ops": 4}
+
+
+def test_missing_controllers_and_no_cgroup(tmp_path):
+    root = tmp_path / "cgroup"
+    _write(root, {"cgroup.controllers": "memory\n", "memory.current": "1048576\n", "memory.max": "max\n"})
+    c = CgroupCollector.detect(root, tmp_path / "missing")
+    try:
+        info = c.read()
+    finally:
+        c.close()
+    assert info["memory"]["used_mb"] == 1.0 and info["memory"]["limit_mb"] is None
+    assert info["pids"] == {"current": None, "max": None}
+    assert info["io"]["read_mb"] is None
+
+    assert CgroupCollector.detect(tmp_path / "nope", tmp_path / "missing") is None
+
+
+def test_system_info_includes_container_section(v2, monkeypatch):
+    from services import system_info
+
+    c, _ = v2
+    monkeypatch.setattr(system_info, "_network_info", lambda: {})
+    cgroup_info.reset(c)
+    try:
+        info = system_info.get_system_info()
+    finally:
+        cgroup_info.reset()
+    assert info["container"]["memory"]["limit_mb"] == 512.0
+    assert "total_mb" in info["memory"]  # host figures unchanged
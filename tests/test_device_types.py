@@ -0,0 +1,75 @@
+import json
+
+from services.device_types import DeviceTypeClassifier, classify_vendor, load_rules, reload_rules
+from services.network_devices import guess_device_type
+
+
+def _reference(vendor):
+    """The original sequential substring scans, kept as an oracle."""
+    v = vendor.lower()
+    table = [
+        (['cisco', 'netgear', 'tp-link', 'linksys', 'asus router', 'd-link', 'ubiquiti', 'unifi'], 'Router/AP'),
+        (['lg', 'samsung tv', 'sony tv', 'vizio', 'arcadyan', 'roku', 'chromecast', 'amazon fire'], 'TV/Streaming'),
+        (['apple', 'samsung', 'google', 'huawei', 'xiaomi', 'oneplus', 'oppo'], 'Mobile Device'),
+        (['dell', 'hp', 'lenovo', 'microsoft', 'asus computer', 'acer', 'msi', 'intel'], 'Computer'),
+        (['philips', 'sonos', 'nest', 'ring', 'ecobee', 'wyze', 'espressif'], 'Smart Device'),
+        (['sony', 'nintendo', 'microsoft xbox'], 'Gaming Console'),
+        (['canon', 'epson', 'brother', 'xerox'], 'Printer'),
+    ]
+    for words, kind in table:
+        if any(w in v for w in words):
+            return kind
+    return 'Unknown'
+
+
+VENDORS = [
+    "Apple, Inc.", "Cisco Systems, Inc", "Samsung Electronics Co.,Ltd", "SAMSUNG TV",
+    "Sony Interactive Entertainment", "Microsoft Corporation", "Nintendo Co.,Ltd",
+    "Espressif Inc.", "Brother Industries", "Intel Corporate", "Unknown Vendor",
+    "Ringing Bell Networks", "Hewlett Packard", "LG Innotek", "Belgium Cables",
+    "Google, Inc.", "Arcadyan Corporation", "", "Xerox", "TP-LINK TECHNOLOGIES",
+]
+
+
+def test_matches_original_sequential_scans():
+    for vendor in VENDORS:
+        assert guess_device_type(vendor, "") == _reference(vendor), vendor
+
+
+def test_default_rules_load_from_data_file():
+    rules = load_rules()
+    assert [r["type"] for r in rules][0] == "Router/AP"
+    assert len(rules) == 7
+
+
+def test_rule_order_decides_overlapping_keywords():
+    clf = DeviceTypeClassifier([
+        {"type": "Console", "keywords": ["xbox"]},
+        {"type": "PC", "keywords": ["microsoft"]},
+    ])
+    # "microsoft" starts earlier in the string but the first rule still wins
+    assert clf.classify("Microsoft Xbox") == "Console"
+    assert clf.classify("Microsoft Surface") == "PC"
+    assert clf.classify("Nothing") == "Unknown"
+
+
+def test_reload_rules_from_custom_file(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps([{"type": "Lab Gear", "keywords": ["keysight"]}]))
+    try:
+        reload_rules(path)
+        assert classify_vendor("Keysight Technologies") == "Lab Gear"
+        assert classify_vendor("Apple, Inc.") == "Unknown"
+    finally:
+        reload_rules()
+    assert classify_vendor("Apple, Inc.") == "Mobile Device"
+
+
+def test_blank_keywords_are_ignored():
+    clf = DeviceTypeClassifier([
+        {"type": "Everything", "keywords": ["", "   "]},
+        {"type": "Printer", "keywords": [" ", "canon", None]},
+    ])
+    assert clf.types == ["Printer"]
+    assert clf.classify("Canon Inc.") == "Printer"
+    assert clf.classify("Apple, Inc.") == "Unknown"
@@ -0,0 +1,105 @@
+import csv
+import io
+import json
+import time
+
+import pytest
+
+from services import export
+from services.history import HistoryStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    path = tmp_path / "history.db"
+    monkeypatch.setenv("NETHEALTH_HISTORY_DB", str(path))
+    s = HistoryStore(path, retention=0)
+    for i in range(12000):
+        s.record_system({
+            "timestamp": 1_700_000_000 + i * 10,
+            "memory": {"percent": 50.0, "used_mb": 1000.0},
+            "storage": {"percent": 40.0, "used_gb": 10.0},
+            "network": {"online": True, "rtt_ms": 12.5, "interface": "eth0"},
+            "uptime_seconds": i,
+        })
+    s.record_devices([{"ip": "10.0.0.2", "mac": "aa:bb:cc:dd:ee:ff", "vendor": "V", "device_type": "Unknown",
+                       "interface": "eth0"}], ts=1_700_000_000)
+    monkeypatch.setattr("services.history._store", s)
+    yield s
+    s.close()
+
+
+def test_ndjson_streams_in_chunks_and_filters_range(store):
+    chunks = list(export.stream_export("system", "ndjson", start=1_700_000_000 + 100, end=1_700_000_000 + 200))
+    rows = [json.loads(line) for line in b"".join(chunks).splitlines()]
+    assert [r["ts"] for r in rows] == [1_700_000_000 + 100 + i * 10 for i in range(10)]
+    assert rows[0]["online"] == 1
+
+    all_chunks = list(export.stream_export("system", "ndjson"))
+    assert len(all_chunks) > 1
+    assert max(len(c) for c in all_chunks) < export.CHUNK_BYTES * 2
+
+
+def test_csv_devices_and_prices(store):
+    text = b"".join(export.stream_export("devices", "csv")).decode()
+    rows = list(csv.reader(io.StringIO(text)))
+    assert rows[0] == list(export._datasets()["devices"][0])
+    assert rows[1][2] == "aa:bb:cc:dd:ee:ff"
+
+    prices = [json.loads(line) for line in b"".join(export.stream_export("prices")).splitlines()]
+    assert prices and {"ts", "date", "item", "price"} <= set(prices[0])
+
+
+def test_arrow_and_parquet_when_available(store, tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    table = pa.ipc.open_stream(b"".join(export.stream_export("system", "arrow"))).read_all()
+    assert table.num_rows == 12000
+
+    path = tmp_path / "system.parquet"
+    path.write_bytes(b"".join(export.stream_export("system", "parquet")))
+    pf = pq.ParquetFile(path)
+    assert pf.metadata.num_rows == 12000
+    assert pf.metadata.num_row_groups == 3
+
+
+def test_export_route_validates_and_streams(store):
+    from app import create_app
+    client = create_app().test_client()
+
+    assert client.get("/api/export/nope").status_code == 400
+    assert client.get("/api/export/system?format=xml").status_code == 400
+    assert client.get("/api/export/system?start=yesterday").status_code == 400
+    for bad in ("inf", "-inf", "nan", "1e400", "1e300"):
+        assert client.get(f"/api/export/system?start={bad}").status_code == 400
+        assert client.get(f"/api/prices/history?item=x&end={bad}").status_code == 400
+
+    response = client.get("/api/export/system?format=csv&start=2023-11-14T22:13:20Z&end=1700000050")
+    assert response.is_streamed
+    assert response.headers.get("Content-Length") is None
+    lines = response.get_data(as_text=True).strip().splitlines()
+    assert len(lines) == 1 + 5
+
+
+def test_history_retention_prunes_old_rows(tmp_path, monkeypatch):
+    from services import history
+
+    monkeypatch.setenv("NETHEALTH_HISTORY_DAYS", "7")
+    s = HistoryStore(tmp_path / "h.db")
+    assert s.retention == 7
+    now = int(time.time())
+    s.record_devices([{"ip": "10.0.0.3"}], ts=now - 8 * 86400)
+    assert s.counts()["device_sightings"] == 0  # first write prunes, and this row is already too old
+    s.record_devices([{"ip": "10.0.0.4"}], ts=now - 8 * 86400)
+    s.record_system({"timestamp": now})
+    assert s.counts() == {"system_metrics": 1, "device_sightings": 1}  # not due again yet
+
+    monkeypatch.setattr(history, "PRUNE_INTERVAL", 0.0)
+    s.record_system({"timestamp": now})
+    assert s.counts() == {"system_metrics": 2, "device_sightings": 0}
+    assert s.pruned == 2
+    s.close()
+
+    monkeypatch.setenv("NETHEALTH_HISTORY_DAYS", "off")
+    assert history.retention_days() == 0
@@ -0,0 +1,137 @@
+import gzip
+import json
+
+import pytest
+import requests
+
+from scripts.load_test import start_local_server
+from services.agent import Agent
+from services.fleet import IngestError, apply_patch, fleet_store, make_patch
+
+
+def _fake_host(name):
+    state = {"tick": 0}
+
+    def collect():
+        state["tick"] += 1
+        return {
+            "system": {
+                "platform": "Linux",
+                "timestamp": 1000 + state["tick"],
+                "memory": {"percent": 40.0 + state["tick"]},
+                "storage": {"percent": 55.0},
+                "network": {"online": True, "rtt_ms": 10.0},
+            },
+            "devices": {
+                f"10.0.0.{i}": {"ip": f"10.0.0.{i}", "mac": f"02:00:00:00:00:{i:02x}", "vendor": name}
+                for i in range(1, 2 + state["tick"])
+            },
+        }
+
+    return collect
+
+
+@pytest.fixture
+def hub():
+    fleet_store.clear()
+    base_url, server = start_local_server()
+    yield base_url
+    server.shutdown()
+    fleet_store.clear()
+
+
+def test_merge_patch_roundtrip():
+    old = {"a": 1, "b": {"c": 2, "d": 3}, "e": [1, 2]}
+    new = {"a": 1, "b": {"c": 5}, "e": [1, 2, 3], "f": "x"}
+    patch = make_patch(old, new)
+    assert patch == {"b": {"c": 5, "$delete": ["d"]}, "e": [1, 2, 3], "f": "x"}
+    assert apply_patch(old, patch) == new
+    assert make_patch(new, new) is None
+
+
+def test_merge_patch_keeps_null_values():
+    old = {"network": {"rtt_ms": 12.0, "online": True}, "battery": {"level": 80}, "gone": 1}
+    new = {"network": {"rtt_ms": None, "online": True}, "battery": None, "extra": {"a": None}}
+    patch = make_patch(old, new)
+    assert apply_patch(old, patch) == new
+    assert make_patch(new, new) is None
+    assert apply_patch(new, make_patch(new, old)) == old
+    with pytest.raises(IngestError):
+        apply_patch(old, {"$delete": "gone"})
+
+
+def test_tracked_hosts_are_capped(monkeypatch):
+    from services import fleet
+
+    monkeypatch.setattr(fleet, "MAX_HOSTS", 3)
+    store = fleet.FleetStore()
+    for i in range(5):
+        store.ingest({"host": f"h{i}", "snapshots": [{"seq": 1, "full": True, "data": {}}]})
+    assert store.hosts() == ["h2", "h3", "h4"]
+
+
+def test_several_agents_against_one_hub(hub):
+    agents = [Agent(hub, host_id=f"host-{i}", collect=_fake_host(f"vendor-{i}")) for i in range(3)]
+    for _ in range(4):
+        for agent in agents:
+            agent.tick()
+
+    fleet = requests.get(f"{hub}/api/fleet").json()
+    assert fleet["count"] == 3
+    for entry in fleet["hosts"]:
+        assert entry["seq"] == 4
+        assert entry["memory_percent"] == 44.0
+        assert entry["device_count"] == 5
+
+    detail = requests.get(f"{hub}/api/fleet/host-1").json()
+    assert detail["system"]["timestamp"] == 1004
+    assert {d["vendor"] for d in detail["devices"]} == {"vendor-1"}
+    assert requests.get(f"{hub}/api/fleet/nope").status_code == 404
+
+
+def test_batching_and_resync_after_hub_restart(hub):
+    agent = Agent(hub, host_id="batched", batch_size=3, collect=_fake_host("v"))
+    agent.tick()
+    agent.tick()
+    assert agent.sent_batches == 0
+    agent.tick()
+    assert agent.sent_batches == 1
+    assert fleet_store.get("batched")["seq"] == 3
+
+    # hub loses its memory: next delta is rejected and a full snapshot follows
+    fleet_store.clear()
+    for _ in range(3):
+        agent.tick()
+    entry = fleet_store.get("batched")
+    assert entry is not None
+    assert entry["state"]["system"]["timestamp"] == 1006
+
+
+def test_ingest_rejects_bad_payloads(hub):
+    url = f"{hub}/api/fleet/ingest"
+    assert requests.post(url, data=b"not json").status_code == 400
+    body = gzip.compress(json.dumps({"host": "x", "snapshots": [{"seq": 1, "data": {}}]}).encode())
+    reply = requests.post(url, data=body, headers={"Content-Encoding": "gzip"}).json()
+    assert reply["resync"] is True
+
+
+def test_ingest_rejects_non_object_state(hub, monkeypatch):
+    from services import fleet
+
+    url = f"{hub}/api/fleet/ingest"
+    bad = [
+        {"host": "bad", "snapshots": [{"seq": 1, "full": True, "data": [1, 2]}]},
+        {"host": "bad", "snapshots": [{"seq": 1, "full": True, "data": {"system": "up"}}]},
+        {"host": "bad", "snapshots": [{"seq": 1, "full": True, "data": {"devices": {}}},
+                                      {"seq": 2, "data": {"devices": [1]}}]},
+    ]
+    for payload in bad:
+        assert requests.post(url, json=payload).status_code == 400
+    assert requests.get(f"{hub}/api/fleet").status_code == 200
+
+    monkeypatch.setattr(fleet, "MAX_INGEST_BYTES", 64)
+    big = json.dumps({"host": "big", "snapshots": [{"seq": 1, "full": True, "data": {"x": "y" * 100}}]})
+    with pytest.raises(IngestError, match="too large"):
+        fleet.decode_body(big.encode(), None)
+    assert requests.post(url, data=big).status_code == 413
+    assert requests.post(url, data=gzip.compress(big.encode()), headers={"Content-Encoding": "gzip"}).status_code == 413
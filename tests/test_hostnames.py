@@ -0,0 +1,152 @@
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+from services import hostnames
+from services.hostnames import HostnameEnricher, build_ptr_query, parse_nbstat_response, parse_ptr_response
+
+
+class StubResolver:
+    def __init__(self, names, delay=0.0):
+        self.names = names
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, ip, timeout):
+        self.calls.append((ip, timeout))
+        time.sleep(self.delay)
+        return self.names.get(ip)
+
+
+@pytest.fixture
+def make_enricher():
+    made = []
+
+    def make(*resolvers, **kw):
+        e = HostnameEnricher(resolvers, **kw)
+        made.append(e)
+        return e
+
+    yield make
+    for e in made:
+        e.close()
+
+
+DEVICES = [{"ip": "10.0.0.2", "mac": "aa"}, {"ip": "10.0.0.3", "mac": "bb"}, {"ip": "10.0.0.4", "mac": "cc"}]
+
+
+def test_enrich_never_blocks_and_fills_on_next_poll(make_enricher):
+    slow = StubResolver({"10.0.0.2": "nas", "10.0.0.3": "printer"}, delay=0.3)
+    e = make_enricher(slow)
+
+    start = time.perf_counter()
+    first = e.enrich(DEVICES)
+    assert time.perf_counter() - start < 0.1
+    assert [d["hostname"] for d in first] == [None, None, None]
+    assert "hostname" not in DEVICES[0]  # input dicts are not mutated
+
+    e.wait(5)
+    second = e.enrich(DEVICES)
+    assert [d["hostname"] for d in second] == ["nas", "printer", None]
+    # cached (positive and negative) entries are not looked up again
+    assert len(slow.calls) == 3
+    assert e.stats()["resolved"] == 2
+
+
+def test_resolver_chain_first_name_wins_and_errors_are_skipped(make_enricher):
+    def broken(ip, timeout):
+        raise OSError("boom")
+
+    mdns = StubResolver({"10.0.0.3": "iphone"})
+    netbios = StubResolver({"10.0.0.3": "ignored", "10.0.0.4": "DESKTOP-1"})
+    e = make_enricher(broken, mdns, netbios, timeout=0.25)
+    e.enrich(DEVICES)
+    e.wait(5)
+    assert [d["hostname"] for d in e.enrich(DEVICES)] == [None, "iphone", "DESKTOP-1"]
+    assert ("10.0.0.3", 0.25) in mdns.calls
+    assert [ip for ip, _ in netbios.calls if ip == "10.0.0.3"] == []
+
+
+def test_parallelism_is_bounded_and_expired_entries_refresh(make_enricher):
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def tracking(ip, timeout):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return "host-" + ip.rsplit(".", 1)[1]
+
+    e = make_enricher(tracking, max_workers=3, ttl=0.2)
+    devices = [{"ip": f"10.0.1.{i}"} for i in range(12)]
+    e.enrich(devices)
+    e.wait(5)
+    assert peak[0] <= 3
+    assert e.enrich(devices)[5]["hostname"] == "host-5"
+
+    time.sleep(0.25)
+    # stale name is served while the refresh runs
+    assert e.enrich(devices)[5]["hostname"] == "host-5"
+    assert e.stats()["pending"] > 0
+    e.wait(5)
+    assert e.stats()["lookups"] == 24
+
+
+def test_hostnames_are_sanitised():
+    assert hostnames.clean_hostname("My-Mac.local.") == "My-Mac"
+    assert hostnames.clean_hostname("<img src=x onerror=alert(1)>") == "imgsrcxonerroralert1"
+    assert hostnames.clean_hostname("") is None
+
+
+def _ptr_answer(query: bytes, name: str) -> bytes:
+    qid = struct.unpack("!H", query[:2])[0]
+    header = struct.pack("!HHHHHH", qid, 0x8180, 1, 1, 0, 0)
+    rdata = hostnames._encode_name(name)
+    answer = b"\xc0\x0c" + struct.pack("!HHIH", 12, 1, 60, len(rdata)) + rdata
+    return header + query[12:] + answer
+
+
+def test_ptr_wire_format_round_trip_over_udp():
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(("127.0.0.1", 0))
+
+    def serve():
+        data, addr = server.recvfrom(512)
+        server.sendto(_ptr_answer(data, "router.lan"), addr)
+
+    t = threading.Thread(target=serve)
+    t.start()
+    query = build_ptr_query("192.168.1.1", 0x1234)
+    assert b"\x011\x011\x03168\x03192\x07in-addr\x04arpa\x00" in query
+    data = hostnames._udp_exchange(query, server.getsockname(), 2.0)
+    t.join()
+    server.close()
+    assert parse_ptr_response(data, 0x1234) == "router.lan"
+    assert parse_ptr_response(data, 0x9999) is None
+    assert parse_ptr_response(b"\x00" * 5) is None
+
+
+def test_parse_nbstat_response():
+    names = [(b"WORKGROUP      ", 0x00, 0x8400), (b"DESKTOP-42     ", 0x00, 0x0400), (b"DESKTOP-42     ", 0x20, 0x0400)]
+    body = bytes([len(names)]) + b"".join(raw + bytes([suffix]) + struct.pack("!H", flags) for raw, suffix, flags in names)
+    reply = (struct.pack("!HHHHHH", 1, 0x8400, 0, 1, 0, 0) + hostnames._NBSTAT_QUERY_NAME
+             + struct.pack("!HHIH", 0x21, 1, 0, len(body)) + body)
+    assert parse_nbstat_response(reply) == "DESKTOP-42"
+
+
+def test_devices_route_adds_hostnames(make_enricher, monkeypatch):
+    from app import create_app
+
+    e = make_enricher(StubResolver({"10.0.0.2": "nas"}))
+    e.enrich(DEVICES[:1])
+    e.wait(5)
+    monkeypatch.setattr(hostnames, "_enricher", e)
+    monkeypatch.setattr("services.network_devices.get_network_devices", lambda: [dict(d) for d in DEVICES[:2]])
+    data = create_app().test_client().get("/api/network/devices").get_json()
+    assert [d["hostname"] for d in data["devices"]] == ["nas", None]
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from scripts import load_test
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    import services.network_devices
+    import services.system_info
+    import services.weather
+
+    monkeypatch.setenv("WEATHERAPI_KEY", "stub-key-for-load-testing")
+    monkeypatch.setenv("NETHEALTH_HOSTNAMES", "off")
+    monkeypatch.setenv("NETHEALTH_HISTORY", "off")
+    monkeypatch.delenv("ALERT_WEBHOOK_URL", raising=False)
+    monkeypatch.setattr(services.system_info, "get_system_info", load_test._stub_system_info)
+    monkeypatch.setattr(services.network_devices, "get_network_devices", load_test._stub_network_devices)
+    monkeypatch.setattr(services.weather, "requests", load_test._StubRequests)
+
+    base_url, server = load_test.start_local_server()
+    yield base_url
+    server.shutdown()
+
+
+def test_schedule_matches_dashboard_timers():
+    intervals = sorted({interval for _, interval, _ in load_test.SCHEDULE})
+    assert intervals == [1, 15, 30, 60, 120, 300, 600]
+
+
+def test_run_load_reports_per_endpoint(stub_server):
+    report = asyncio.run(load_test.run_load(stub_server, clients=3, duration=1.0, speed=60, ramp=0.1))
+
+    endpoints = report["endpoints"]
+    for path in load_test.INITIAL:
+        assert endpoints[path]["requests"] >= 3
+        assert endpoints[path]["error_rate"] == 0.0
+    # 60 s timer compressed to 1 s: at least the init burst plus one more
+    assert endpoints["/api/system"]["requests"] >= 3
+    assert report["total_requests"] == sum(e["requests"] for e in endpoints.values())
+    assert endpoints["/api/health"]["p99_ms"] >= endpoints["/api/health"]["p50_ms"]
+
+
+def test_percentile_nearest_rank():
+    samples = [float(x) for x in range(1, 101)]
+    assert load_test._percentile(samples, 50) == 50.0
+    assert load_test._percentile(samples, 99) == 99.0
+    assert load_test._percentile([], 50) is None
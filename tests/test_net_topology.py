@@ -0,0 +1,109 @@
+from services import net_topology
+from services.net_topology import TopologyService, parse_proc_ipv6_route, parse_proc_route, parse_route_get
+
+HEADER = "Iface\tDestination\tGateway \tFlags\tRefCnt\tUse\tMetric\tMask\t\tMTU\tWindow\tIRTT\n"
+MULTI_HOMED = HEADER + (
+    "wlan0\t00000000\t0101A8C0\t0003\t0\t0\t600\t00000000\t0\t0\t0\n"
+    "eth0\t00000000\t01000A0A\t0003\t0\t0\t100\t00000000\t0\t0\t0\n"
+    "docker0\t000011AC\t00000000\t0001\t0\t0\t0\t0000FFFF\t0\t0\t0\n"
+)
+V6_DEFAULT = (
+    "00000000000000000000000000000000 00 00000000000000000000000000000000 00 "
+    "fe800000000000000000000000000001 00000400 00000001 00000000 00000003     eth1\n"
+)
+
+
+def test_parse_proc_route_picks_lowest_metric_default():
+    assert parse_proc_route(MULTI_HOMED) == ("eth0", "10.10.0.1", 100)
+    assert parse_proc_route(HEADER + "eth0\t000011AC\t00000000\t0001\t0\t0\t0\t0000FFFF\t0\t0\t0\n") is None
+    # a default route that is not up is ignored
+    assert parse_proc_route(HEADER + "eth0\t00000000\t01000A0A\t0002\t0\t0\t0\t00000000\t0\t0\t0\n") is None
+
+
+def test_parse_ipv6_and_route_get():
+    assert parse_proc_ipv6_route(V6_DEFAULT) == ("eth1", "fe80::1", 1024)
+    out = "   route to: default\ndestination: default\n    gateway: 192.168.1.1\n  interface: en0\n"
+    assert parse_route_get(out) == ("en0", "192.168.1.1")
+
+
+def _service(tmp_path, route_text, v6_text="", fallback=None):
+    route, v6 = tmp_path / "route", tmp_path / "ipv6_route"
+    route.write_text(route_text)
+    v6.write_text(v6_text)
+    return TopologyService(fallback=fallback, proc_route=route, proc_ipv6_route=v6,
+                           system="Linux", use_netlink=False), route
+
+
+def test_polled_cache_refreshes_only_on_route_change(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(net_topology.time, "monotonic", lambda: clock[0])
+    svc, route = _service(tmp_path, MULTI_HOMED)
+    assert svc.watch_mode == "poll"
+    assert svc.get()["interface"] == "eth0"
+
+    clock[0] += net_topology.POLL_INTERVAL + 1
+    assert svc.get()["interface"] == "eth0"
+    assert svc.refreshes == 1
+
+    route.write_text(MULTI_HOMED.replace("\t100\t", "\t900\t"))
+    assert svc.get()["interface"] == "eth0"  # not polled again yet
+    clock[0] += net_topology.POLL_INTERVAL + 1
+    got = svc.get()
+    assert (got["interface"], got["gateway"], got["source"]) == ("wlan0", "192.168.1.1", "route")
+    assert svc.refreshes == 2
+
+
+def test_falls_back_to_ipv6_then_heuristic(tmp_path):
+    svc, _ = _service(tmp_path, HEADER, V6_DEFAULT)
+    assert svc.get()["family"] == "ipv6"
+
+    calls = []
+    svc, _ = _service(tmp_path, HEADER, "", fallback=lambda: calls.append(1) or "en5")
+    got = svc.get()
+    assert (got["interface"], got["source"]) == ("en5", "heuristic")
+    svc.get()
+    assert calls == [1]  # heuristic result is cached too
+
+
+class _FakeNetlink:
+    def __init__(self, messages):
+        self.messages = list(messages)
+
+    def recv(self, size):
+        if not self.messages:
+            raise BlockingIOError
+        msg = self.messages.pop(0)
+        if isinstance(msg, Exception):
+            raise msg
+        return msg
+
+    def close(self):
+        pass
+
+
+def test_netlink_events_mark_cache_stale(tmp_path):
+    svc, route = _service(tmp_path, MULTI_HOMED)
+    svc._netlink = _FakeNetlink([])
+    assert svc.watch_mode == "netlink"
+    svc.get()
+    route.write_text(MULTI_HOMED.replace("\t100\t", "\t900\t"))
+    assert svc.get()["interface"] == "eth0"  # no event, cached
+
+    svc._netlink.messages = [b"\x00" * 20, b"\x00" * 20]
+    assert svc.get()["interface"] == "wlan0"
+    assert svc.refreshes == 2
+
+    svc._netlink.messages = [OSError(105, "No buffer space available")]
+    svc.get()
+    assert svc.refreshes == 3
+
+
+def test_ttl_mode_without_change_signal(tmp_path, monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(net_topology.time, "monotonic", lambda: clock[0])
+    svc = TopologyService(fallback=lambda: "Ethernet 2", system="Windows")
+    svc.get()
+    svc.get()
+    clock[0] += net_topology.ROUTE_TTL
+    svc.get()
+    assert svc.refreshes == 2
@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+from services import network_devices
+from services.network_devices import (
+    DeviceRecord,
+    _parse_mac,
+    _records_from_arp_a_macos,
+    _records_from_arp_a_windows,
+    _records_from_proc_arp,
+    collect_device_records,
+)
+
+PROC_ARP = """\
+192.168.1.10     0x1         0x2         aa:bb:cc:dd:ee:10     *        eth0
+192.168.1.2      0x1         0x2         aa:bb:cc:dd:ee:02     *        eth0
+192.168.1.2      0x1         0x2         aa:bb:cc:dd:ee:02     *        wlan0
+192.168.1.3      0x1         0x0         00:00:00:00:00:00     *        eth0
+192.168.1.255    0x1         0x2         ff:ff:ff:ff:ff:ff     *        eth0
+224.0.0.251      0x1         0x2         01:00:5e:00:00:fb     *        eth0
+169.254.3.4      0x1         0x2         aa:bb:cc:dd:ee:04     *        eth0
+""".splitlines()
+
+
+@pytest.fixture
+def arp_cache(monkeypatch):
+    """Feed collect_device_records() through the Linux parser with the given records."""
+    def install(records):
+        monkeypatch.setattr(network_devices.platform, "system", lambda: "Linux")
+        monkeypatch.setattr(network_devices, "parse_arp_cache_linux", lambda: iter(list(records)))
+    return install
+
+
+def test_proc_arp_filters_dedups_and_sorts_numerically(arp_cache):
+    arp_cache(_records_from_proc_arp(PROC_ARP))
+    devices = [r.to_dict() for r in collect_device_records()]
+    assert [d["ip"] for d in devices] == ["192.168.1.2", "192.168.1.10"]
+    assert devices[0]["interface"] == "eth0, wlan0"
+    assert devices[0]["mac"] == "aa:bb:cc:dd:ee:02"
+    assert set(devices[0]) == {"ip", "mac", "vendor", "interface", "device_type"}
+
+
+def test_macos_unpadded_mac_and_incomplete_entries():
+    lines = [
+        "? (10.0.0.1) at 0:1e:c2:a:b:c on en0 ifscope [ethernet]",
+        "? (10.0.0.9) at (incomplete) on en0 ifscope [ethernet]",
+    ]
+    records = list(_records_from_arp_a_macos(lines))
+    assert len(records) == 1
+    assert records[0].mac_str == "00:1e:c2:0a:0b:0c"
+    assert records[0].interfaces == ("en0",)
+
+
+def test_windows_dash_separated_mac():
+    lines = ["  192.168.0.5           a0-b1-c2-d3-e4-f5     dynamic"]
+    (record,) = _records_from_arp_a_windows(lines)
+    assert record.to_dict()["mac"] == "a0:b1:c2:d3:e4:f5"
+    assert record.to_dict()["interface"] == "N/A"
+
+
+def test_ipv6_sorts_after_ipv4_without_crashing(arp_cache):
+    arp_cache([
+        DeviceRecord(6, int.from_bytes(bytes.fromhex("fe80" + "0" * 27 + "1"), "big"), 0xAABBCCDDEEFF, ("eth0",)),
+        DeviceRecord(4, 0x0A000001, 0xAABBCCDDEE01, ("eth0",)),
+    ])
+    assert [r.ip_str for r in collect_device_records()] == ["10.0.0.1", "fe80::1"]
+
+
+def test_parse_mac_rejects_garbage():
+    assert _parse_mac("<incomplete>") is None
+    assert _parse_mac("aa:bb:cc:dd:ee") is None
+    assert _parse_mac("aabb.ccdd.eeff") == 0xAABBCCDDEEFF
+
+
+def test_large_tables_dedup_and_sort(arp_cache):
+    def ip(i):
+        net, host = divmod(i, 250)
+        return f"10.{net >> 8}.{net & 255}.{host + 1}"
+
+    unique = 30000
+    lines = [f"{ip(i)}  0x1  0x2  02:00:00:{i >> 16:02x}:{(i >> 8) & 255:02x}:{i & 255:02x}  *  eth0"
+             for i in range(unique)]
+    # every third IP is seen again on wlan0 with another MAC; the first sighting wins
+    lines += [f"{ip(i)}  0x1  0x2  06:00:00:00:00:01  *  wlan0" for i in range(0, unique, 3)]
+    random.Random(0).shuffle(lines)
+    first = {}
+    for line in lines:
+        first.setdefault(line.split()[0], line.split()[3])
+
+    arp_cache(_records_from_proc_arp(lines))
+    records = collect_device_records()
+    assert len(records) == unique
+    assert all(a.ip < b.ip for a, b in zip(records, records[1:]))
+    by_ip = {r.ip_str: r for r in records}
+    assert all(by_ip[k].mac_str == mac for k, mac in first.items())
+    assert by_ip[ip(3)].interfaces in (("eth0", "wlan0"), ("wlan0", "eth0"))
+    assert by_ip[ip(4)].mac_str == "02:00:00:00:00:04" and by_ip[ip(4)].interfaces == ("eth0",)
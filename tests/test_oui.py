@@ -0,0 +1,127 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from scripts import download_oui
+from services import network_devices
+from services.oui import artifact_meta, parse_oui_lines, read_artifact
+
+REGISTRY = """OUI/MA-L                                                    Organization
+company_id                                                  Organization
+                                                            Address
+
+00-03-93   (hex)\t\tApple, Inc.
+000393     (base 16)\t\tApple, Inc.
+\t\t\t\t1 Infinite Loop
+\t\t\t\tCupertino  CA  95014
+\t\t\t\tUS
+
+B8-27-EB   (hex)\t\tRaspberry Pi Foundation
+B827EB     (base 16)\t\tRaspberry Pi Foundation
+
+f4-f5-d8   (hex)\t\tGoogle, Inc.
+"""
+
+
+class _Registry:
+    def __init__(self, body):
+        self.body = body.encode()
+        self.etag = '"v1"'
+        self.requests = []
+
+
+@pytest.fixture
+def registry():
+    state = _Registry(REGISTRY)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state.requests.append(dict(self.headers))
+            if self.headers.get("If-None-Match") == state.etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", state.etag)
+            self.send_header("Last-Modified", "Mon, 06 Jan 2025 00:00:00 GMT")
+            self.send_header("Content-Length", str(len(state.body)))
+            self.end_headers()
+            # dribble the body out so the client has to parse a real stream
+            for i in range(0, len(state.body), 64):
+                self.wfile.write(state.body[i:i + 64])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state.url = f"http://127.0.0.1:{server.server_address[1]}/oui.txt"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def test_parse_oui_lines():
+    assert dict(parse_oui_lines(REGISTRY.splitlines())) == {
+        "00:03:93": "Apple, Inc.", "B8:27:EB": "Raspberry Pi Foundation", "F4:F5:D8": "Google, Inc.",
+    }
+
+
+def test_conditional_refresh_compiles_and_revalidates(registry, tmp_path):
+    dest = tmp_path / "oui.json"
+    assert download_oui.refresh_oui(registry.url, dest, min_entries=3) == "updated"
+    meta, ouis = read_artifact(dest)
+    assert ouis["B8:27:EB"] == "Raspberry Pi Foundation"
+    assert (meta["etag"], meta["count"]) == ('"v1"', 3)
+    assert "If-None-Match" not in registry.requests[0]
+
+    mtime = dest.stat().st_mtime_ns
+    assert download_oui.refresh_oui(registry.url, dest, min_entries=3) == "not-modified"
+    assert registry.requests[1]["If-None-Match"] == '"v1"'
+    assert registry.requests[1]["If-Modified-Since"] == "Mon, 06 Jan 2025 00:00:00 GMT"
+    assert dest.stat().st_mtime_ns == mtime
+
+    assert download_oui.refresh_oui(registry.url, dest, force=True, min_entries=3) == "updated"
+    assert "If-None-Match" not in registry.requests[2]
+
+
+def test_truncated_download_keeps_previous_artifact(registry, tmp_path):
+    dest = tmp_path / "oui.json"
+    download_oui.refresh_oui(registry.url, dest, min_entries=3)
+    registry.body, registry.etag = b"<html>maintenance</html>", '"v2"'
+    with pytest.raises(ValueError):
+        download_oui.refresh_oui(registry.url, dest, min_entries=3)
+    assert artifact_meta(dest)["etag"] == '"v1"'
+    assert [p.name for p in tmp_path.iterdir()] == ["oui.json"]  # temp file cleaned up
+
+
+def test_running_server_hot_reloads_artifact(registry, tmp_path, monkeypatch):
+    dest = tmp_path / "oui.json"
+    monkeypatch.setattr(network_devices, "OUI_COMPILED_FILE", dest)
+    monkeypatch.setattr(network_devices, "OUI_FILE", tmp_path / "missing.txt")
+    monkeypatch.setattr(network_devices, "OUI_CHECK_INTERVAL", 0)
+    monkeypatch.setattr(network_devices, "_oui_cache", None)
+
+    assert network_devices.lookup_vendor("b8:27:eb:00:00:01") == "Unknown Vendor"
+    download_oui.refresh_oui(registry.url, dest, min_entries=3)
+    assert network_devices.lookup_vendor("b8:27:eb:00:00:01") == "Raspberry Pi Foundation"
+
+    registry.body = REGISTRY.replace("Raspberry Pi Foundation", "Raspberry Pi Trading Ltd").encode()
+    registry.etag = '"v2"'
+    download_oui.refresh_oui(registry.url, dest, min_entries=3)
+    assert network_devices.lookup_vendor("b8:27:eb:00:00:01") == "Raspberry Pi Trading Ltd"
+
+
+def test_falls_back_to_raw_registry_text(tmp_path, monkeypatch):
+    text = tmp_path / "oui.txt"
+    text.write_text(REGISTRY)
+    monkeypatch.setattr(network_devices, "OUI_COMPILED_FILE", tmp_path / "missing.json")
+    monkeypatch.setattr(network_devices, "OUI_FILE", text)
+    assert network_devices.load_oui_database()["00:03:93"] == "Apple, Inc."
+
+
+def test_https_uses_verifying_context():
+    ctx = download_oui._ssl_context()
+    assert ctx.verify_mode == download_oui.ssl.CERT_REQUIRED and ctx.check_hostname
@@ -0,0 +1,187 @@
+import threading
+
+import pytest
+
+from services import prices
+from services.prices import PriceStore, PriceValidationError, validate_rows
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "prices.csv"
+    path.write_text(
+        "item,price,date\n"
+        "Eggs,3.00,2025-07-01\n"
+        "Eggs,3.50,2025-08-01\n"
+        "Milk,4.00,2025-08-01\n",
+        encoding="utf-8",
+    )
+    return path
+
+
+@pytest.fixture
+def make_store(tmp_path, csv_path):
+    stores = []
+
+    def make(**kw):
+        kw.setdefault("compact_interval", 3600)
+        s = PriceStore(tmp_path / "store", csv_path, **kw)
+        stores.append(s)
+        return s
+
+    yield make
+    for s in stores:
+        s.close()
+
+
+def _row(item, price, date):
+    return validate_rows([{"item": item, "price": price, "date": date}])
+
+
+def test_validate_rows_reports_every_bad_row():
+    with pytest.raises(PriceValidationError) as e:
+        validate_rows([{"item": "A", "price": 1}, {"item": "", "price": 1},
+                       {"item": "B", "price": "x"}, {"item": "C", "price": 1, "date": "soon"}])
+    assert [err["row"] for err in e.value.errors] == [1, 2, 3]
+    with pytest.raises(PriceValidationError):
+        validate_rows([])
+
+
+def test_latest_merges_csv_base_with_ingested_rows(make_store):
+    s = make_store()
+    s.append(_row("Eggs", 3.25, "2025-09-01"))
+    s.append(_row("Bread", 2.00, "2025-09-01"))
+
+    latest = {r["item"]: r for r in s.latest()}
+    assert latest["Eggs"]["price"] == 3.25
+    assert latest["Eggs"]["direction"] == "down"
+    assert latest["Eggs"]["change"] == pytest.approx(-0.25)
+    assert latest["Milk"] == {"item": "Milk", "price": 4.0, "change": None, "direction": "flat"}
+    assert latest["Bread"]["price"] == 2.0
+
+    # same answer once the tail is compacted into the snapshot
+    assert s.compact() == 2
+    assert {r["item"]: r for r in s.latest()} == latest
+
+
+def test_concurrent_appends_are_group_committed(make_store):
+    s = make_store()
+    start = threading.Barrier(16)
+
+    def worker(n):
+        start.wait()
+        for i in range(10):
+            s.append(_row(f"Item {n}", float(i), f"2025-09-{i + 1:02d}"))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert s.rows_written == 160
+    assert s.commits < 160
+    assert len(s.history("Item 3")) == 10
+
+
+def test_compaction_deletes_covered_segments_and_survives_restart(make_store, tmp_path, monkeypatch):
+    monkeypatch.setattr(prices, "SEGMENT_BYTES", 1)  # rotate on every commit
+    s = make_store()
+    for day in range(1, 6):
+        s.append(_row("Eggs", float(day), f"2025-09-{day:02d}"))
+    assert len(s._segment_gens()) == 5
+
+    s.compact()
+    assert len(s._segment_gens()) == 1
+    s.append(_row("Eggs", 9.0, "2025-09-30"))
+
+    # reopen without a clean close: snapshot + replayed tail reproduce the full history
+    s2 = make_store()
+    hist = s2.history("Eggs", start=prices._date_to_ts("2025-09-01"))
+    assert [h["price"] for h in hist] == [1.0, 2.0, 3.0, 4.0, 5.0, 9.0]
+    assert s2.stats()["tail_rows"] == 1
+
+
+def test_torn_tail_line_is_ignored_on_replay(make_store, tmp_path):
+    s = make_store()
+    s.append(_row("Eggs", 4.0, "2025-09-01"))
+    with s._segment_path(s._gen).open("ab") as f:
+        f.write(b'[1756684800,"2025-09-02","Eggs",')
+
+    s2 = make_store()
+    assert [h["price"] for h in s2.history("Eggs")][-1] == 4.0
+
+
+def test_failed_write_is_cut_back_and_never_replayed(make_store, monkeypatch):
+    s = make_store()
+    s.append(_row("Eggs", 4.0, "2025-09-01"))
+    gen, size = s._gen, s._fh.tell()
+
+    real_fsync = prices.os.fsync
+    failures = [OSError("disk full")]
+
+    def fsync(fd):
+        if failures:
+            raise failures.pop()
+        return real_fsync(fd)
+
+    monkeypatch.setattr(prices.os, "fsync", fsync)
+    with pytest.raises(OSError):
+        s.append(_row("Eggs", 5.0, "2025-09-02"))
+    assert s._segment_path(gen).stat().st_size == size and s._gen == gen + 1
+    s.append(_row("Eggs", 6.0, "2025-09-03"))
+
+    start = prices._date_to_ts("2025-09-01")
+    assert [h["price"] for h in s.history("Eggs", start=start)] == [4.0, 6.0]
+    assert [h["price"] for h in make_store().history("Eggs", start=start)] == [4.0, 6.0]
+
+
+def test_compaction_rewrites_only_touched_items(make_store, tmp_path):
+    s = make_store()
+    s.append(_row("Tea", 1.0, "2025-09-01") + _row("Coffee", 7.0, "2025-09-01"))
+    s.compact()
+    first = dict(s._item_files)
+    s.append(_row("Tea", 2.0, "2025-09-02"))
+    s.compact()
+
+    assert s._item_files["Coffee"] == first["Coffee"]
+    assert s._item_files["Tea"] != first["Tea"]
+    assert sorted(p.name for p in (tmp_path / "store" / "items").iterdir()) == sorted(s._item_files.values())
+
+    # a later row with an equal timestamp still wins after restart
+    s.append(_row("Tea", 3.0, "2025-09-02"))
+    latest = {r["item"]: r for r in s.latest()}
+    assert latest["Tea"]["price"] == 3.0 and latest["Tea"]["change"] == pytest.approx(1.0)
+    assert {r["item"]: r for r in make_store().latest()} == latest
+
+
+def test_iter_history_is_time_ordered_across_items(make_store):
+    s = make_store()
+    s.append(_row("Bread", 2.0, "2025-07-15"))
+    rows = list(s.iter_history(end=prices._date_to_ts("2025-08-01")))
+    assert [(r[2], r[3]) for r in rows] == [("Eggs", 3.0), ("Bread", 2.0)]
+
+
+def test_price_routes(client_with_store):
+    client = client_with_store
+    r = client.post("/api/prices", json={"rows": [{"item": "Tea", "price": 5, "date": "2025-09-01"}]})
+    assert r.status_code == 200 and r.get_json() == {"ok": True, "accepted": 1}
+
+    r = client.post("/api/prices", json=[{"item": "Tea", "price": -1}])
+    assert r.status_code == 400
+    assert r.get_json()["errors"][0]["row"] == 0
+
+    items = {p["item"] for p in client.get("/api/prices").get_json()["prices"]}
+    assert {"Tea", "Eggs", "Milk"} <= items
+
+    hist = client.get("/api/prices/history?item=Tea").get_json()["history"]
+    assert hist == [{"ts": prices._date_to_ts("2025-09-01"), "date": "2025-09-01", "price": 5.0}]
+    assert client.get("/api/prices/history").status_code == 400
+
+
+@pytest.fixture
+def client_with_store(make_store, monkeypatch):
+    from app import create_app
+
+    monkeypatch.setattr(prices, "_store", make_store())
+    return create_app().test_client()
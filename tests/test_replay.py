@@ -0,0 +1,136 @@
+import json
+
+import pytest
+
+from services import replay, weather
+
+
+@pytest.fixture(autouse=True)
+def _live_after(monkeypatch):
+    monkeypatch.delenv(replay.RECORD_ENV, raising=False)
+    monkeypatch.delenv(replay.REPLAY_ENV, raising=False)
+    replay.reset()
+    yield
+    replay.reset()
+
+
+def _write(path, rows):
+    path.write_text("".join(json.dumps(r) + "\n" for r in rows))
+
+
+def test_record_then_step_replay(tmp_path):
+    calls = []
+
+    @replay.recordable("counter", key=lambda name: name)
+    def collect(name):
+        calls.append(name)
+        return {"name": name, "n": len(calls)}
+
+    path = tmp_path / "rec.ndjson"
+    replay.configure(record=str(path))
+    for name in ("a", "a", "b"):
+        collect(name)
+    replay.configure()  # closes the recorder
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(r["k"], r["id"], r["v"]["n"]) for r in lines] == [("counter", "a", 1), ("counter", "a", 2),
+                                                                ("counter", "b", 3)]
+
+    replay.configure(replay=str(path), speed=0)
+    assert [collect("a")["n"] for _ in range(3)] == [1, 2, 1]  # steps, then loops
+    assert collect("b")["n"] == 3
+    assert len(calls) == 3  # nothing ran live
+
+
+def test_timeline_follows_speed(tmp_path):
+    path = tmp_path / "rec.ndjson"
+    _write(path, [{"ts": 1000 + i * 10, "k": "system_info", "d": 0.01, "v": {"i": i}} for i in range(4)])
+    replay.configure(replay=str(path), speed=10, loop=False)
+    r = replay._replayer
+    fetch = replay.recordable("system_info")(lambda: pytest.fail("ran live"))
+
+    assert fetch() == {"i": 0}
+    r._started -= 2.5  # 25 recorded seconds at 10x
+    assert fetch() == {"i": 2}
+    r._started -= 100
+    assert fetch() == {"i": 3}  # no loop: stays on the last record
+
+
+def test_recorded_errors_do_not_leak_the_api_key(tmp_path):
+    requests = pytest.importorskip("requests")
+
+    @replay.recordable("weather_forecast", key=lambda api_key, location: location, upstream=True)
+    def fetch(api_key, location):
+        response = requests.Response()
+        response.status_code = 401
+        response.url = f"https://api.weatherapi.com/v1/forecast.json?key={api_key}&q={location}"
+        response.reason = "Unauthorized"
+        response.raise_for_status()
+
+    path = tmp_path / "rec.ndjson"
+    replay.configure(record=str(path))
+    with pytest.raises(requests.HTTPError):
+        fetch("SECRET" * 5, "paris")
+    replay.configure()
+
+    text = path.read_text()
+    assert "SECRET" not in text and "key=" not in text
+    assert json.loads(text)["e"] == "HTTPError: 401"
+
+
+def test_misses_and_recorded_errors(tmp_path):
+    path = tmp_path / "rec.ndjson"
+    _write(path, [{"ts": 1, "k": "weather_forecast", "id": "paris", "d": 0.2, "e": "HTTPError: 503"}])
+    path.write_text(path.read_text() + '{"ts": 2, "k": "weath')  # recorder killed mid-line
+    replay.configure(replay=str(path), speed=0)
+
+    local = replay.recordable("network_devices")(lambda: ["live"])
+    assert local() == ["live"]
+    upstream = replay.recordable("weather_forecast", key=lambda loc: loc, upstream=True)(lambda loc: {})
+    with pytest.raises(replay.ReplayMiss):
+        upstream("oslo")
+    with pytest.raises(replay.ReplayedError, match="503"):
+        upstream("paris")
+    assert replay.status()["misses"] == 2
+    assert replay.cache_stats() == {"replay_tracks": 1, "replay_records": 1}
+
+
+class _NoNetwork:
+    def Session(self):
+        return self
+
+    def get(self, *args, **kwargs):
+        raise AssertionError("replay touched the network")
+
+
+def test_weather_round_trip_without_network(tmp_path, monkeypatch):
+    from tests.test_weather import _ForecastRequests
+
+    path = tmp_path / "rec.ndjson"
+    monkeypatch.setattr(weather, "requests", _ForecastRequests())
+    replay.configure(record=str(path))
+    recorded = weather.fetch_forecast("secret-key-" + "k" * 20, "Paris")
+    assert weather.validate_api_key("secret-key-" + "k" * 20)["valid"] is True
+    replay.configure()
+    assert "secret-key" not in path.read_text()
+
+    monkeypatch.setattr(weather, "requests", _NoNetwork())
+    replay.configure(replay=str(path), speed=0)
+    assert weather.fetch_forecast("other", "paris") == recorded
+    assert weather.validate_api_key("other")["valid"] is True
+    with pytest.raises(replay.ReplayMiss):
+        weather.fetch_forecast("other", "Oslo")
+
+
+def test_configured_from_environment(tmp_path, monkeypatch):
+    path = tmp_path / "rec.ndjson"
+    _write(path, [{"ts": 1, "k": "system_info", "d": 0, "v": {"replayed": True}}])
+    monkeypatch.setenv(replay.REPLAY_ENV, str(path))
+    monkeypatch.setenv(replay.SPEED_ENV, "0")
+    replay.reset()
+
+    from app import create_app
+    client = create_app().test_client()
+    assert client.get("/api/system").get_json() == {"replayed": True}
+    status = client.get("/api/replay").get_json()
+    assert status["mode"] == "replay" and status["tracks"] == {"system_info": 1}
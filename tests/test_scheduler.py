@@ -0,0 +1,137 @@
+import threading
+import time
+
+import pytest
+
+from services import scheduler as scheduler_mod
+from services.scheduler import Scheduler
+
+
+@pytest.fixture
+def sched():
+    s = Scheduler(max_workers=2)
+    yield s
+    s.stop()
+
+
+def _wait_for(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if cond():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_runs_collectors_and_publishes_to_subscribers(sched):
+    seen = []
+    counter = iter(range(1000))
+    sched.register("tick", lambda: {"n": next(counter)}, interval=0.05, jitter=0.2)
+    sched.subscribe("tick", seen.append)
+    sched.start()
+
+    assert _wait_for(lambda: len(seen) >= 3)
+    latest = sched.latest("tick")
+    assert latest["n"] >= 2 and latest is seen[-1]
+    status = sched.status()["collectors"][0]
+    assert status["runs"] >= 3 and status["published_at"] is not None
+
+
+def test_none_results_and_errors_are_not_published(sched):
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("upstream down")
+        return None
+
+    c = sched.register("flaky", flaky, interval=0.02, jitter=0)
+    sched.start()
+    assert _wait_for(lambda: c.runs >= 2)
+    assert c.errors == 1
+    assert sched.latest("flaky") is None
+
+
+def test_slow_collector_is_skipped_and_timed_out(sched):
+    release = threading.Event()
+    c = sched.register("slow", lambda: release.wait(5) and "done", interval=0.02, jitter=0, timeout=0.1)
+    sched.start()
+    assert _wait_for(lambda: c.timeouts == 1 and c.skipped >= 2)
+    assert c.runs == 0 and c.last_error == "timeout"
+
+    release.set()
+    assert _wait_for(lambda: c.runs == 1)
+    assert c.timeouts == 1  # counted once per run
+    assert c.backoff == 2.0
+    assert sched.latest("slow", max_age=60) == "done"  # late result still published
+
+
+def test_over_budget_backs_off_then_recovers(sched):
+    heavy = [True]
+
+    def burn():
+        if heavy[0]:
+            end = time.thread_time() + 0.03
+            while time.thread_time() < end:
+                pass
+        return 1
+
+    c = sched.register("burn", burn, interval=0.01, jitter=0, cpu_budget=0.01)
+    sched.start()
+    assert _wait_for(lambda: c.over_budget >= 3)
+    assert c.backoff >= 4.0
+    heavy[0] = False
+    assert _wait_for(lambda: c.backoff == 1.0)
+    assert c.last_cpu < 0.01
+
+
+def test_bounded_pool_and_stale_snapshot(sched):
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return True
+
+    for i in range(5):
+        sched.register(f"c{i}", work, interval=0.01, jitter=0)
+    sched.start()
+    time.sleep(0.4)
+    assert peak[0] <= 2
+
+    sched.stop()
+    assert sched.latest("c0", max_age=0) is None
+    assert sched.latest("c0", max_age=60) is True
+    with pytest.raises(ValueError):
+        sched.register("c0", work, interval=1)
+
+
+def test_routes_serve_published_snapshot(sched, monkeypatch):
+    from app import create_app
+
+    monkeypatch.setattr(scheduler_mod, "_scheduler", sched)
+    monkeypatch.setattr("services.system_info.get_system_info", lambda: pytest.fail("collected on demand"))
+    sched.register("system", lambda: {"timestamp": 1, "memory": {}, "storage": {}, "network": {}},
+                   interval=60, jitter=0)
+    sched.start()
+    assert _wait_for(lambda: sched.latest("system") is not None)
+
+    monkeypatch.setenv("WEATHERAPI_KEY", "k" * 30)
+    monkeypatch.setenv("WEATHER_LOCATIONS", "Paris")
+    monkeypatch.setattr("dotenv.load_dotenv", lambda *args, **kwargs: None)
+    monkeypatch.setattr("services.weather.get_forecast", lambda *args: pytest.fail("fetched on demand"))
+    sched.register("weather", lambda: [{"query": "Paris", "ok": True, "location": "Paris, FR"}],
+                   interval=600, jitter=0)
+    assert _wait_for(lambda: sched.latest("weather") is not None)
+
+    client = create_app().test_client()
+    assert client.get("/api/system").get_json()["timestamp"] == 1
+    assert client.get("/api/weather").get_json() == {"location": "Paris, FR"}
+    status = client.get("/api/scheduler").get_json()
+    assert status["running"] and [c["name"] for c in status["collectors"]] == ["system", "weather"]
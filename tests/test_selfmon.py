@@ -0,0 +1,104 @@
+import gc
+import tracemalloc
+
+import pytest
+
+from services import selfmon
+from services.selfmon import SelfMonitor
+
+
+@pytest.fixture
+def monitor():
+    m = SelfMonitor(interval=3600)
+    m.start()
+    yield m
+    m.stop()
+
+
+def test_report_has_process_gc_and_cache_sections(monitor):
+    import services.device_types  # noqa: F401  (loaded modules report their caches)
+    import services.weather  # noqa: F401
+
+    gc.collect()
+    report = monitor.report()
+    assert report["memory"]["rss_mb"] > 0
+    assert report["threads"]["count"] >= 2 and "selfmon" in report["threads"]["names"]
+    gen2 = report["gc"]["generations"][2]
+    assert gen2["timed_collections"] >= 1 and gen2["pause_max_ms"] >= 0
+    assert report["gc"]["recent_pauses"][-1]["generation"] == 2
+    assert {"device_type_lru", "weather_forecasts", "weather_api_keys"} <= set(report["caches"])
+    assert report["tracemalloc"]["enabled"] is tracemalloc.is_tracing()
+
+
+def test_every_cache_module_reports_through_cache_stats():
+    import importlib
+
+    for name in selfmon.CACHE_MODULES:
+        assert isinstance(importlib.import_module(name).cache_stats(), dict), name
+    from services import history, scheduler
+
+    history.get_history_store()
+    scheduler.get_scheduler()
+    sizes = selfmon.cache_sizes()
+    assert {"oui_database", "singleflight_in_flight", "fleet_hosts", "dotenv_reloads",
+            "history_last_samples", "scheduler_snapshot"} <= set(sizes)
+
+
+def test_trend_from_samples(monitor):
+    monitor.samples.clear()
+    monitor.samples.extend([
+        {"ts": 0, "rss_mb": 100.0, "threads": 5, "gc_counts": [0, 0, 0]},
+        {"ts": 1800, "rss_mb": 110.0, "threads": 7, "gc_counts": [0, 0, 0]},
+        {"ts": 3600, "rss_mb": 120.0, "threads": 6, "gc_counts": [0, 0, 0]},
+    ])
+    trend = monitor.report()["trend"]
+    assert trend["rss_growth_mb"] == 20.0
+    assert trend["rss_growth_mb_per_hour"] == 20.0
+    assert (trend["threads_min"], trend["threads_max"]) == (5, 7)
+
+
+def test_stop_removes_gc_hook():
+    m = SelfMonitor(interval=3600).start()
+    assert m._gc_callback in gc.callbacks
+    m.stop()
+    assert m._gc_callback not in gc.callbacks
+
+
+def test_tracemalloc_is_opt_in_and_diffs_against_baseline(monkeypatch):
+    was_tracing = tracemalloc.is_tracing()
+    m = SelfMonitor(interval=3600)
+    if not was_tracing:
+        with pytest.raises(RuntimeError):
+            m.allocations()
+
+    monkeypatch.setenv("NETHEALTH_TRACEMALLOC", "5")
+    assert selfmon.tracemalloc_frames() == 5
+    m.start()
+    try:
+        m.take_baseline()
+        hoard = [bytearray(1024) for _ in range(2000)]  # noqa: F841
+        result = m.allocations(limit=5)
+        assert result["top"] and result["diff"]
+        assert max(d["size_diff_kb"] for d in result["diff"]) >= 1000
+        assert m.report()["tracemalloc"]["frames"] == 5
+    finally:
+        m.stop()
+        if not was_tracing:
+            tracemalloc.stop()
+
+
+def test_self_routes(monkeypatch):
+    from app import create_app
+
+    m = SelfMonitor(interval=3600)
+    monkeypatch.setattr(selfmon, "_monitor", m)
+    client = create_app().test_client()
+    try:
+        data = client.get("/api/self").get_json()
+        assert data["pid"] > 0 and "caches" in data and "admission_cached_responses" in data["caches"]
+        if not tracemalloc.is_tracing():
+            assert client.get("/api/self/allocations").status_code == 409
+            assert client.post("/api/self/allocations/baseline").status_code == 409
+        assert client.get("/api/self/allocations?group_by=bogus").status_code == 400
+    finally:
+        m.stop()
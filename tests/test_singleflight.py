@@ -0,0 +1,76 @@
+import threading
+import time
+
+from services.singleflight import SingleFlight, coalesce, coalescing_stats
+
+
+def _run_concurrently(n, target):
+    results, errors = [], []
+
+    def worker():
+        try:
+            results.append(target())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def test_concurrent_callers_share_one_execution():
+    group = SingleFlight("test")
+    calls = []
+    release = threading.Event()
+
+    def slow():
+        calls.append(1)
+        release.wait(2)
+        return {"value": 42}
+
+    timer = threading.Timer(0.2, release.set)
+    timer.start()
+    results, errors = _run_concurrently(8, lambda: group.do("k", slow))
+
+    assert not errors
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    stats = group.stats()
+    assert stats["executed"] == 1
+    assert stats["coalesced"] == 7
+    assert stats["in_flight"] == 0
+
+
+def test_errors_propagate_to_followers_and_next_call_runs_again():
+    group = SingleFlight("test-errors")
+
+    def boom():
+        time.sleep(0.1)
+        raise RuntimeError("upstream down")
+
+    results, errors = _run_concurrently(4, lambda: group.do("k", boom))
+    assert not results
+    assert len(errors) == 4
+    assert group.stats()["errors"] == 1
+
+    assert group.do("k", lambda: "ok") == "ok"
+    assert group.stats()["executed"] == 2
+
+
+def test_decorator_keys_on_arguments():
+    seen = []
+
+    @coalesce("test-decorator")
+    def lookup(key):
+        seen.append(key)
+        time.sleep(0.1)
+        return key.upper()
+
+    results, _ = _run_concurrently(3, lambda: lookup("a"))
+    assert results == ["A", "A", "A"]
+    assert lookup("b") == "B"
+    assert seen == ["a", "b"]
+    assert coalescing_stats()["test-decorator"]["coalesced"] == 2
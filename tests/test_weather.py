@@ -0,0 +1,214 @@
+import threading
+
+import pytest
+
+from services import weather
+
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class _CountingRequests:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.calls = 0
+
+    def Session(self):
+        return self
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        return _Response(self.status_code)
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    stub = _CountingRequests()
+    monkeypatch.setattr(weather, "requests", stub)
+    weather.invalidate_api_key_cache()
+    yield stub
+    weather.invalidate_api_key_cache()
+
+
+def test_valid_key_is_cached(upstream):
+    key = "k" * 30
+    assert weather.check_api_key(key)["valid"] is True
+    assert weather.check_api_key(key)["valid"] is True
+    assert upstream.calls == 1
+    # raw key never used as a cache key
+    assert key not in weather._key_cache
+
+
+def test_negative_result_uses_shorter_ttl(upstream, monkeypatch):
+    upstream.status_code = 401
+    key = "bad" * 8
+    assert weather.check_api_key(key)["message"] == "API key is invalid"
+
+    stored_at, ttl, _ = weather._key_cache[weather._key_hash(key)]
+    assert ttl == weather.KEY_INVALID_TTL
+    monkeypatch.setattr(weather.time, "monotonic", lambda: stored_at + ttl + 1)
+    upstream.status_code = 200
+    assert weather.check_api_key(key, background_refresh=False)["valid"] is True
+    assert upstream.calls == 2
+
+
+def test_connection_error_message_hides_the_key(monkeypatch):
+    class _Down:
+        def Session(self):
+            return self
+
+        def get(self, url, params=None, timeout=None):
+            raise ConnectionError(f"Max retries exceeded with url: {url}?key={params['key']}")
+
+    monkeypatch.setattr(weather, "requests", _Down())
+    result = weather.validate_api_key("SECRET" * 5)
+    assert result["message"] == "Connection error: ConnectionError"
+
+
+def test_invalidate_forces_revalidation(upstream):
+    key = "k" * 30
+    weather.check_api_key(key)
+    weather.invalidate_api_key_cache()
+    weather.check_api_key(key)
+    assert upstream.calls == 2
+
+
+def test_update_api_key_invalidates_and_prewarms(upstream, monkeypatch, tmp_path):
+    import api.routes
+    from app import create_app
+
+    monkeypatch.setattr(api.routes, "ENV_PATH", tmp_path / ".env")
+    monkeypatch.setenv("WEATHERAPI_KEY", "")
+    weather.check_api_key("old" * 8)
+    assert upstream.calls == 1
+
+    client = create_app().test_client()
+    new_key = "n" * 30
+    assert client.post("/api/settings/update_api_key", json={"api_key": new_key}).status_code == 200
+    assert weather._key_hash("old" * 8) not in weather._key_cache
+
+    for t in threading.enumerate():
+        if t.name == "api-key-revalidate":
+            t.join(2)
+    assert weather._key_hash(new_key) in weather._key_cache
+    assert weather.check_api_key(new_key)["valid"] is True
+    assert upstream.calls == 2
+
+
+def test_settings_updates_apply_without_waiting_for_mtime(monkeypatch, tmp_path):
+    import os
+
+    import api.routes
+    from app import create_app
+
+    monkeypatch.setattr(api.routes, "ENV_PATH", tmp_path / ".env")
+    monkeypatch.setenv("WEATHER_LOCATION", "")
+    client = create_app().test_client()
+
+    assert client.post("/api/settings/update_location", json={"location": "Oslo"}).status_code == 200
+    st = api.routes.ENV_PATH.stat()
+    api.routes._reload_env()
+    # same length, and the mtime forced back: only the route itself can tell
+    assert client.post("/api/settings/update_location", json={"location": "Rome"}).status_code == 200
+    os.utime(api.routes.ENV_PATH, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert os.environ["WEATHER_LOCATION"] == "Rome"
+    api.routes._reload_env()
+    assert os.environ["WEATHER_LOCATION"] == "Rome"
+
+
+class HTTPError(Exception):
+    def __init__(self, message, response):
+        super().__init__(message)
+        self.response = response
+
+
+class _ForecastResponse:
+    status_code = 200
+
+    def __init__(self, location, key=""):
+        self.location = location
+        self.key = key
+
+    def raise_for_status(self):
+        if self.location == "Atlantis":
+            self.status_code = 400
+            raise HTTPError(f"400 Client Error: Bad Request for url: {weather.API_BASE}/forecast.json"
+                            f"?key={self.key}&q=Atlantis", self)
+
+    def json(self):
+        return {
+            "location": {"name": self.location, "region": "R"},
+            "current": {"temp_f": 70.4, "last_updated_epoch": 100, "condition": {"text": "Sunny", "code": 1000}},
+            "forecast": {"forecastday": [{"date": "2026-01-01", "day": {"maxtemp_f": 80, "mintemp_f": 60},
+                                          "hour": [{"time_epoch": 200, "time": "2026-01-01 13:00", "temp_f": 71}]}]},
+        }
+
+
+class _ForecastRequests:
+    def __init__(self):
+        self.sessions = 0
+        self.queries = []
+
+    def Session(self):
+        self.sessions += 1
+        return self
+
+    def get(self, url, params=None, timeout=None):
+        self.queries.append(params["q"])
+        return _ForecastResponse(params["q"], params["key"])
+
+
+@pytest.fixture
+def forecasts(monkeypatch):
+    stub = _ForecastRequests()
+    monkeypatch.setattr(weather, "requests", stub)
+    weather.invalidate_forecast_cache()
+    yield stub
+    weather.invalidate_forecast_cache()
+
+
+def test_forecast_parsed_once_and_cached_per_location(forecasts):
+    first = weather.get_forecast("k" * 30, "Paris")
+    assert first["location"] == "Paris, R"
+    assert first["hourly"][0]["time"] == "13:00"
+    assert weather.get_forecast("k" * 30, "paris") is first
+    weather.get_forecast("k" * 30, "Oslo")
+    assert forecasts.queries == ["Paris", "Oslo"]
+    assert forecasts.sessions == 1
+
+
+def test_get_forecasts_concurrent_with_partial_failure(forecasts):
+    results = weather.get_forecasts("k" * 30, ["Paris", "Atlantis", "Oslo"])
+    assert [r["query"] for r in results] == ["Paris", "Atlantis", "Oslo"]
+    assert [r["ok"] for r in results] == [True, False, True]
+    assert results[1]["error"] == "HTTPError: 400"  # never the upstream URL, which carries the key
+
+
+def test_weather_routes_multi_location(forecasts, monkeypatch):
+    from app import create_app
+
+    monkeypatch.setattr("dotenv.load_dotenv", lambda **kwargs: None)
+    monkeypatch.setenv("WEATHERAPI_KEY", "k" * 30)
+    monkeypatch.setenv("WEATHER_LOCATIONS", "Paris; New York, NY ;Paris")
+    client = create_app().test_client()
+
+    assert client.get("/api/weather").get_json()["location"] == "Paris, R"
+    assert client.get("/api/weather?location=Oslo").get_json()["location"] == "Oslo, R"
+    data = client.get("/api/weather/all").get_json()
+    assert [loc["query"] for loc in data["locations"]] == ["Paris", "New York, NY"]
+
+
+def test_forecast_cache_is_bounded(forecasts, monkeypatch):
+    monkeypatch.setattr(weather, "MAX_FORECAST_ENTRIES", 3)
+    for loc in ("A", "B", "C"):
+        weather.get_forecast("k" * 30, loc)
+    weather.get_forecast("k" * 30, "a")  # hit: A becomes most recent
+    weather.get_forecast("k" * 30, "D")
+    assert [loc for _, loc in weather._forecast_cache] == ["c", "a", "d"]
+
+    stored_at = weather._forecast_cache[next(iter(weather._forecast_cache))][0]
+    monkeypatch.setattr(weather.time, "monotonic", lambda: stored_at + weather.FORECAST_TTL + 1)
+    weather.get_forecast("k" * 30, "E")
+    assert [loc for _, loc in weather._forecast_cache] == ["e"]  # expired entries swept